@@ -1,26 +1,36 @@
-from flask import Flask, jsonify, request
+from flask import Flask, g, has_request_context, jsonify, request
 from flask_cors import CORS
+import functools
 import json
 import os
+import importlib
+import re
 from pathlib import Path
-import pandas as pd
-import numpy as np
-from datetime import datetime
-from scipy.stats import pearsonr
-from card_database import get_card_info
-import zipfile
+from datetime import datetime, timedelta
 import shutil
+import threading
+import time
+import uuid
 from werkzeug.utils import secure_filename
 from supabase_client import get_supabase_client, is_supabase_configured
-from run_parser import parse_run_file, batch_parse_runs
+from upload_jobs import submit_upload, get_job
+import async_data
+import metrics
+import run_archive
+from metrics import span
+from cache_warmer import CacheWarmer, filter_cube
+from result_cache import ResultCache
+from single_flight import SingleFlight
 
 app = Flask(__name__)
 CORS(app)
+metrics.init_app(app)
 
 # Configuration
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max upload size
 UPLOAD_FOLDER = Path(__file__).parent / 'uploads'
 UPLOAD_FOLDER.mkdir(exist_ok=True)
+UPLOAD_JOBS_FOLDER = UPLOAD_FOLDER / 'jobs'
 
 # Path to runs directory
 RUNS_DIR = Path(__file__).parent.parent / 'runs'
@@ -28,77 +38,405 @@ RUNS_DIR = Path(__file__).parent.parent / 'runs'
 # Allowed characters/folders
 ALLOWED_CHARACTERS = {'DEFECT', 'IRONCLAD', 'THE_SILENT', 'WATCHER', 'DAILY'}
 
-# Base game characters (exclude modded characters)
-BASE_GAME_CHARACTERS = {'DEFECT', 'IRONCLAD', 'THE_SILENT', 'WATCHER'}
+# Run index snapshot directory (set RUN_SNAPSHOT_DIR to an empty string to disable)
+SNAPSHOT_DIR = os.getenv('RUN_SNAPSHOT_DIR', str(Path(__file__).parent / 'snapshot'))
+
+# Where the summary, card, relic and enemy aggregates are computed: 'index'
+# (the in-memory run index, default) or 'rpc' (the Postgres functions in
+# supabase_functions.sql, see db_aggregates.py)
+AGGREGATE_BACKEND = os.getenv('AGGREGATE_BACKEND', 'index').lower()
+
+# Minimum time between snapshot writes
+SNAPSHOT_INTERVAL_SECONDS = int(os.getenv('RUN_SNAPSHOT_INTERVAL', 60))
+
+# Delta fetches start this long before the high-water mark, so rows whose
+# transaction committed after a later row's are not missed
+HIGH_WATER_MARK_SLACK = timedelta(minutes=5)
+
+# Cached run index, refreshed when the runs table row count changes
+_run_index = None
+_run_index_count = None
+_run_index_high_water_mark = None
+_run_index_lock = threading.Lock()
+
+# Concurrent index refreshes and identical analytics requests share one execution
+_run_index_flight = SingleFlight('run_index')
+_request_flight = SingleFlight('request')
+
+# Memory budget for serialized analytics responses, per worker (see result_cache.py)
+RESULT_CACHE_MB = float(os.getenv('RESULT_CACHE_MB', 32))
+_result_cache = ResultCache('results', int(RESULT_CACHE_MB * 1024 * 1024))
+
+# Endpoints precomputed for the common filter combinations after startup and
+# uploads (see cache_warmer.py), by a pool of CACHE_WARM_WORKERS threads
+# (0 disables warming)
+WARM_ENDPOINTS = ('/api/stats', '/api/cards', '/api/relics', '/api/enemies', '/api/correlation', '/api/correlation/top')
+CACHE_WARM_WORKERS = int(os.getenv('CACHE_WARM_WORKERS', 1))
+_cache_warmer = CacheWarmer(app, [
+    f'{endpoint}?{query}' if query else endpoint
+    for query in filter_cube(ALLOWED_CHARACTERS) for endpoint in WARM_ENDPOINTS
+], max(CACHE_WARM_WORKERS, 1))
+
+# Heavy analytics dependencies, imported by the first request that needs
+# them rather than at startup (see preload_analytics)
+ANALYTICS_MODULES = (
+    'numpy', 'pandas', 'scipy.sparse', 'scipy.stats', 'supabase',
+    'run_index', 'correlation_stats', 'synergy_stats', 'confidence', 'index_snapshot', 'card_database'
+)
+
+# Newest snapshot generation this worker has loaded
+_snapshot_generation = None
+_snapshot_state = {'saved_at': 0.0, 'mapped': None}
+# Held by whoever is writing a snapshot, so only one writer runs at a time
+_snapshot_writer_lock = threading.Lock()
+
+def preload_analytics():
+    """
+    Import every analytics dependency now
+    Called by gunicorn in the master process when preloading (see
+    gunicorn.conf.py), so forked workers share the imported modules instead
+    of each importing them on their first analytics request.
+    """
+    for name in ANALYTICS_MODULES:
+        importlib.import_module(name)
 
-def load_all_runs():
-    """Load all runs from Supabase"""
-    supabase = get_supabase_client()
-    if not supabase:
-        return []
+def warm_cache():
+    """
+    Precompute the common analytics responses in the background
+    Called once a worker is up (see gunicorn.conf.py) and after each upload.
+    """
+    if CACHE_WARM_WORKERS > 0 and is_supabase_configured():
+        _cache_warmer.start()
 
-    try:
-        response = supabase.table('runs').select('raw_data').execute()
+def parse_uploaded_at(value):
+    """
+    datetime for a timestamptz string from PostgREST
+    Postgres trims trailing zeros from the fraction, which
+    datetime.fromisoformat only accepts on Python 3.11+.
+    """
+    value = value.replace('Z', '+00:00')
+    match = re.match(r'^([^.]*)\.(\d+)(.*)$', value)
+    if match:
+        value = f"{match.group(1)}.{match.group(2)[:6].ljust(6, '0')}{match.group(3)}"
+    return datetime.fromisoformat(value)
+
+def fetch_runs(since=None):
+    """
+    Fetch runs from Supabase (only rows uploaded at or after since, if given)
+    Pages are fetched concurrently (see async_data.fetch_all) and each page's
+    runs are extracted and normalized as soon as it arrives.
+
+    Returns:
+        tuple: (runs, latest uploaded_at seen or since)
+    """
+    from run_index import normalize_run
+
+    filters = [('gte', 'uploaded_at', since)] if since else []
+    high_water_mark = [since]
+
+    def decode_page(rows):
+        for row in rows:
+            uploaded_at = row.get('uploaded_at')
+            if uploaded_at and (high_water_mark[0] is None or parse_uploaded_at(uploaded_at) > parse_uploaded_at(high_water_mark[0])):
+                high_water_mark[0] = uploaded_at
         # Extract raw_data (which contains the original .run file structure)
-        runs = [row['raw_data'] for row in response.data]
+        # and normalize field names for frontend compatibility
+        return [normalize_run(row['raw_data']) for row in rows]
 
-        # Normalize field names for frontend compatibility
-        # The raw data uses 'character_chosen' but frontend expects 'character'
-        for run in runs:
-            if 'character_chosen' in run and 'character' not in run:
-                run['character'] = run['character_chosen']
+    async def fetch():
+        async with async_data.connect() as client:
+            if client is None:
+                return []
+            return await async_data.fetch_all(client, 'runs', 'raw_data,uploaded_at', filters=filters, on_page=decode_page)
+
+    with span('fetch'):
+        runs = async_data.run(fetch())
+    return runs, high_water_mark[0]
+
+def load_all_runs():
+    """Load all runs from Supabase, sorted by timestamp"""
+    if not is_supabase_configured():
+        return []
 
-        # Sort by timestamp
-        runs.sort(key=lambda x: x.get('timestamp', 0))
+    try:
+        runs, _ = fetch_runs()
+        with span('decode'):
+            # Sort by timestamp
+            runs.sort(key=lambda x: x.get('timestamp', 0))
         return runs
     except Exception as e:
         print(f"Error loading runs from Supabase: {e}")
         return []
 
-def extract_features_for_correlation(runs):
-    """Extract numerical features from runs for correlation analysis"""
-    features = []
+def count_runs():
+    """Get the number of rows in the runs table (None if unavailable)"""
+    supabase = get_supabase_client()
+    if not supabase:
+        return None
 
-    for run in runs:
-        feature_dict = {
-            'victory': 1 if run.get('victory', False) else 0,
-            'floor_reached': run.get('floor_reached', 0),
-            'score': run.get('score', 0),
-            'playtime': run.get('playtime', 0),
-            'gold': run.get('gold', 0),
-            'ascension_level': run.get('ascension_level', 0),
-            'campfire_rested': run.get('campfire_rested', 0),
-            'campfire_upgraded': run.get('campfire_upgraded', 0),
-            'items_purged_count': len(run.get('items_purged', [])),
-            'purchased_purges': run.get('purchased_purges', 0),
-            'deck_size': len(run.get('master_deck', [])),
-            'relic_count': len(run.get('relics', [])),
-            'potions_used': len(run.get('potions_floor_usage', [])),
-            'total_damage_taken': sum([d.get('damage', 0) for d in run.get('damage_taken', [])]),
-            'battles_count': len(run.get('damage_taken', [])),
-            'avg_damage_per_battle': sum([d.get('damage', 0) for d in run.get('damage_taken', [])]) / max(len(run.get('damage_taken', [])), 1),
-            'cards_picked': len(run.get('card_choices', [])),
-            'cards_skipped': sum([1 for c in run.get('card_choices', []) if c.get('picked') == 'SKIP']),
-            'events_encountered': len(run.get('event_choices', [])),
-            'items_purchased_count': len(run.get('items_purchased', [])),
-            'max_hp_final': run.get('max_hp_per_floor', [0])[-1] if run.get('max_hp_per_floor') else 0,
-            'current_hp_final': run.get('current_hp_per_floor', [0])[-1] if run.get('current_hp_per_floor') else 0,
-            'is_defect': 1 if run.get('character') == 'DEFECT' else 0,
-            'is_ironclad': 1 if run.get('character') == 'IRONCLAD' else 0,
-            'is_silent': 1 if run.get('character') == 'THE_SILENT' else 0,
-            'is_watcher': 1 if run.get('character') == 'WATCHER' else 0,
-            'small_deck': 1 if len(run.get('master_deck', [])) <= 25 else 0,
-            'medium_deck': 1 if 26 <= len(run.get('master_deck', [])) <= 40 else 0,
-            'large_deck': 1 if len(run.get('master_deck', [])) > 40 else 0,
-        }
-        features.append(feature_dict)
+    try:
+        with span('fetch'):
+            response = supabase.table('runs').select('count', count='exact').limit(0).execute()
+        return response.count
+    except Exception as e:
+        print(f"Error counting runs in Supabase: {e}")
+        return None
+
+def adopt_snapshot():
+    """
+    Switch to a snapshot generation published by another worker
+    Generations holding fewer runs than the current index (it was extended
+    by an upload since) are skipped. Must be called holding _run_index_lock.
+
+    Returns:
+        bool: True if the index was replaced
+    """
+    global _run_index, _run_index_count, _run_index_high_water_mark, _snapshot_generation
+    import index_snapshot
+
+    generation = index_snapshot.current_generation(SNAPSHOT_DIR)
+    if generation is None or generation == _snapshot_generation:
+        return False
+
+    with span('decode'):
+        snapshot = index_snapshot.load_snapshot(SNAPSHOT_DIR)
+    if snapshot is None:
+        return False
+    index, meta = snapshot
+    _snapshot_generation = meta['generation']
+    if _run_index is not None and len(index) < len(_run_index):
+        return False
+    _run_index, _run_index_count, _run_index_high_water_mark = index, meta['count'], meta['high_water_mark']
+    _snapshot_state['mapped'] = index
+    return True
+
+def load_run_index():
+    """
+    Get the run index, building it on first use
+    Runs are only ever inserted, so the row count is used as the corpus
+    version. Workers share the on-disk snapshot: each one maps the newest
+    generation, and when the count changes only the rows uploaded since the
+    high-water mark are fetched. A full rebuild happens only if the delta
+    does not account for the new count, by one worker at a time (the others
+    wait for its snapshot instead of each pulling the whole corpus).
+    Concurrent callers in a worker share one check (and refresh), and a
+    request checks only once however often it asks.
+    """
+    if has_request_context() and 'run_index' in g:
+        return g.run_index
+    index = _run_index_flight.do('run_index', refresh_run_index)
+    if has_request_context():
+        g.run_index = index
+    return index
+
+def refresh_run_index():
+    """Bring the run index up to date with the runs table (see load_run_index)"""
+    global _run_index, _run_index_count, _run_index_high_water_mark
+    import index_snapshot
+    from run_index import RunIndex
+
+    count = count_runs()
+    with _run_index_lock:
+        if SNAPSHOT_DIR:
+            adopt_snapshot()
+
+        stale = _run_index is None or (count is not None and count != _run_index_count)
+        metrics.cache_lookup('run_index', hit=not stale)
+        if stale and _run_index is not None and _run_index_high_water_mark is not None:
+            try:
+                since = (parse_uploaded_at(_run_index_high_water_mark) - HIGH_WATER_MARK_SLACK).isoformat()
+                runs, high_water_mark = fetch_runs(since)
+                new_runs = [run for run in runs if run.get('play_id') not in _run_index.run_ids]
+                new_runs.sort(key=lambda x: x.get('timestamp', 0))
+                with span('decode'):
+                    index = _run_index.extended(new_runs)
+                if count is None or len(index) == count:
+                    _run_index, _run_index_count, _run_index_high_water_mark = index, len(index), high_water_mark
+                    stale = False
+                    if new_runs:
+                        save_snapshot_in_background(_run_index, _run_index_high_water_mark)
+            except Exception as e:
+                print(f"Error fetching new runs from Supabase: {e}")
+
+        if stale:
+            with index_snapshot.snapshot_lock(SNAPSHOT_DIR):
+                # Another worker may have built the corpus while we waited
+                if SNAPSHOT_DIR and adopt_snapshot() and (count is None or count == _run_index_count):
+                    return _run_index
+
+                try:
+                    runs, high_water_mark = fetch_runs()
+                except Exception as e:
+                    print(f"Error loading runs from Supabase: {e}")
+                    runs, high_water_mark = [], None
+                with span('decode'):
+                    runs.sort(key=lambda x: x.get('timestamp', 0))
+                    _run_index = RunIndex(runs)
+                _run_index_count = count
+                _run_index_high_water_mark = high_water_mark
+                if runs:
+                    publish_snapshot(_run_index, high_water_mark)
+        return _run_index
+
+def publish_snapshot(index, high_water_mark):
+    """
+    Save index as the current snapshot and switch to the mapped copy, so this
+    worker shares memory with the others. Must be called holding _run_index_lock.
+    """
+    if not SNAPSHOT_DIR or high_water_mark is None:
+        return
+    import index_snapshot
+    try:
+        index_snapshot.save_snapshot(SNAPSHOT_DIR, index, high_water_mark)
+        _snapshot_state['saved_at'] = time.time()
+    except Exception as e:
+        print(f"Error saving run index snapshot: {e}")
+        return
+    if _run_index is index:
+        adopt_snapshot()
+
+def save_snapshot_in_background(index, high_water_mark, force=False):
+    """Publish a snapshot of index from a background thread (one at a time, throttled unless force)"""
+    if not SNAPSHOT_DIR or high_water_mark is None:
+        return
+    if not force and time.time() - _snapshot_state['saved_at'] < SNAPSHOT_INTERVAL_SECONDS:
+        return
+    if not _snapshot_writer_lock.acquire(blocking=False):
+        return
+    import index_snapshot
+
+    def save():
+        try:
+            index_snapshot.save_snapshot(SNAPSHOT_DIR, index, high_water_mark)
+            _snapshot_state['saved_at'] = time.time()
+            with _run_index_lock:
+                if _run_index is index:
+                    adopt_snapshot()
+        except Exception as e:
+            print(f"Error saving run index snapshot: {e}")
+        finally:
+            _snapshot_writer_lock.release()
+
+    try:
+        threading.Thread(target=save, name='run-index-snapshot', daemon=True).start()
+    except Exception:
+        _snapshot_writer_lock.release()
+        raise
+
+def prepare_snapshot():
+    """
+    Make sure an up-to-date snapshot is on disk, then drop the in-memory index
+    Called by gunicorn in the master process before workers are forked
+    (see gunicorn.conf.py), so every worker starts by mapping the snapshot.
+    """
+    global _run_index, _run_index_count, _run_index_high_water_mark, _snapshot_generation
+
+    if not SNAPSHOT_DIR or not is_supabase_configured():
+        return
+
+    # Save synchronously, after any background writer has finished: no
+    # background threads may be running at fork time
+    _snapshot_writer_lock.acquire()
+    try:
+        index = load_run_index()
+        with _run_index_lock:
+            if _snapshot_state['mapped'] is not index:
+                publish_snapshot(index, _run_index_high_water_mark)
+            print(f"Run index snapshot ready: {len(index)} runs")
+            _run_index = _run_index_count = _run_index_high_water_mark = _snapshot_generation = None
+            _snapshot_state['mapped'] = None
+    finally:
+        _snapshot_writer_lock.release()
+
+def add_runs_to_index(runs):
+    """
+    Index newly uploaded runs without reloading the whole corpus
+    Called from upload job threads: the index is replaced by an extended
+    copy so requests already holding it are unaffected. Runs already
+    indexed (a request rebuilt the index mid-upload) are skipped.
+    """
+    global _run_index, _run_index_count
+    from run_index import normalize_run
+
+    with _run_index_lock:
+        if _run_index is None or _run_index_count is None:
+            return
+        new_runs = [normalize_run(run) for run in runs if run.get('play_id') not in _run_index.run_ids]
+        _run_index = _run_index.extended(new_runs)
+        _run_index_count += len(new_runs)
+        if new_runs:
+            # Publish right away so the other workers pick the runs up
+            save_snapshot_in_background(_run_index, _run_index_high_water_mark, force=True)
+
+def runs_uploaded(runs):
+    """Called by upload jobs with the runs they inserted"""
+    add_runs_to_index(runs)
+    warm_cache()
+
+def filter_run_index(index, filters):
+    """Boolean mask of the indexed runs matching filters"""
+    with span('filter'):
+        metrics.runs_scanned(len(index))
+        return index.mask(filters)
+
+def corpus_version(source):
+    """
+    Version of the data behind a response (None if unknown)
+    'index' responses are computed from the run index, whose version changes
+    whenever runs are added. 'aggregates' responses come from the index too,
+    unless AGGREGATE_BACKEND is 'rpc': then the runs table row count is used.
+    """
+    if source == 'aggregates' and AGGREGATE_BACKEND == 'rpc':
+        count = count_runs()
+        return None if count is None else ('rpc', count)
+    return load_run_index().version
 
-    return pd.DataFrame(features)
+def cached_response(source):
+    """
+    Serve a view from the result cache, computing each response once
+    Responses are cached per endpoint, query parameters (in any order, empty
+    ones ignored) and corpus_version(source), so uploads invalidate them.
+    Concurrent identical misses share one execution and get a copy of its
+    response. ?profile=1 requests always run on their own.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def cached(*args, **kwargs):
+            if request.args.get('profile') == '1':
+                return view(*args, **kwargs)
+
+            version = corpus_version(source)
+            key = (
+                request.endpoint,
+                tuple(sorted(kwargs.items())),
+                tuple(sorted((name, value) for name, value in request.args.items(multi=True) if value != '')),
+                version
+            )
+            entry = _result_cache.get(key) if version is not None else None
+            if entry is None:
+                entry = _request_flight.do(key, render_response, view, args, kwargs, key if version is not None else None)
+            data, status, mimetype = entry
+            return app.response_class(data, status=status, mimetype=mimetype)
+        return cached
+    return decorator
+
+def render_response(view, args, kwargs, cache_key):
+    """(body, status, mimetype) of a view's response, cached under cache_key unless it is None"""
+    response = app.make_response(view(*args, **kwargs))
+    entry = (response.get_data(), response.status_code, response.mimetype)
+    if cache_key is not None and response.status_code < 500:
+        _result_cache.put(cache_key, entry, len(entry[0]))
+    return entry
 
 @app.route('/api/runs')
+@cached_response('index')
 def get_runs():
-    """Get all runs with optional filtering"""
-    runs = load_all_runs()
+    """
+    Get all runs with optional filtering
+    Uploaded runs hold only run_parser.ANALYTICS_FIELDS (fields such as
+    build_version are left out); /api/runs/<play_id> returns a complete run.
+    """
+    index = load_run_index()
 
     # Apply filters
     filters = {
@@ -109,15 +447,38 @@ def get_runs():
         'ignore_downfall': request.args.get('ignore_downfall')
     }
 
-    filtered_runs = apply_filters(runs, filters)
+    filtered_runs = index.select(filter_run_index(index, filters))
 
     return jsonify(filtered_runs)
 
+@app.route('/api/runs/<play_id>')
+def get_run(play_id):
+    """
+    Complete .run data for one run
+    /api/runs only has the fields analytics read; this decodes the run's
+    compressed archive (see run_archive.py).
+    """
+    if not is_supabase_configured():
+        return jsonify({'error': 'Supabase is not configured'}), 503
+
+    supabase = get_supabase_client()
+    if not supabase:
+        return jsonify({'error': 'Failed to connect to Supabase'}), 500
+
+    try:
+        run = run_archive.fetch_full_run(supabase, play_id)
+    except Exception as e:
+        print(f"Error fetching run {play_id}: {e}")
+        return jsonify({'error': f'Failed to fetch run: {str(e)}'}), 500
+
+    if run is None:
+        return jsonify({'error': 'Run not found'}), 404
+    return jsonify(run)
+
 @app.route('/api/stats')
+@cached_response('aggregates')
 def get_stats():
     """Get aggregate statistics"""
-    runs = load_all_runs()
-
     # Apply filters
     filters = {
         'character': request.args.get('character'),
@@ -127,41 +488,54 @@ def get_stats():
         'ignore_downfall': request.args.get('ignore_downfall')
     }
 
-    filtered_runs = apply_filters(runs, filters)
+    if AGGREGATE_BACKEND == 'rpc':
+        import db_aggregates
+        try:
+            with span('aggregate'):
+                summary = db_aggregates.run_summary(filters)
+        except Exception as e:
+            return jsonify({'error': f'Failed to fetch stats: {str(e)}'}), 500
+        if summary is None:
+            return jsonify({'error': 'No runs found'}), 404
+        return jsonify(summary)
+
+    index = load_run_index()
+    filtered_runs = index.select(filter_run_index(index, filters))
 
     if not filtered_runs:
         return jsonify({'error': 'No runs found'}), 404
 
-    # Calculate stats
-    total_runs = len(filtered_runs)
-    victories = sum(1 for r in filtered_runs if r.get('victory', False))
-    win_rate = victories / total_runs * 100 if total_runs > 0 else 0
-
-    # Character distribution
-    char_counts = {}
-    for r in filtered_runs:
-        char = r.get('character', 'Unknown')
-        char_counts[char] = char_counts.get(char, 0) + 1
-
-    # Average stats
-    avg_floor = sum(r.get('floor_reached', 0) for r in filtered_runs) / total_runs
-    avg_score = sum(r.get('score', 0) for r in filtered_runs) / total_runs
-    avg_playtime = sum(r.get('playtime', 0) for r in filtered_runs) / total_runs
-
-    # Highest scores
-    highest_score = max((r.get('score', 0) for r in filtered_runs), default=0)
-    deepest_floor = max((r.get('floor_reached', 0) for r in filtered_runs), default=0)
-
-    # Win rate by character
-    win_rate_by_char = {}
-    for char in char_counts.keys():
-        char_runs = [r for r in filtered_runs if r.get('character') == char]
-        char_wins = sum(1 for r in char_runs if r.get('victory', False))
-        win_rate_by_char[char] = {
-            'wins': char_wins,
-            'total': len(char_runs),
-            'win_rate': char_wins / len(char_runs) * 100 if char_runs else 0
-        }
+    with span('aggregate'):
+        # Calculate stats
+        total_runs = len(filtered_runs)
+        victories = sum(1 for r in filtered_runs if r.get('victory', False))
+        win_rate = victories / total_runs * 100 if total_runs > 0 else 0
+
+        # Character distribution
+        char_counts = {}
+        for r in filtered_runs:
+            char = r.get('character', 'Unknown')
+            char_counts[char] = char_counts.get(char, 0) + 1
+
+        # Average stats
+        avg_floor = sum(r.get('floor_reached', 0) for r in filtered_runs) / total_runs
+        avg_score = sum(r.get('score', 0) for r in filtered_runs) / total_runs
+        avg_playtime = sum(r.get('playtime', 0) for r in filtered_runs) / total_runs
+
+        # Highest scores
+        highest_score = max((r.get('score', 0) for r in filtered_runs), default=0)
+        deepest_floor = max((r.get('floor_reached', 0) for r in filtered_runs), default=0)
+
+        # Win rate by character
+        win_rate_by_char = {}
+        for char in char_counts.keys():
+            char_runs = [r for r in filtered_runs if r.get('character') == char]
+            char_wins = sum(1 for r in char_runs if r.get('victory', False))
+            win_rate_by_char[char] = {
+                'wins': char_wins,
+                'total': len(char_runs),
+                'win_rate': char_wins / len(char_runs) * 100 if char_runs else 0
+            }
 
     return jsonify({
         'total_runs': total_runs,
@@ -176,10 +550,77 @@ def get_stats():
         'deepest_floor': deepest_floor
     })
 
+@app.route('/api/trends')
+@cached_response('index')
+def get_trends():
+    """
+    Win rate, average floor and average score over time
+    ?interval=day|week|month (default week); ?group_by=character,ascension_level
+    splits the series (default character, empty for a single series).
+    Runs are bucketed by UTC day.
+    """
+    import numpy as np
+    from run_index import BASE_GAME_CHARACTERS, TREND_GROUPS, TREND_INTERVALS
+
+    index = load_run_index()
+
+    filters = {
+        'character': request.args.get('character'),
+        'start_date': request.args.get('start_date'),
+        'end_date': request.args.get('end_date'),
+        'ascension_level': request.args.get('ascension_level'),
+        'is_daily': request.args.get('is_daily'),
+        'ignore_downfall': request.args.get('ignore_downfall')
+    }
+
+    interval = request.args.get('interval', 'week')
+    if interval not in TREND_INTERVALS:
+        return jsonify({'error': f"interval must be one of: {', '.join(TREND_INTERVALS)}"}), 400
+    group_by = [name for name in request.args.get('group_by', 'character').split(',') if name]
+    if any(name not in TREND_GROUPS for name in group_by):
+        return jsonify({'error': f"group_by must be a comma-separated list of: {', '.join(TREND_GROUPS)}"}), 400
+
+    with span('aggregate'):
+        periods, series = index.trends.series(filters, interval, group_by, BASE_GAME_CHARACTERS)
+
+    if not series:
+        return jsonify({'error': 'No runs found'}), 404
+
+    result = []
+    for key, totals in series.items():
+        runs, victories, floors, scores = totals.T
+        with np.errstate(divide='ignore', invalid='ignore'):
+            averages = [np.where(runs > 0, values / runs, np.nan) for values in (victories * 100, floors, scores)]
+        entry = dict(zip(group_by, key))
+        entry['runs'] = runs.astype(int).tolist()
+        entry['victories'] = victories.astype(int).tolist()
+        for name, values in zip(('win_rate', 'avg_floor_reached', 'avg_score'), averages):
+            entry[name] = [None if np.isnan(value) else float(value) for value in values]
+        result.append(entry)
+
+    # Largest series first
+    result.sort(key=lambda entry: sum(entry['runs']), reverse=True)
+
+    return jsonify({
+        'interval': interval,
+        'group_by': group_by,
+        'periods': [str(period) for period in periods],
+        'series': result
+    })
+
+def finite_or_none(values):
+    """A number or array as JSON-safe Python values, with NaN and infinities (e.g. of constant features) as None"""
+    import numpy as np
+    values = np.asarray(values, dtype=float)
+    return np.where(np.isfinite(values), values, None).tolist()
+
 @app.route('/api/correlation')
+@cached_response('index')
 def get_correlation():
     """Get correlation matrix for all numerical features"""
-    runs = load_all_runs()
+    from correlation_stats import pearson_from_sums, FEATURE_NAMES
+
+    index = load_run_index()
 
     # Apply filters using the shared filter function
     filters = {
@@ -190,29 +631,36 @@ def get_correlation():
         'ignore_downfall': request.args.get('ignore_downfall')
     }
 
-    filtered_runs = apply_filters(runs, filters)
+    with span('aggregate'):
+        n, sums, cross = index.correlation_sums(filters)
 
-    if not filtered_runs:
+    if n == 0:
         return jsonify({'error': 'No runs found'}), 404
 
-    # Extract features
-    df = extract_features_for_correlation(filtered_runs)
-
-    # Calculate correlation matrix
-    corr_matrix = df.corr()
+    # Calculate correlation matrix from the running sums
+    with span('aggregate'):
+        corr_matrix, p_values, ci_low, ci_high = pearson_from_sums(n, sums, cross)
 
     # Convert to dict format for JSON
     result = {
-        'features': list(corr_matrix.columns),
-        'matrix': corr_matrix.values.tolist()
+        'features': FEATURE_NAMES,
+        'matrix': finite_or_none(corr_matrix),
+        'p_values': finite_or_none(p_values),
+        'ci_low': finite_or_none(ci_low),
+        'ci_high': finite_or_none(ci_high),
+        'n': int(n)
     }
 
     return jsonify(result)
 
 @app.route('/api/correlation/top')
+@cached_response('index')
 def get_top_correlations():
     """Get top correlations for specific target variables"""
-    runs = load_all_runs()
+    import pandas as pd
+    from correlation_stats import pearson_from_sums, FEATURE_NAMES
+
+    index = load_run_index()
 
     # Apply filters using the shared filter function
     filters = {
@@ -223,32 +671,36 @@ def get_top_correlations():
         'ignore_downfall': request.args.get('ignore_downfall')
     }
 
-    filtered_runs = apply_filters(runs, filters)
+    with span('aggregate'):
+        n, sums, cross = index.correlation_sums(filters)
 
-    if not filtered_runs:
+    if n == 0:
         return jsonify({'error': 'No runs found'}), 404
 
-    # Extract features
-    df = extract_features_for_correlation(filtered_runs)
+    with span('aggregate'):
+        corr_matrix, p_values, _, _ = pearson_from_sums(n, sums, cross)
+    corr = pd.DataFrame(corr_matrix, index=FEATURE_NAMES, columns=FEATURE_NAMES)
+    p_values = pd.DataFrame(p_values, index=FEATURE_NAMES, columns=FEATURE_NAMES)
 
     # Get top correlations for victory, floor_reached
     targets = ['victory', 'floor_reached', 'score']
     top_correlations = {}
 
     for target in targets:
-        if target in df.columns:
-            correlations = df.corr()[target].sort_values(ascending=False)
+        if target in corr.columns:
+            # Undefined correlations (a constant feature) have no rank
+            correlations = corr[target].dropna().sort_values(ascending=False)
             # Remove self-correlation
             correlations = correlations[correlations.index != target]
 
             top_correlations[target] = {
                 'positive': [
-                    {'feature': feat, 'correlation': float(corr)}
-                    for feat, corr in correlations.head(10).items()
+                    {'feature': feat, 'correlation': float(r), 'p_value': finite_or_none(p_values.at[feat, target])}
+                    for feat, r in correlations.head(10).items()
                 ],
                 'negative': [
-                    {'feature': feat, 'correlation': float(corr)}
-                    for feat, corr in correlations.tail(10).items()
+                    {'feature': feat, 'correlation': float(r), 'p_value': finite_or_none(p_values.at[feat, target])}
+                    for feat, r in correlations.tail(10).items()
                 ]
             }
 
@@ -256,6 +708,8 @@ def get_top_correlations():
 
 def apply_filters(runs, filters):
     """Apply common filters to runs"""
+    from run_index import BASE_GAME_CHARACTERS, date_bounds
+
     filtered = runs
 
     # Filter out modded characters if ignore_downfall is true
@@ -269,12 +723,12 @@ def apply_filters(runs, filters):
         # Check both 'character' and 'character_chosen' fields for compatibility
         filtered = [r for r in filtered if r.get('character_chosen', r.get('character')) == filters['character']]
 
-    if filters.get('start_date'):
-        start_ts = int(datetime.fromisoformat(filters['start_date']).timestamp())
+    # Whole UTC days, both included
+    start_ts, end_ts = date_bounds(filters)
+    if start_ts is not None:
         filtered = [r for r in filtered if r.get('timestamp', 0) >= start_ts]
 
-    if filters.get('end_date'):
-        end_ts = int(datetime.fromisoformat(filters['end_date']).timestamp())
+    if end_ts is not None:
         filtered = [r for r in filtered if r.get('timestamp', 0) <= end_ts]
 
     if filters.get('ascension_level') is not None and filters.get('ascension_level') != '':
@@ -292,9 +746,13 @@ def apply_filters(runs, filters):
     return filtered
 
 @app.route('/api/cards')
+@cached_response('aggregates')
 def get_card_stats():
     """Get card statistics including pick rates, upgrade rates, and victory correlation"""
-    runs = load_all_runs()
+    import numpy as np
+    from card_database import get_card_info
+    from confidence import parse_ci_mode, cached_rate_intervals, interval_at
+    from run_index import filter_fingerprint
 
     filters = {
         'character': request.args.get('character'),
@@ -307,117 +765,68 @@ def get_card_stats():
         'ignore_downfall': request.args.get('ignore_downfall')
     }
 
-    filtered_runs = apply_filters(runs, filters)
-
-    if not filtered_runs:
-        return jsonify({'error': 'No runs found'}), 404
-
-    card_stats = {}
-
-    # Non-card options that can appear in card choices (relics, special events)
-    NON_CARD_OPTIONS = {'Singing Bowl'}
-
-    def get_base_card_name(card_name):
-        """Strip upgrade suffix from card name"""
-        if card_name.endswith('+1'):
-            return card_name[:-2], True
-        return card_name, False
-
-    for run in filtered_runs:
-        victory = run.get('victory', False)
-        character = run.get('character', '')
-
-        # Process card choices
-        for choice in run.get('card_choices', []):
-            picked = choice.get('picked')
-            if picked and picked != 'SKIP' and picked not in NON_CARD_OPTIONS:
-                base_card, is_upgraded = get_base_card_name(picked)
-
-                if base_card not in card_stats:
-                    card_stats[base_card] = {
-                        'picks': 0,
-                        'picked_upgraded': 0,
-                        'victories': 0,
-                        'skips_when_available': 0,
-                        'times_available': 0,
-                        'characters': set()
-                    }
-                card_stats[base_card]['picks'] += 1
-                if is_upgraded:
-                    card_stats[base_card]['picked_upgraded'] += 1
-                card_stats[base_card]['characters'].add(character)
-                if victory:
-                    card_stats[base_card]['victories'] += 1
-
-            # Track when cards were available but skipped
-            for not_picked in choice.get('not_picked', []):
-                if not_picked in NON_CARD_OPTIONS:
-                    continue
-
-                base_card, is_upgraded = get_base_card_name(not_picked)
-
-                if base_card not in card_stats:
-                    card_stats[base_card] = {
-                        'picks': 0,
-                        'picked_upgraded': 0,
-                        'victories': 0,
-                        'skips_when_available': 0,
-                        'times_available': 0,
-                        'characters': set()
-                    }
-                card_stats[base_card]['times_available'] += 1
-                if picked == 'SKIP':
-                    card_stats[base_card]['skips_when_available'] += 1
-
-        # Process campfire upgrades
-        for choice in run.get('campfire_choices', []):
-            if choice.get('key') == 'SMITH':
-                card = choice.get('data')
-                if card:
-                    base_card, _ = get_base_card_name(card)
-
-                    if base_card not in card_stats:
-                        card_stats[base_card] = {
-                            'picks': 0,
-                            'picked_upgraded': 0,
-                            'victories': 0,
-                            'campfire_upgrades': 0,
-                            'skips_when_available': 0,
-                            'times_available': 0,
-                            'characters': set()
-                        }
-                    if 'campfire_upgrades' not in card_stats[base_card]:
-                        card_stats[base_card]['campfire_upgrades'] = 0
-                    card_stats[base_card]['campfire_upgrades'] += 1
+    if AGGREGATE_BACKEND == 'rpc':
+        import db_aggregates
+        try:
+            with span('aggregate'):
+                card_names, character_names, card_stats = db_aggregates.card_counts(filters)
+        except Exception as e:
+            return jsonify({'error': f'Failed to fetch card stats: {str(e)}'}), 500
+        if not card_names:
+            return jsonify({'error': 'No runs found'}), 404
+        version = None
+    else:
+        index = load_run_index()
+        run_mask = filter_run_index(index, filters)
+
+        if not run_mask.any():
+            return jsonify({'error': 'No runs found'}), 404
+
+        with span('aggregate'):
+            card_stats = index.card_events.counts(run_mask, index.victory, index.character, len(index.characters))
+        card_names, character_names, version = index.card_events.cards.names, index.characters.names, index.version
+
+    # Optional confidence intervals (?ci=wilson|bootstrap|all)
+    ci_mode = parse_ci_mode(request.args.get('ci'))
+    if ci_mode:
+        times_available = card_stats['picks'] + card_stats['offered'] + card_stats['skipped']
+        intervals = cached_rate_intervals('cards', filter_fingerprint(filters), version, ci_mode, {
+            'win_rate': (card_stats['victories'], card_stats['picks']),
+            'pick_rate': (card_stats['picks'], times_available)
+        })
 
     # Calculate rates and correlations
     result = []
-    for card, stats in card_stats.items():
-        picks = stats['picks']
-        if picks > 0:
-            # Get card metadata from database
-            card_info = get_card_info(card)
-
-            win_rate = (stats['victories'] / picks) * 100
-            picked_upgraded = stats.get('picked_upgraded', 0)
-            campfire_upgrades = stats.get('campfire_upgrades', 0)
-            times_available = stats['times_available'] + picks
-            pick_rate = (picks / times_available * 100) if times_available > 0 else 0
+    for card_id in np.flatnonzero(card_stats['picks']):
+        card = card_names[card_id]
+        picks = int(card_stats['picks'][card_id])
+
+        # Get card metadata from database
+        card_info = get_card_info(card)
+
+        victories = int(card_stats['victories'][card_id])
+        win_rate = (victories / picks) * 100
+        times_available = int(card_stats['offered'][card_id] + card_stats['skipped'][card_id]) + picks
+        pick_rate = (picks / times_available * 100) if times_available > 0 else 0
+
+        result.append({
+            'card': card_info['display_name'],  # Use proper display name
+            'rarity': card_info['rarity'],
+            'character': card_info['character'],
+            'type': card_info['type'],
+            'picks': picks,
+            'pick_rate': pick_rate,
+            'picked_upgraded': int(card_stats['picked_upgraded'][card_id]),
+            'campfire_upgrades': int(card_stats['campfire_upgrades'][card_id]),
+            'win_rate': win_rate,
+            'victories': victories,
+            'times_available': times_available,
+            'characters': [character_names[c] for c in np.flatnonzero(card_stats['characters'][card_id])]
+        })
 
-            result.append({
-                'card': card_info['display_name'],  # Use proper display name
-                'rarity': card_info['rarity'],
-                'character': card_info['character'],
-                'type': card_info['type'],
-                'picks': picks,
-                'pick_rate': pick_rate,
-                'picked_upgraded': picked_upgraded,
-                'campfire_upgrades': campfire_upgrades,
-                'win_rate': win_rate,
-                'victories': stats['victories'],
-                'times_available': times_available,
-                'characters': list(stats['characters'])
-            })
+        if ci_mode:
+            result[-1]['win_rate_ci'] = interval_at(intervals['win_rate'], card_id)
+            result[-1]['pick_rate_ci'] = interval_at(intervals['pick_rate'], card_id)
 
     # Apply rarity filter
     rarity_filter = filters.get('rarity')
@@ -437,10 +846,14 @@ def get_card_stats():
 
     return jsonify(result)
 
-@app.route('/api/enemies')
-def get_enemy_stats():
-    """Get enemy statistics including encounters, defeat rates, and damage taken"""
-    runs = load_all_runs()
+@app.route('/api/cards/floors')
+@cached_response('index')
+def get_card_floor_stats():
+    """Get pick rate by floor, for a single card (?card=) or for all cards"""
+    import numpy as np
+    from run_index import get_base_card_name
+
+    index = load_run_index()
 
     filters = {
         'character': request.args.get('character'),
@@ -452,75 +865,133 @@ def get_enemy_stats():
         'ignore_downfall': request.args.get('ignore_downfall')
     }
 
-    filtered_runs = apply_filters(runs, filters)
+    run_mask = filter_run_index(index, filters)
 
-    if not filtered_runs:
+    if not run_mask.any():
         return jsonify({'error': 'No runs found'}), 404
 
-    enemy_stats = {}
-
-    for run in filtered_runs:
-        victory = run.get('victory', False)
-        killed_by = run.get('killed_by')
-
-        for damage_event in run.get('damage_taken', []):
-            enemy = damage_event.get('enemies')
-            damage = damage_event.get('damage', 0)
-            turns = damage_event.get('turns', 0)
-            floor = damage_event.get('floor', 0)
-
-            if enemy:
-                if enemy not in enemy_stats:
-                    enemy_stats[enemy] = {
-                        'encounters': 0,
-                        'total_damage': 0,
-                        'total_turns': 0,
-                        'defeats_player': 0,
-                        'in_victories': 0,
-                        'in_defeats': 0
-                    }
-
-                enemy_stats[enemy]['encounters'] += 1
-                enemy_stats[enemy]['total_damage'] += damage
-                enemy_stats[enemy]['total_turns'] += turns
-
-                if victory:
-                    enemy_stats[enemy]['in_victories'] += 1
-                else:
-                    enemy_stats[enemy]['in_defeats'] += 1
+    card_id = None
+    card = request.args.get('card')
+    if card:
+        base_card, _ = get_base_card_name(card)
+        if base_card not in index.card_events.cards:
+            return jsonify({'error': f'Card not found: {card}'}), 404
+        card_id = index.card_events.cards.ids[base_card]
 
-                if killed_by == enemy:
-                    enemy_stats[enemy]['defeats_player'] += 1
+    with span('aggregate'):
+        picks, shown, skips = index.card_events.floor_counts(run_mask, card_id)
 
-    # Calculate averages
     result = []
-    for enemy, stats in enemy_stats.items():
-        encounters = stats['encounters']
-        if encounters > 0:
-            avg_damage = stats['total_damage'] / encounters
-            avg_turns = stats['total_turns'] / encounters
-            defeat_rate = (stats['defeats_player'] / encounters) * 100
+    for floor in np.flatnonzero(shown):
+        result.append({
+            'floor': int(floor),
+            'picks': int(picks[floor]),
+            'times_available': int(shown[floor]),
+            'skips': int(skips[floor]),
+            'pick_rate': float(picks[floor] / shown[floor] * 100)
+        })
 
-            result.append({
-                'enemy': enemy,
-                'encounters': encounters,
-                'avg_damage': avg_damage,
-                'avg_turns': avg_turns,
-                'defeats_player': stats['defeats_player'],
-                'defeat_rate': defeat_rate,
-                'in_victories': stats['in_victories'],
-                'in_defeats': stats['in_defeats']
-            })
+    return jsonify(result)
 
-    # Sort by encounters descending
-    result.sort(key=lambda x: x['encounters'], reverse=True)
+@app.route('/api/enemies')
+@cached_response('aggregates')
+def get_enemy_stats():
+    """Get enemy statistics including encounters, defeat rates, and damage taken"""
+    filters = {
+        'character': request.args.get('character'),
+        'start_date': request.args.get('start_date'),
+        'end_date': request.args.get('end_date'),
+        'ascension_level': request.args.get('ascension_level'),
+        'victory': request.args.get('victory'),
+        'is_daily': request.args.get('is_daily'),
+        'ignore_downfall': request.args.get('ignore_downfall')
+    }
+
+    if AGGREGATE_BACKEND == 'rpc':
+        import db_aggregates
+        try:
+            with span('aggregate'):
+                enemy_stats = db_aggregates.enemy_stats(filters)
+        except Exception as e:
+            return jsonify({'error': f'Failed to fetch enemy stats: {str(e)}'}), 500
+        if not enemy_stats:
+            return jsonify({'error': 'No runs found'}), 404
+    else:
+        index = load_run_index()
+        filtered_runs = index.select(filter_run_index(index, filters))
+
+        if not filtered_runs:
+            return jsonify({'error': 'No runs found'}), 404
+
+        with span('aggregate'):
+            enemy_stats = {}
+
+            for run in filtered_runs:
+                victory = run.get('victory', False)
+                killed_by = run.get('killed_by')
+
+                for damage_event in run.get('damage_taken', []):
+                    enemy = damage_event.get('enemies')
+                    damage = damage_event.get('damage', 0)
+                    turns = damage_event.get('turns', 0)
+                    floor = damage_event.get('floor', 0)
+
+                    if enemy:
+                        if enemy not in enemy_stats:
+                            enemy_stats[enemy] = {
+                                'encounters': 0,
+                                'total_damage': 0,
+                                'total_turns': 0,
+                                'defeats_player': 0,
+                                'in_victories': 0,
+                                'in_defeats': 0
+                            }
+
+                        enemy_stats[enemy]['encounters'] += 1
+                        enemy_stats[enemy]['total_damage'] += damage
+                        enemy_stats[enemy]['total_turns'] += turns
+
+                        if victory:
+                            enemy_stats[enemy]['in_victories'] += 1
+                        else:
+                            enemy_stats[enemy]['in_defeats'] += 1
+
+                        if killed_by == enemy:
+                            enemy_stats[enemy]['defeats_player'] += 1
+
+    with span('aggregate'):
+        # Calculate averages
+        result = []
+        for enemy, stats in enemy_stats.items():
+            encounters = stats['encounters']
+            if encounters > 0:
+                avg_damage = stats['total_damage'] / encounters
+                avg_turns = stats['total_turns'] / encounters
+                defeat_rate = (stats['defeats_player'] / encounters) * 100
+
+                result.append({
+                    'enemy': enemy,
+                    'encounters': encounters,
+                    'avg_damage': avg_damage,
+                    'avg_turns': avg_turns,
+                    'defeats_player': stats['defeats_player'],
+                    'defeat_rate': defeat_rate,
+                    'in_victories': stats['in_victories'],
+                    'in_defeats': stats['in_defeats']
+                })
+
+        # Sort by encounters descending
+        result.sort(key=lambda x: x['encounters'], reverse=True)
 
     return jsonify(result)
 
 @app.route('/api/relics')
+@cached_response('aggregates')
 def get_relic_stats():
     """Get relic statistics including pick rates and victory correlation"""
-    runs = load_all_runs()
+    import numpy as np
+    from confidence import parse_ci_mode, cached_rate_intervals, interval_at
+    from run_index import RELIC_SOURCES, filter_fingerprint
 
     filters = {
         'character': request.args.get('character'),
@@ -532,87 +1003,62 @@ def get_relic_stats():
         'ignore_downfall': request.args.get('ignore_downfall')
     }
 
-    filtered_runs = apply_filters(runs, filters)
-
-    if not filtered_runs:
-        return jsonify({'error': 'No runs found'}), 404
-
-    relic_stats = {}
-
-    for run in filtered_runs:
-        victory = run.get('victory', False)
-        character = run.get('character', '')
-
-        # Process relics obtained
-        for relic_event in run.get('relics_obtained', []):
-            relic = relic_event.get('key')
-            if relic:
-                if relic not in relic_stats:
-                    relic_stats[relic] = {
-                        'picks': 0,
-                        'victories': 0,
-                        'times_available': 0,
-                        'characters': set()
-                    }
-                relic_stats[relic]['picks'] += 1
-                relic_stats[relic]['characters'].add(character)
-                if victory:
-                    relic_stats[relic]['victories'] += 1
-
-        # Process boss relics
-        for boss_relic in run.get('boss_relics', []):
-            picked = boss_relic.get('picked')
-            if picked:
-                if picked not in relic_stats:
-                    relic_stats[picked] = {
-                        'picks': 0,
-                        'victories': 0,
-                        'times_available': 0,
-                        'characters': set()
-                    }
-                relic_stats[picked]['picks'] += 1
-                relic_stats[picked]['characters'].add(character)
-                if victory:
-                    relic_stats[picked]['victories'] += 1
-
-            # Track availability
-            for not_picked in boss_relic.get('not_picked', []):
-                if not_picked not in relic_stats:
-                    relic_stats[not_picked] = {
-                        'picks': 0,
-                        'victories': 0,
-                        'times_available': 0,
-                        'characters': set()
-                    }
-                relic_stats[not_picked]['times_available'] += 1
-
-        # Also count relics in final deck (some may be starter relics)
-        for relic in run.get('relics', []):
-            if relic not in relic_stats:
-                relic_stats[relic] = {
-                    'picks': 0,
-                    'victories': 0,
-                    'times_available': 0,
-                    'characters': set()
-                }
-            # Only count if not already counted
-            # This helps capture starter relics
+    if AGGREGATE_BACKEND == 'rpc':
+        import db_aggregates
+        try:
+            with span('aggregate'):
+                relic_names, character_names, relic_stats = db_aggregates.relic_counts(filters)
+        except Exception as e:
+            return jsonify({'error': f'Failed to fetch relic stats: {str(e)}'}), 500
+        if not relic_names:
+            return jsonify({'error': 'No runs found'}), 404
+        version = None
+    else:
+        index = load_run_index()
+        run_mask = filter_run_index(index, filters)
+
+        if not run_mask.any():
+            return jsonify({'error': 'No runs found'}), 404
+
+        with span('aggregate'):
+            relic_stats = index.relic_events.counts(run_mask, index.victory, index.character, len(index.characters))
+        relic_names, character_names, version = index.relic_events.relics.names, index.characters.names, index.version
+
+    # Optional confidence intervals (?ci=wilson|bootstrap|all)
+    ci_mode = parse_ci_mode(request.args.get('ci'))
+    if ci_mode:
+        intervals = cached_rate_intervals('relics', filter_fingerprint(filters), version, ci_mode, {
+            'win_rate': (relic_stats['victories'], relic_stats['picks']),
+            'boss_pick_rate': (relic_stats['boss_picks'], relic_stats['boss_offers'])
+        })
 
     # Calculate rates
     result = []
-    for relic, stats in relic_stats.items():
-        picks = stats['picks']
-        if picks > 0:
-            win_rate = (stats['victories'] / picks) * 100
+    for relic_id in np.flatnonzero(relic_stats['picks']):
+        picks = int(relic_stats['picks'][relic_id])
+        victories = int(relic_stats['victories'][relic_id])
+        boss_offers = int(relic_stats['boss_offers'][relic_id])
+        boss_picks = int(relic_stats['boss_picks'][relic_id])
+
+        result.append({
+            'relic': relic_names[relic_id],
+            'picks': picks,
+            'win_rate': (victories / picks) * 100,
+            'victories': victories,
+            'defeats': picks - victories,
+            'sources': {
+                source: int(count)
+                for source, count in zip(RELIC_SOURCES, relic_stats['sources'][relic_id]) if count
+            },
+            'boss_offers': boss_offers,
+            'boss_pick_rate': (boss_picks / boss_offers * 100) if boss_offers > 0 else None,
+            'held_at_death': int(relic_stats['held_at_death'][relic_id]),
+            'characters': [character_names[c] for c in np.flatnonzero(relic_stats['characters'][relic_id])]
+        })
 
-            result.append({
-                'relic': relic,
-                'picks': picks,
-                'win_rate': win_rate,
-                'victories': stats['victories'],
-                'defeats': picks - stats['victories'],
-                'characters': list(stats['characters'])
-            })
+        if ci_mode:
+            result[-1]['win_rate_ci'] = interval_at(intervals['win_rate'], relic_id)
+            result[-1]['boss_pick_rate_ci'] = interval_at(intervals['boss_pick_rate'], relic_id)
 
     # Filter out Downfall mod relics (if ignore_downfall is enabled)
     # Downfall relics have specific prefixes like "collector:", "hermit:", "sneckomod:", etc.
@@ -627,11 +1073,539 @@ def get_relic_stats():
 
     return jsonify(result)
 
+@app.route('/api/synergy')
+@cached_response('index')
+def get_synergy():
+    """
+    Card pairs (or card-relic pairs with ?partner=relics) that appear together
+    in final decks, with their win rate against each item's own win rate
+    ?card= limits the pairs to one card; ?sort= is synergy (default), win_rate
+    or runs; ?min_runs= (default 10) and ?k= (default 20) bound the result.
+    """
+    import numpy as np
+    from scipy import sparse
+    from card_database import get_card_info
+    from confidence import parse_ci_mode, rate_intervals, interval_at
+    from run_index import split_deck_card
+
+    filters = {
+        'character': request.args.get('character'),
+        'start_date': request.args.get('start_date'),
+        'end_date': request.args.get('end_date'),
+        'ascension_level': request.args.get('ascension_level'),
+        'victory': request.args.get('victory'),
+        'is_daily': request.args.get('is_daily'),
+        'ignore_downfall': request.args.get('ignore_downfall')
+    }
+
+    partner = request.args.get('partner', 'cards')
+    sort = request.args.get('sort', 'synergy')
+    if partner not in ('cards', 'relics'):
+        return jsonify({'error': 'partner must be cards or relics'}), 400
+    if sort not in ('synergy', 'win_rate', 'runs'):
+        return jsonify({'error': 'sort must be synergy, win_rate or runs'}), 400
+    try:
+        k = max(1, min(int(request.args.get('k', 20)), 200))
+        min_runs = max(1, int(request.args.get('min_runs', 10)))
+    except ValueError:
+        return jsonify({'error': 'k and min_runs must be integers'}), 400
+
+    index = load_run_index()
+    if not filter_run_index(index, filters).any():
+        return jsonify({'error': 'No runs found'}), 404
+    card_names, relic_names = index.decks.cards.names, index.relic_events.relics.names
+
+    card_id = None
+    card = request.args.get('card')
+    if card:
+        base_card, _ = split_deck_card(card)
+        if base_card not in index.decks.cards:
+            return jsonify({'error': f'Card not found: {card}'}), 404
+        card_id = index.decks.cards.ids[base_card]
+
+    with span('aggregate'):
+        sums = index.synergy_sums(filters)
+        card_runs = sums['card_card_runs'].diagonal()
+        card_victories = sums['card_card_victories'].diagonal()
+        if partner == 'cards':
+            pair_runs, pair_victories = sums['card_card_runs'], sums['card_card_victories']
+            partner_names, partner_runs, partner_victories = card_names, card_runs, card_victories
+        else:
+            pair_runs, pair_victories = sums['card_relic_runs'], sums['card_relic_victories']
+            partner_names, partner_runs, partner_victories = relic_names, sums['relic_runs'], sums['relic_victories']
+
+        if card_id is not None:
+            pair_runs = pair_runs[card_id].tocoo()
+            rows = np.full(pair_runs.nnz, card_id)
+        else:
+            # Each card pair once
+            pair_runs = sparse.triu(pair_runs, k=1, format='coo') if partner == 'cards' else pair_runs.tocoo()
+            rows = pair_runs.row
+        cols, runs = pair_runs.col, pair_runs.data
+
+        keep = (runs >= min_runs) & ~((partner == 'cards') & (rows == cols))
+        ignore_downfall = filters.get('ignore_downfall')
+        if ignore_downfall and ignore_downfall.lower() == 'true':
+            # Downfall items have prefixes like "collector:", "hermit:", ...
+            downfall_prefixes = ('collector:', 'hermit:', 'slimebound:', 'guardian:', 'snecko:', 'sneckomod:', 'gremlin:', 'champ:', 'automaton:', 'spirit:', 'bronze:')
+            is_downfall = np.asarray([name.lower().startswith(downfall_prefixes) for name in card_names], dtype=bool)
+            partner_downfall = is_downfall if partner == 'cards' else np.asarray(
+                [name.lower().startswith(downfall_prefixes) for name in relic_names], dtype=bool)
+            keep &= ~is_downfall[rows] & ~partner_downfall[cols]
+        rows, cols, runs = rows[keep], cols[keep], runs[keep]
+
+        victories = np.asarray(pair_victories[rows, cols]).ravel()
+        win_rate = victories / runs * 100
+        card_win_rate = card_victories[rows] / card_runs[rows] * 100
+        partner_win_rate = partner_victories[cols] / partner_runs[cols] * 100
+        synergy = win_rate - np.maximum(card_win_rate, partner_win_rate)
+
+        order = {'synergy': synergy, 'win_rate': win_rate, 'runs': runs}[sort]
+        top = np.argsort(-order, kind='stable')[:k]
+
+    # Optional confidence intervals (?ci=wilson|bootstrap|all) for the pair win rates
+    ci_mode = parse_ci_mode(request.args.get('ci'))
+    if ci_mode:
+        intervals = rate_intervals(victories[top], runs[top], ci_mode)
+
+    def display_name(name):
+        return get_card_info(name)['display_name'] if partner == 'cards' else name
+
+    result = []
+    for i, pair in enumerate(top):
+        result.append({
+            'card': get_card_info(card_names[rows[pair]])['display_name'],
+            'partner': display_name(partner_names[cols[pair]]),
+            'runs': int(runs[pair]),
+            'victories': int(victories[pair]),
+            'win_rate': float(win_rate[pair]),
+            'card_win_rate': float(card_win_rate[pair]),
+            'partner_win_rate': float(partner_win_rate[pair]),
+            'synergy': float(synergy[pair])
+        })
+        if ci_mode:
+            result[-1]['win_rate_ci'] = interval_at(intervals, i)
+
+    return jsonify(result)
+
+@app.route('/api/paths')
+@cached_response('index')
+def get_path_stats():
+    """
+    Map paths per act: average rooms of each type per run reaching the act,
+    and runs and win rate by number of elites fought in the act
+    """
+    import numpy as np
+    from run_index import ACTS, FLOORS_PER_ACT, ROOM_ELITE, ROOM_NAMES
+
+    index = load_run_index()
+
+    filters = {
+        'character': request.args.get('character'),
+        'start_date': request.args.get('start_date'),
+        'end_date': request.args.get('end_date'),
+        'ascension_level': request.args.get('ascension_level'),
+        'victory': request.args.get('victory'),
+        'is_daily': request.args.get('is_daily'),
+        'ignore_downfall': request.args.get('ignore_downfall')
+    }
+
+    run_mask = filter_run_index(index, filters)
+    if not run_mask.any():
+        return jsonify({'error': 'No runs found'}), 404
+
+    with span('aggregate'):
+        lengths = index.paths.lengths()
+        acts = []
+        for act in range(ACTS):
+            reached = run_mask & (lengths > act * FLOORS_PER_ACT)
+            runs = int(reached.sum())
+            if not runs:
+                continue
+            counts = index.paths.act_counts[reached, act]
+            won = index.victory[reached]
+            elites = counts[:, ROOM_ELITE]
+            elite_runs = np.bincount(elites)
+            elite_victories = np.bincount(elites, weights=won)
+            acts.append({
+                'act': act + 1,
+                'runs': runs,
+                'rooms': {name: float(average) for name, average in zip(ROOM_NAMES[1:], counts[:, 1:].mean(axis=0))},
+                'elites': [
+                    {
+                        'elites': int(n),
+                        'runs': int(elite_runs[n]),
+                        'victories': int(elite_victories[n]),
+                        'win_rate': float(elite_victories[n] / elite_runs[n] * 100)
+                    }
+                    for n in np.flatnonzero(elite_runs)
+                ]
+            })
+
+    return jsonify({'runs': int(run_mask.sum()), 'acts': acts})
+
+@app.route('/api/paths/prefix')
+@cached_response('index')
+def get_path_prefix_stats():
+    """
+    Win rate of the runs whose path starts with ?prefix= (room symbols from
+    floor 1, e.g. M?ME; - for floors without a room) and of each room taken next
+    """
+    import numpy as np
+
+    index = load_run_index()
+
+    filters = {
+        'character': request.args.get('character'),
+        'start_date': request.args.get('start_date'),
+        'end_date': request.args.get('end_date'),
+        'ascension_level': request.args.get('ascension_level'),
+        'victory': request.args.get('victory'),
+        'is_daily': request.args.get('is_daily'),
+        'ignore_downfall': request.args.get('ignore_downfall')
+    }
+
+    symbols = list(request.args.get('prefix', ''))
+    prefix = index.paths.encode(symbols)
+    if prefix is None:
+        return jsonify({'error': f"Unknown room type in prefix: {''.join(symbols)}"}), 400
+
+    run_mask = filter_run_index(index, filters)
+
+    with span('aggregate'):
+        run_ids = index.paths.prefix_runs(prefix)
+        run_ids = run_ids[run_mask[run_ids]]
+        if not len(run_ids):
+            return jsonify({'error': 'No runs found'}), 404
+        won = index.victory[run_ids]
+        next_rooms = index.paths.next_rooms(run_ids, len(prefix))
+        taken = np.flatnonzero(np.bincount(next_rooms[next_rooms >= 0], minlength=len(index.paths.room_types)))
+
+        result = {
+            'prefix': ''.join(symbols),
+            'runs': len(run_ids),
+            'victories': int(won.sum()),
+            'win_rate': float(won.mean() * 100),
+            'ended': int((next_rooms < 0).sum()),
+            'next': []
+        }
+        for room in taken:
+            next_won = won[next_rooms == room]
+            result['next'].append({
+                'room': index.paths.room_types.names[room],
+                'runs': len(next_won),
+                'victories': int(next_won.sum()),
+                'win_rate': float(next_won.mean() * 100)
+            })
+        result['next'].sort(key=lambda x: x['runs'], reverse=True)
+
+    return jsonify(result)
+
+def choice_summary(counts, i, baseline, character_names):
+    """
+    Count, frequency, win rate and win-rate delta of choice i of grouped
+    counts (see run_index.grouped_counts) against baseline, the totals of
+    the choices it competes with (rows, victories and both per character),
+    plus the same per character
+    """
+    import numpy as np
+
+    rows, victories = int(counts['rows'][i]), float(counts['victories'][i])
+    base_rows, base_victories, base_character_rows, base_character_victories = baseline
+    win_rate = victories / rows * 100
+    summary = {
+        'count': rows,
+        'frequency': rows / base_rows * 100,
+        'win_rate': win_rate,
+        'win_rate_delta': win_rate - base_victories / base_rows * 100,
+        'characters': []
+    }
+    for c in np.flatnonzero(counts['character_rows'][i]):
+        character_rows = int(counts['character_rows'][i, c])
+        character_win_rate = counts['character_victories'][i, c] / character_rows * 100
+        summary['characters'].append({
+            'character': character_names[c],
+            'count': character_rows,
+            'win_rate': float(character_win_rate),
+            'win_rate_delta': float(character_win_rate - base_character_victories[c] / base_character_rows[c] * 100)
+        })
+    return summary
+
+@app.route('/api/events')
+@cached_response('index')
+def get_event_stats():
+    """
+    Event choices: how often each choice is taken, its average outcome and
+    its win rate against the event's, overall and by character
+    """
+    import numpy as np
+
+    index = load_run_index()
+
+    filters = {
+        'character': request.args.get('character'),
+        'start_date': request.args.get('start_date'),
+        'end_date': request.args.get('end_date'),
+        'ascension_level': request.args.get('ascension_level'),
+        'victory': request.args.get('victory'),
+        'is_daily': request.args.get('is_daily'),
+        'ignore_downfall': request.args.get('ignore_downfall')
+    }
+
+    run_mask = filter_run_index(index, filters)
+    if not run_mask.any():
+        return jsonify({'error': 'No runs found'}), 404
+
+    with span('aggregate'):
+        counts = index.events.counts(run_mask, index.victory, index.character, len(index.characters))
+        labels, character_names = index.events.labels.names, index.characters.names
+
+        # Per event totals over its choices
+        events, event_of_pair = np.unique(counts['events'], return_inverse=True)
+        totals = [np.zeros((len(events),) + counts[name].shape[1:]) for name in ('rows', 'victories', 'character_rows', 'character_victories')]
+        for total, name in zip(totals, ('rows', 'victories', 'character_rows', 'character_victories')):
+            np.add.at(total, event_of_pair, counts[name])
+
+        result = []
+        for e, event in enumerate(events):
+            encounters = int(totals[0][e])
+            result.append({
+                'event': labels[event],
+                'encounters': encounters,
+                'win_rate': float(totals[1][e] / encounters * 100),
+                'choices': []
+            })
+            for i in np.flatnonzero(event_of_pair == e):
+                rows = counts['rows'][i]
+                choice = choice_summary(counts, i, tuple(total[e] for total in totals), character_names)
+                choice['choice'] = labels[counts['choices'][i]]
+                for name in ('hp_delta', 'gold_delta', 'max_hp_delta', 'cards_gained', 'relics_gained'):
+                    choice[f'avg_{name}'] = float(counts[name][i] / rows)
+                result[-1]['choices'].append(choice)
+            result[-1]['choices'].sort(key=lambda x: x['count'], reverse=True)
+
+    result.sort(key=lambda x: x['encounters'], reverse=True)
+    return jsonify(result)
+
+@app.route('/api/neow')
+@cached_response('index')
+def get_neow_stats():
+    """Neow's blessing: how often each bonus and cost is chosen and its win rate against all runs, overall and by character"""
+    index = load_run_index()
+
+    filters = {
+        'character': request.args.get('character'),
+        'start_date': request.args.get('start_date'),
+        'end_date': request.args.get('end_date'),
+        'ascension_level': request.args.get('ascension_level'),
+        'victory': request.args.get('victory'),
+        'is_daily': request.args.get('is_daily'),
+        'ignore_downfall': request.args.get('ignore_downfall')
+    }
+
+    run_mask = filter_run_index(index, filters)
+    with span('aggregate'):
+        counts = index.neow.counts(run_mask, index.victory, index.character, len(index.characters))
+        if not counts['bonuses']['rows'].sum():
+            return jsonify({'error': 'No runs found'}), 404
+        labels, character_names = index.neow.labels.names, index.characters.names
+
+        bonuses = counts['bonuses']
+        baseline = tuple(bonuses[name].sum(axis=0) for name in ('rows', 'victories', 'character_rows', 'character_victories'))
+        result = {
+            'runs': int(baseline[0]),
+            'win_rate': float(baseline[1] / baseline[0] * 100)
+        }
+        for kind, key in (('bonuses', 'bonus'), ('costs', 'cost')):
+            result[kind] = []
+            for i, label in enumerate(counts[kind]['keys']):
+                summary = choice_summary(counts[kind], i, baseline, character_names)
+                summary[key] = labels[label]
+                result[kind].append(summary)
+            result[kind].sort(key=lambda x: x['count'], reverse=True)
+
+    return jsonify(result)
+
+@app.route('/api/shops')
+@cached_response('index')
+def get_shop_stats():
+    """
+    Shop economics: gold spent per act, win rate of runs buying each item
+    against runs that visited a shop, and outcomes by the share of earned
+    gold spent in shops (?min_runs= bounds the items, default 5)
+    """
+    import numpy as np
+    from correlation_stats import FEATURE_NAMES
+    from run_index import ACTS, FLOORS_PER_ACT
+
+    index = load_run_index()
+
+    filters = {
+        'character': request.args.get('character'),
+        'start_date': request.args.get('start_date'),
+        'end_date': request.args.get('end_date'),
+        'ascension_level': request.args.get('ascension_level'),
+        'victory': request.args.get('victory'),
+        'is_daily': request.args.get('is_daily'),
+        'ignore_downfall': request.args.get('ignore_downfall')
+    }
+
+    try:
+        min_runs = max(1, int(request.args.get('min_runs', 5)))
+    except ValueError:
+        return jsonify({'error': 'min_runs must be an integer'}), 400
+
+    run_mask = filter_run_index(index, filters)
+    if not run_mask.any():
+        return jsonify({'error': 'No runs found'}), 404
+
+    with span('aggregate'):
+        shops = index.shops
+        visits = np.flatnonzero(run_mask[shops.visit_run])
+        visit_run = shops.visit_run[visits]
+        act = np.minimum((shops.visit_floor[visits] - 1) // FLOORS_PER_ACT, ACTS - 1)
+        spent = shops.visit_spent[visits]
+
+        acts = []
+        for a in range(ACTS):
+            in_act = act == a
+            if not in_act.any():
+                continue
+            acts.append({
+                'act': a + 1,
+                'visits': int(in_act.sum()),
+                'gold_spent': int(spent[in_act].sum()),
+                'avg_spent_per_visit': float(spent[in_act].mean()),
+                'avg_gold_before': float(shops.visit_gold[visits][in_act].mean()),
+                'purchases': int(shops.visit_purchases[visits][in_act].sum()),
+                'purges': int(shops.visit_purges[visits][in_act].sum())
+            })
+
+        # Items: win rate of the runs buying each one against runs visiting a shop
+        purchases = np.flatnonzero(run_mask[shops.purchase_run])
+        visited = np.zeros(len(index), dtype=bool)
+        visited[visit_run] = True
+        visited[shops.purchase_run[purchases]] = True
+        baseline = float(index.victory[visited].mean() * 100) if visited.any() else None
+        items = []
+        if len(purchases):
+            # A run buying an item twice counts once
+            run_item = np.unique(shops.purchase_run[purchases].astype(np.int64) * len(shops.items) + shops.purchase_item[purchases])
+            buyer, item = np.divmod(run_item, len(shops.items))
+            buyers = np.bincount(item, minlength=len(shops.items))
+            buyer_victories = np.bincount(item, weights=index.victory[buyer], minlength=len(shops.items))
+            bought = np.bincount(shops.purchase_item[purchases], minlength=len(shops.items))
+            floors = np.bincount(shops.purchase_item[purchases], weights=shops.purchase_floor[purchases], minlength=len(shops.items))
+            for i in np.flatnonzero(buyers >= min_runs):
+                win_rate = float(buyer_victories[i] / buyers[i] * 100)
+                items.append({
+                    'item': shops.items.names[i],
+                    'purchases': int(bought[i]),
+                    'runs': int(buyers[i]),
+                    'win_rate': win_rate,
+                    'win_rate_lift': win_rate - baseline,
+                    'avg_floor': float(floors[i] / bought[i])
+                })
+            items.sort(key=lambda x: x['purchases'], reverse=True)
+
+        # Hoarding vs spending: share of the gold earned that was spent in shops
+        run_ids = np.flatnonzero(run_mask)
+        run_spent = np.bincount(visit_run, weights=spent, minlength=len(index))[run_ids]
+        share = run_spent / np.maximum(shops.earned[run_ids], 1)
+        bins = np.minimum((share * 4).astype(np.int64), 3)
+        floor_reached = index.features[run_ids, FEATURE_NAMES.index('floor_reached')]
+        spending = []
+        for b in range(4):
+            in_bin = bins == b
+            if not in_bin.any():
+                continue
+            spending.append({
+                'spent_share': f'{b * 25}-{(b + 1) * 25}%',
+                'runs': int(in_bin.sum()),
+                'win_rate': float(index.victory[run_ids[in_bin]].mean() * 100),
+                'avg_floor_reached': float(floor_reached[in_bin].mean()),
+                'avg_gold_spent': float(run_spent[in_bin].mean()),
+                'avg_gold_earned': float(shops.earned[run_ids[in_bin]].mean())
+            })
+
+    return jsonify({
+        'runs': len(run_ids),
+        'runs_visiting_shops': int(visited.sum()),
+        'win_rate_visiting_shops': baseline,
+        'acts': acts,
+        'items': items,
+        'spending': spending
+    })
+
+@app.route('/api/decks/similar', methods=['POST'])
+def get_similar_decks():
+    """
+    Find the historical runs whose final deck is most similar to a given deck
+    Body: {"deck": [card names]} or {"play_id": run to compare against}, optional "k"
+    """
+    index = load_run_index()
+    body = request.get_json(silent=True) or {}
+
+    filters = {
+        'character': request.args.get('character'),
+        'start_date': request.args.get('start_date'),
+        'end_date': request.args.get('end_date'),
+        'ascension_level': request.args.get('ascension_level'),
+        'victory': request.args.get('victory'),
+        'is_daily': request.args.get('is_daily'),
+        'ignore_downfall': request.args.get('ignore_downfall')
+    }
+
+    run_mask = filter_run_index(index, filters)
+
+    deck = body.get('deck')
+    play_id = body.get('play_id')
+    if play_id:
+        if play_id not in index.run_ids:
+            return jsonify({'error': f'Run not found: {play_id}'}), 404
+        run_id = index.run_ids[play_id]
+        deck = index.runs[run_id].get('master_deck', [])
+        # Don't match the run against itself
+        run_mask[run_id] = False
+
+    if not deck:
+        return jsonify({'error': 'No deck provided'}), 400
+
+    try:
+        k = max(1, min(int(body.get('k', 10)), 100))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'k must be an integer'}), 400
+
+    with span('aggregate'):
+        run_ids, similarities = index.decks.most_similar(deck, k, run_mask)
+
+    neighbors = []
+    for run_id, similarity in zip(run_ids, similarities):
+        run = index.runs[run_id]
+        neighbors.append({
+            'play_id': run.get('play_id'),
+            'character': run.get('character'),
+            'victory': run.get('victory', False),
+            'floor_reached': run.get('floor_reached', 0),
+            'score': run.get('score', 0),
+            'ascension_level': run.get('ascension_level', 0),
+            'timestamp': run.get('timestamp', 0),
+            'deck_size': len(run.get('master_deck', [])),
+            'similarity': float(similarity)
+        })
+
+    victories = sum(1 for n in neighbors if n['victory'])
+    return jsonify({
+        'neighbors': neighbors,
+        'win_rate': victories / len(neighbors) * 100 if neighbors else 0
+    })
+
 @app.route('/api/upload-runs', methods=['POST'])
 def upload_runs():
     """
     Unified upload endpoint for Supabase
-    Accepts both ZIP files and individual .run files
+    Accepts both ZIP files and individual .run files. Returns 202 with a job id;
+    poll /api/upload-jobs/<job_id> for progress.
     """
     if not is_supabase_configured():
         return jsonify({'error': 'Supabase is not configured. Please set SUPABASE_URL and SUPABASE_KEY in .env'}), 503
@@ -659,102 +1633,37 @@ def upload_runs():
     if len(files) == 0:
         return jsonify({'error': 'No files selected'}), 400
 
-    try:
-        # Collect all .run file contents
-        file_contents = []
-        temp_extracts = []
-
-        for file in files:
-            if file.filename.endswith('.zip'):
-                # Handle ZIP file
-                filename = secure_filename(file.filename)
-                upload_path = UPLOAD_FOLDER / filename
-                file.save(upload_path)
-
-                # Extract ZIP
-                extract_dir = UPLOAD_FOLDER / f'temp_extract_{filename}'
-                if extract_dir.exists():
-                    shutil.rmtree(extract_dir)
-                extract_dir.mkdir()
-                temp_extracts.append((upload_path, extract_dir))
-
-                with zipfile.ZipFile(upload_path, 'r') as zip_ref:
-                    zip_ref.extractall(extract_dir)
-
-                # Find all .run files recursively
-                for run_file in extract_dir.rglob('*.run'):
-                    with open(run_file, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                        file_contents.append((content, run_file.name))
-
-            elif file.filename.endswith('.run'):
-                # Handle individual .run file
-                content = file.read().decode('utf-8')
-                file_contents.append((content, file.filename))
-            else:
-                # Skip unsupported file types
-                continue
-
-        if len(file_contents) == 0:
-            return jsonify({'error': 'No valid .run or .zip files provided'}), 400
-
-        # Parse all runs
-        parsed_runs = batch_parse_runs(file_contents)
-
-        if len(parsed_runs) == 0:
-            return jsonify({'error': 'Failed to parse any run files'}), 400
-
-        # Check for duplicates in Supabase
-        run_identifiers = [run['run_identifier'] for run in parsed_runs]
-
-        try:
-            # Query existing runs
-            existing_response = supabase.table('runs').select('run_identifier').in_('run_identifier', run_identifiers).execute()
-            existing_identifiers = {row['run_identifier'] for row in existing_response.data}
-        except Exception as e:
-            return jsonify({'error': f'Error checking for duplicates: {str(e)}'}), 500
-
-        # Separate new runs from duplicates
-        new_runs = [run for run in parsed_runs if run['run_identifier'] not in existing_identifiers]
-        duplicate_count = len(parsed_runs) - len(new_runs)
-
-        # Upload new runs to Supabase
-        uploaded_count = 0
-        errors = []
-
-        for run in new_runs:
-            try:
-                supabase.table('runs').insert(run).execute()
-                uploaded_count += 1
-            except Exception as e:
-                errors.append(f"Failed to upload run {run['play_id']}: {str(e)}")
-
-        # Cleanup temp files
-        for upload_path, extract_dir in temp_extracts:
-            if extract_dir.exists():
-                shutil.rmtree(extract_dir)
-            if upload_path.exists():
-                os.remove(upload_path)
-
-        return jsonify({
-            'success': True,
-            'total_files': len(files),
-            'parsed_runs': len(parsed_runs),
-            'new_runs': uploaded_count,
-            'duplicate_runs': duplicate_count,
-            'errors': errors if errors else None
-        })
+    # Save the uploads; parsing and inserting happen in a background job
+    work_dir = UPLOAD_FOLDER / f'upload_{uuid.uuid4().hex}'
+    work_dir.mkdir()
+    saved_files = []
+    for i, file in enumerate(files):
+        if not file.filename.endswith(('.zip', '.run')):
+            # Skip unsupported file types
+            continue
+        path = work_dir / f'{i}_{secure_filename(file.filename)}'
+        file.save(path)
+        saved_files.append((path, file.filename))
+
+    if len(saved_files) == 0:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        return jsonify({'error': 'No valid .run or .zip files provided'}), 400
+
+    job = submit_upload(UPLOAD_JOBS_FOLDER, saved_files, work_dir, on_runs_inserted=runs_uploaded)
+    return jsonify({
+        'job_id': job.id,
+        'status': 'queued',
+        'total_files': len(files),
+        'status_url': f'/api/upload-jobs/{job.id}'
+    }), 202
 
-    except zipfile.BadZipFile:
-        return jsonify({'error': 'Invalid ZIP file'}), 400
-    except Exception as e:
-        # Cleanup on error
-        for upload_path, extract_dir in temp_extracts:
-            if extract_dir.exists():
-                shutil.rmtree(extract_dir)
-            if upload_path.exists():
-                os.remove(upload_path)
-        return jsonify({'error': f'Upload failed: {str(e)}'}), 500
+@app.route('/api/upload-jobs/<job_id>')
+def get_upload_job(job_id):
+    """Progress of a background upload started by /api/upload-runs"""
+    job = get_job(UPLOAD_JOBS_FOLDER, job_id)
+    if job is None:
+        return jsonify({'error': 'Upload job not found'}), 404
+    return jsonify(job)
 
 
 @app.route('/api/supabase/status')
@@ -823,7 +1732,12 @@ def supabase_wake():
 
 @app.route('/api/runs-supabase')
 def get_runs_supabase():
-    """Get all runs from Supabase with optional filtering"""
+    """
+    Get all runs from Supabase with optional filtering
+    raw_data of uploaded runs holds only run_parser.ANALYTICS_FIELDS (fields
+    such as build_version are left out); /api/runs/<play_id> returns a
+    complete run.
+    """
     if not is_supabase_configured():
         return jsonify({'error': 'Supabase is not configured'}), 503
 
@@ -861,5 +1775,13 @@ def get_runs_supabase():
     except Exception as e:
         return jsonify({'error': f'Failed to fetch runs: {str(e)}'}), 500
 
+@app.route('/api/metrics')
+def get_metrics():
+    """Request timings, runs scanned and cache counters in Prometheus text format"""
+    return app.response_class(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
+    # Only the reloader's child process serves requests
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        warm_cache()
     app.run(debug=True, port=5000)
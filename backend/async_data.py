@@ -0,0 +1,174 @@
+"""
+Asyncio data layer for multi-request Supabase work
+Paged corpus fetches, duplicate checks and bulk inserts are issued
+concurrently (bounded by SUPABASE_MAX_CONCURRENCY) on the async Supabase
+client, so their wall time is close to the slowest request rather than the
+sum of all of them. Clients without an async execute() (the fake backend or
+a set_supabase_client() override) run each request in a worker thread.
+
+The coroutines can be awaited directly from an ASGI server; Flask views and
+upload jobs call them through run(), e.g.
+
+    async def load():
+        async with connect() as client:
+            return await fetch_all(client, 'runs', 'raw_data')
+    rows = run(load())
+"""
+import asyncio
+import inspect
+import math
+import os
+import uuid
+from contextlib import asynccontextmanager
+import supabase_client
+
+# Requests in flight at once per operation
+MAX_CONCURRENT_REQUESTS = int(os.getenv('SUPABASE_MAX_CONCURRENCY', 8))
+
+# Rows per page (PostgREST returns at most 1,000 rows by default)
+PAGE_SIZE = int(os.getenv('SUPABASE_PAGE_SIZE', 1000))
+
+# Extra id partitions so that few of them overflow into a second page
+PARTITION_OVERSIZE = 1.25
+
+# Identifiers per duplicate-check query (in_() filters go in the URL)
+IN_FILTER_BATCH_SIZE = 200
+
+
+def run(coroutine):
+    """Run a coroutine to completion from synchronous code"""
+    return asyncio.run(coroutine)
+
+
+@asynccontextmanager
+async def connect():
+    """
+    Client for the current backend: the override/fake client when one is set,
+    otherwise an async Supabase client closed on exit (None if not configured)
+    """
+    if supabase_client._client_override is not None or supabase_client.SUPABASE_BACKEND == 'fake':
+        yield supabase_client.get_supabase_client()
+        return
+    if not supabase_client.SUPABASE_URL or not supabase_client.SUPABASE_KEY:
+        yield None
+        return
+
+    from supabase import acreate_client
+
+    client = await acreate_client(supabase_client.SUPABASE_URL, supabase_client.SUPABASE_KEY)
+    try:
+        yield client
+    finally:
+        await client.postgrest.aclose()
+
+
+async def execute(query):
+    """Execute a query built on either an async or a sync client"""
+    if inspect.iscoroutinefunction(query.execute):
+        return await query.execute()
+    return await asyncio.to_thread(query.execute)
+
+
+async def gather_bounded(coroutines, limit=MAX_CONCURRENT_REQUESTS):
+    """asyncio.gather with at most limit coroutines running at once"""
+    semaphore = asyncio.Semaphore(limit)
+
+    async def bounded(coroutine):
+        async with semaphore:
+            return await coroutine
+
+    return await asyncio.gather(*(bounded(coroutine) for coroutine in coroutines))
+
+
+def apply_filters(query, filters):
+    """Apply (operator, column, value) filters such as ('gte', 'uploaded_at', ...)"""
+    for operator, column, value in filters:
+        query = getattr(query, operator)(column, value)
+    return query
+
+
+async def count_rows(client, table, filters=()):
+    response = await execute(apply_filters(client.table(table).select('count', count='exact'), filters).limit(0))
+    return response.count
+
+
+def id_partitions(count):
+    """
+    Split the UUID id space into contiguous [low, high) ranges
+    gen_random_uuid() ids are uniform, so each range holds about
+    count / partitions rows; most partitions then fit in a single page.
+    """
+    partitions = max(1, math.ceil(count * PARTITION_OVERSIZE / PAGE_SIZE))
+    bounds = [str(uuid.UUID(int=i * (1 << 128) // partitions)) for i in range(partitions)]
+    return list(zip(bounds, bounds[1:] + [None]))
+
+
+async def fetch_all(client, table, columns, filters=(), page_size=PAGE_SIZE, on_page=None):
+    """
+    Every row of table, fetched by keyset pagination on id
+    The id space is split into partitions fetched concurrently; each one is
+    read in id order with id > last-seen-id pages, so no page depends on an
+    OFFSET and rows inserted during the load cannot shift pages.
+    filters narrow the rows (see apply_filters). on_page(rows) is called
+    for each page as it arrives, and its return value (default: the rows) is
+    what gets collected.
+    """
+    select = columns if columns == '*' or 'id' in columns.split(',') else f'id,{columns}'
+
+    async def fetch_partition(low, high):
+        collected = []
+        last_id = None
+        while True:
+            query = apply_filters(client.table(table).select(select), filters)
+            query = query.gt('id', last_id) if last_id is not None else query.gte('id', low)
+            if high is not None:
+                query = query.lt('id', high)
+            rows = (await execute(query.order('id').limit(page_size))).data
+            if rows:
+                last_id = rows[-1]['id']
+                collected.extend(on_page(rows) if on_page is not None else rows)
+            if len(rows) < page_size:
+                return collected
+
+    total = await count_rows(client, table, filters) or 0
+    partitions = await gather_bounded(fetch_partition(low, high) for low, high in id_partitions(total))
+    return [row for partition in partitions for row in partition]
+
+
+async def find_existing(client, table, column, values):
+    """Subset of values already present in table.column (checked in concurrent batches)"""
+    batches = [values[i:i + IN_FILTER_BATCH_SIZE] for i in range(0, len(values), IN_FILTER_BATCH_SIZE)]
+    responses = await gather_bounded(
+        execute(client.table(table).select(column).in_(column, batch)) for batch in batches
+    )
+    return {row[column] for response in responses for row in response.data}
+
+
+async def insert_chunks(client, table, rows, chunk_size, on_chunk=None):
+    """
+    Insert rows in concurrent chunks
+    A chunk that fails is retried one row at a time.
+
+    Returns:
+        list: (row, exception or None) for every row; on_chunk is called with
+        each chunk's results as it finishes
+    """
+    async def insert_chunk(chunk):
+        try:
+            await execute(client.table(table).insert(chunk))
+            results = [(row, None) for row in chunk]
+        except Exception:
+            results = []
+            for row in chunk:
+                try:
+                    await execute(client.table(table).insert(row))
+                    results.append((row, None))
+                except Exception as e:
+                    results.append((row, e))
+        if on_chunk is not None:
+            on_chunk(results)
+        return results
+
+    chunks = [rows[i:i + chunk_size] for i in range(0, len(rows), chunk_size)]
+    results = await gather_bounded(insert_chunk(chunk) for chunk in chunks)
+    return [result for chunk_results in results for result in chunk_results]
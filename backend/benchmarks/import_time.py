@@ -0,0 +1,108 @@
+"""
+Cold-start benchmark
+Times `import app` and the first requests in fresh interpreters, with the
+analytics dependencies loaded lazily (the default) and eagerly (imported up
+front, as gunicorn's preload does in the master process). Each sample runs
+in its own subprocess against the empty fake Supabase backend.
+
+Usage (from backend/):
+    python -m benchmarks.import_time --repeat 5 --output startup.json
+    python -m benchmarks.import_time --baseline startup.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from benchmarks.run_benchmarks import compare, summarize
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Runs in the child interpreter; prints the stage durations as JSON
+CHILD_SCRIPT = '''
+import json, sys, time
+timings = {}
+start = time.perf_counter()
+if sys.argv[1] == 'eager':
+    import importlib
+    for name in %r:
+        importlib.import_module(name)
+    timings['preload_analytics'] = time.perf_counter() - start
+import app
+timings['import_app'] = time.perf_counter() - start
+client = app.app.test_client()
+mark = time.perf_counter()
+client.get('/api/supabase/status')
+timings['first_status_request'] = time.perf_counter() - mark
+mark = time.perf_counter()
+client.get('/api/stats')
+timings['first_analytics_request'] = time.perf_counter() - mark
+timings['ready_for_analytics'] = time.perf_counter() - start
+print(json.dumps(timings))
+'''
+
+
+def sample(mode):
+    """Stage durations (seconds) from one fresh interpreter"""
+    from app import ANALYTICS_MODULES
+
+    env = dict(os.environ, SUPABASE_BACKEND='fake', RUN_SNAPSHOT_DIR='', FAKE_SUPABASE_CORPUS='')
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD_SCRIPT % (ANALYTICS_MODULES,), mode],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(args):
+    results = {}
+    for mode in ('lazy', 'eager'):
+        samples = [sample(mode) for _ in range(args.repeat)]
+        for stage in samples[0]:
+            results[f'{mode}.{stage}'] = summarize([timings[stage] for timings in samples])
+        print(f"Timed {mode} startup", file=sys.stderr)
+
+    return {
+        'meta': {
+            'repeat': args.repeat,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': int(time.time()),
+        },
+        'results': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark backend cold start')
+    parser.add_argument('--repeat', type=int, default=5, help='fresh interpreters per mode')
+    parser.add_argument('--output', help='write results JSON here (default: stdout)')
+    parser.add_argument('--baseline', help='previous results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=1.25, help='allowed slowdown ratio before failing')
+    args = parser.parse_args()
+
+    results = run(args)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: {before:.2f} ms -> {after:.2f} ms", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
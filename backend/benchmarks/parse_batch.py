@@ -0,0 +1,107 @@
+"""
+Batch parsing benchmark
+Parses a batch of synthetic .run files the way an upload holds them until
+they are inserted: 'full' keeps every parsed run with its complete decoded
+file (the previous ingest path), 'selective' keeps only
+run_parser.ANALYTICS_FIELDS plus the file bytes for its archive. Reports
+throughput and the memory the batch holds (and peaks at) per mode.
+
+Usage (from backend/):
+    python -m benchmarks.parse_batch --runs 5000 --modded --output parse.json
+    python -m benchmarks.parse_batch --runs 5000 --modded --baseline parse.json
+"""
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from benchmarks.run_benchmarks import compare, summarize, timed
+from benchmarks.synthetic_runs import iter_runs
+from run_parser import ANALYTICS_FIELDS, parse_run_file
+
+MODES = {
+    'full': lambda content: (parse_run_file(content), None),
+    'selective': lambda content: (parse_run_file(content, fields=ANALYTICS_FIELDS), content),
+}
+
+
+def parse_batch(contents, mode):
+    parse = MODES[mode]
+    return [parse(content) for content in contents]
+
+
+def batch_memory(contents, mode):
+    """(bytes held by the parsed batch, peak bytes while parsing it)"""
+    gc.collect()
+    tracemalloc.start()
+    batch = parse_batch(contents, mode)
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del batch
+    return held, peak
+
+
+def run(args):
+    contents = [json.dumps(run).encode('utf-8') for run in iter_runs(args.runs, seed=args.seed, modded=args.modded)]
+    print(f"Generated {len(contents)} runs", file=sys.stderr)
+
+    results = {}
+    for mode in MODES:
+        result = summarize(timed(lambda: parse_batch(contents, mode), args.repeat), items=len(contents))
+        held, peak = batch_memory(contents, mode)
+        result['held_mb'] = held / 1e6
+        result['peak_mb'] = peak / 1e6
+        result['held_bytes_per_run'] = held / len(contents)
+        results[f'parse.{mode}'] = result
+        print(f"Parsed in {mode} mode", file=sys.stderr)
+
+    return {
+        'meta': {
+            'runs': args.runs,
+            'seed': args.seed,
+            'modded': args.modded,
+            'repeat': args.repeat,
+            'file_bytes_per_run': sum(len(content) for content in contents) / len(contents),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': int(time.time()),
+        },
+        'results': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark parsing a batch of .run files')
+    parser.add_argument('--runs', type=int, default=5000, help='runs per batch')
+    parser.add_argument('--seed', type=int, default=0, help='random seed for the synthetic corpus')
+    parser.add_argument('--modded', action='store_true', help='add per-floor logs like run history mods write')
+    parser.add_argument('--repeat', type=int, default=3, help='repetitions per measurement')
+    parser.add_argument('--output', help='write results JSON here (default: stdout)')
+    parser.add_argument('--baseline', help='previous results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=1.25, help='allowed slowdown ratio before failing')
+    args = parser.parse_args()
+
+    results = run(args)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: {before:.2f} ms -> {after:.2f} ms", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
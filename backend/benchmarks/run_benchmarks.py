@@ -0,0 +1,332 @@
+"""
+Backend benchmark harness
+Generates a synthetic corpus, loads it into the in-process Supabase
+stand-in (fake_supabase.py, optionally with injected latency) and times
+parsing, run archiving, upload ingest, filtering, every analytics endpoint and concurrent identical requests. Results are written as JSON; pass --baseline to compare against
+a previous result file and exit non-zero on regressions.
+
+Usage (from backend/):
+    python -m benchmarks.run_benchmarks --runs 10000 --output bench.json
+    python -m benchmarks.run_benchmarks --runs 10000 --baseline bench.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import zipfile
+
+import async_data
+from benchmarks.synthetic_runs import generate_runs
+from fake_supabase import FakeSupabaseClient
+from supabase_client import set_supabase_client
+
+# Filter combinations exercised for apply_filters and each endpoint
+FILTER_CASES = {
+    'all': {},
+    'character': {'character': 'IRONCLAD'},
+    'base_game_non_daily': {'ignore_downfall': 'true', 'is_daily': 'false'},
+    'date_range': {'start_date': '2020-10-01', 'end_date': '2021-01-01'},
+    'ascension_victory': {'ascension_level': '20', 'victory': 'true'},
+}
+
+# Interval between upload job status checks
+JOB_POLL_SECONDS = 0.01
+
+ENDPOINTS = [
+    '/api/runs',
+    '/api/stats',
+    '/api/cards',
+    '/api/relics',
+    '/api/enemies',
+    '/api/correlation',
+    '/api/correlation/top',
+    '/api/synergy',
+    '/api/paths',
+    '/api/events',
+    '/api/neow',
+    '/api/shops',
+]
+
+
+def summarize(seconds, items=None):
+    """Timing summary in milliseconds (plus throughput when items is given)"""
+    ordered = sorted(seconds)
+    result = {
+        'median_ms': statistics.median(ordered) * 1000,
+        'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+        'max_ms': ordered[-1] * 1000,
+        'samples': len(ordered),
+    }
+    if items is not None:
+        result['items_per_sec'] = items / statistics.median(ordered)
+    return result
+
+
+def timed(fn, repeat):
+    """Call fn repeat times, returning the durations in seconds"""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def use_client(app_module, client):
+    """Point the app at client and drop any cached corpus"""
+    set_supabase_client(client)
+    app_module._run_index = None
+    app_module._run_index_count = None
+    app_module._run_index_high_water_mark = None
+    app_module._snapshot_generation = None
+
+
+def bench_parse(runs, repeat):
+    from run_parser import parse_run_file
+
+    contents = [json.dumps(run) for run in runs]
+    durations = timed(lambda: [parse_run_file(content) for content in contents], repeat)
+    return summarize(durations, items=len(contents))
+
+
+def bench_archive(runs, repeat):
+    """Time compressing runs into archives and decoding one back; report stored sizes"""
+    import run_archive
+    from run_parser import parse_run_file, slim_run
+
+    client = FakeSupabaseClient()
+    parsed = [parse_run_file(run) for run in runs]
+    archives = []
+
+    def archive():
+        run_archive._dictionaries.clear()
+        client.tables.pop('run_dictionaries', None)
+        archives[:] = async_data.run(run_archive.archive_runs(client, parsed))
+
+    result = summarize(timed(archive, repeat), items=len(parsed))
+    dictionary = run_archive.load_dictionary(client, archives[0]['dictionary_id'])
+    result['decode_ms'] = summarize(timed(lambda: run_archive.decode_archive(archives[0], dictionary), repeat))['median_ms']
+    result['raw_bytes'] = sum(archive['raw_size'] for archive in archives)
+    result['slim_bytes'] = sum(len(run_archive.encode_run(slim_run(run['raw_data']))) for run in parsed)
+    result['archive_bytes'] = sum(len(archive['data']) for archive in archives)
+    return result
+
+
+def bench_ingest(app_module, ingest_runs, seed, latency):
+    """Time POST /api/upload-runs with a ZIP of ingest_runs new runs until its job finishes"""
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for run in generate_runs(ingest_runs, seed=seed + 1):
+            zf.writestr(f"runs/{run['play_id']}.run", json.dumps(run))
+    payload = archive.getvalue()
+
+    use_client(app_module, FakeSupabaseClient(**latency))
+    os.environ['UPLOAD_PASSWORD'] = 'benchmark'
+    test_client = app_module.app.test_client()
+
+    start = time.perf_counter()
+    response = test_client.post('/api/upload-runs', data={
+        'password': 'benchmark',
+        'files': (io.BytesIO(payload), 'benchmark.zip'),
+    }, content_type='multipart/form-data')
+    accepted = time.perf_counter() - start
+
+    job = response.get_json(silent=True) or {}
+    while job.get('job_id') and job.get('status') in ('queued', 'running'):
+        time.sleep(JOB_POLL_SECONDS)
+        job = test_client.get(f"/api/upload-jobs/{job['job_id']}").get_json()
+    elapsed = time.perf_counter() - start
+
+    result = summarize([elapsed], items=ingest_runs)
+    result['accepted_ms'] = accepted * 1000
+    result['status'] = job.get('status', response.status_code)
+    result['new_runs'] = job.get('new_runs')
+    return result
+
+
+def bench_filters(app_module, repeat):
+    """Time list-based apply_filters and the index mask for each filter case"""
+    runs = app_module.load_all_runs()
+    index = app_module.load_run_index()
+    results = {}
+    for name, filters in FILTER_CASES.items():
+        results[f'apply_filters.{name}'] = summarize(timed(lambda: app_module.apply_filters(runs, filters), repeat), items=len(runs))
+        results[f'index_mask.{name}'] = summarize(timed(lambda: index.mask(filters), repeat), items=len(runs))
+    return results
+
+
+def bench_endpoints(app_module, repeat):
+    """
+    Time each analytics endpoint per filter case (warm corpus), computing
+    every response (the result cache is cleared first) and from the cache
+    """
+    test_client = app_module.app.test_client()
+    results = {}
+    for endpoint in ENDPOINTS:
+        for name, filters in FILTER_CASES.items():
+            def call():
+                response = test_client.get(endpoint, query_string=filters)
+                if response.status_code not in (200, 404):
+                    raise RuntimeError(f'{endpoint} {filters} returned {response.status_code}')
+
+            def compute():
+                app_module._result_cache.clear()
+                call()
+            result = summarize(timed(compute, repeat))
+            result['cached_median_ms'] = summarize(timed(call, repeat))['median_ms']
+            results[f'endpoint.{endpoint}.{name}'] = result
+    return results
+
+
+def bench_concurrent(app_module, client, concurrency):
+    """
+    Time concurrency identical requests per endpoint arriving at once, on a
+    cold and on a warm corpus, and count how many shared another's execution
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    import metrics
+
+    def shared_calls():
+        key = ('sts_single_flight_calls_total', (('flight', 'request'), ('result', 'shared')))
+        return metrics._counters.get(key, 0)
+
+    results = {}
+    for state in ('cold', 'warm'):
+        for endpoint in ('/api/stats', '/api/cards', '/api/correlation/top'):
+            if state == 'cold':
+                use_client(app_module, client)
+            shared = shared_calls()
+            start = time.perf_counter()
+            with ThreadPoolExecutor(concurrency) as executor:
+                list(executor.map(lambda _: app_module.app.test_client().get(endpoint), range(concurrency)))
+            result = summarize([time.perf_counter() - start], items=concurrency)
+            result['shared'] = shared_calls() - shared
+            results[f'concurrent_{state}.{endpoint}'] = result
+    return results
+
+
+def run(args):
+    import app as app_module
+    import index_snapshot
+    from run_parser import parse_run_file
+
+    # Snapshots are only used where the benchmark sets one up explicitly
+    app_module.SNAPSHOT_DIR = ''
+
+    results = {}
+    latency = {'latency_ms': args.latency_ms, 'row_latency_us': args.row_latency_us, 'max_rows': args.max_rows or None}
+
+    start = time.perf_counter()
+    runs = generate_runs(args.runs, seed=args.seed)
+    results['generate'] = summarize([time.perf_counter() - start], items=len(runs))
+    print(f"Generated {len(runs)} runs", file=sys.stderr)
+
+    results['parse_run_file'] = bench_parse(runs[:args.parse_runs], args.repeat)
+    results['run_archive'] = bench_archive(runs[:args.parse_runs], args.repeat)
+    results['upload_runs'] = bench_ingest(app_module, args.ingest_runs, args.seed, latency)
+    print("Timed parsing and ingest", file=sys.stderr)
+
+    client = FakeSupabaseClient()
+    client.insert_rows('runs', [parse_run_file(run) for run in runs])
+    client.latency_ms, client.row_latency_us, client.max_rows = args.latency_ms, args.row_latency_us, args.max_rows or None
+    del runs
+    use_client(app_module, client)
+
+    results['load_all_runs'] = summarize(timed(app_module.load_all_runs, args.repeat), items=args.runs)
+    results['load_all_runs']['rows'] = len(app_module.load_all_runs())
+
+    start = time.perf_counter()
+    response = app_module.app.test_client().get('/api/stats')
+    results['cold_start./api/stats'] = summarize([time.perf_counter() - start])
+    results['cold_start./api/stats']['status'] = response.status_code
+
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        index = app_module.load_run_index()
+        start = time.perf_counter()
+        index_snapshot.save_snapshot(snapshot_dir, index, app_module._run_index_high_water_mark)
+        results['snapshot_save'] = summarize([time.perf_counter() - start], items=len(index))
+
+        # Endpoints reading only index arrays never decode the snapshot's runs
+        for endpoint in ('/api/cards', '/api/stats'):
+            app_module.SNAPSHOT_DIR = snapshot_dir
+            use_client(app_module, client)
+            start = time.perf_counter()
+            response = app_module.app.test_client().get(endpoint)
+            results[f'cold_start_snapshot.{endpoint}'] = summarize([time.perf_counter() - start])
+            results[f'cold_start_snapshot.{endpoint}']['status'] = response.status_code
+        app_module.SNAPSHOT_DIR = ''
+        use_client(app_module, client)
+
+    results.update(bench_filters(app_module, args.repeat))
+    results.update(bench_endpoints(app_module, args.repeat))
+    results.update(bench_concurrent(app_module, client, args.concurrency))
+    print("Timed filters and endpoints", file=sys.stderr)
+
+    return {
+        'meta': {
+            'runs': args.runs,
+            'seed': args.seed,
+            'repeat': args.repeat,
+            'latency_ms': args.latency_ms,
+            'row_latency_us': args.row_latency_us,
+            'max_rows': args.max_rows,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': int(time.time()),
+        },
+        'results': results,
+    }
+
+
+def compare(current, baseline, threshold):
+    """Names of results whose median is more than threshold times the baseline"""
+    regressions = []
+    for name, result in current['results'].items():
+        before = baseline['results'].get(name)
+        if before and before['median_ms'] > 0 and result['median_ms'] / before['median_ms'] > threshold:
+            regressions.append((name, before['median_ms'], result['median_ms']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Slay the Spire backend')
+    parser.add_argument('--runs', type=int, default=1000, help='corpus size (e.g. 1000, 10000, 100000, 1000000)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed for the synthetic corpus')
+    parser.add_argument('--repeat', type=int, default=5, help='repetitions per measurement')
+    parser.add_argument('--parse-runs', type=int, default=1000, help='runs used for the parse benchmark')
+    parser.add_argument('--ingest-runs', type=int, default=500, help='runs uploaded in the ingest benchmark')
+    parser.add_argument('--latency-ms', type=float, default=0, help='injected latency per Supabase request')
+    parser.add_argument('--row-latency-us', type=float, default=0, help='injected latency per row transferred')
+    parser.add_argument('--concurrency', type=int, default=8, help='identical requests sent at once in the concurrency benchmark')
+    parser.add_argument('--max-rows', type=int, default=1000, help='rows per select cap, like PostgREST db-max-rows (0 for none)')
+    parser.add_argument('--output', help='write results JSON here (default: stdout)')
+    parser.add_argument('--baseline', help='previous results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=1.25, help='allowed slowdown ratio before failing')
+    args = parser.parse_args()
+
+    results = run(args)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: {before:.2f} ms -> {after:.2f} ms", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
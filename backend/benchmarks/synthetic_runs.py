@@ -0,0 +1,373 @@
+"""
+Synthetic Slay the Spire .run generator
+Produces runs with the same structure as real .run files (every field read
+by run_parser.parse_run_file and the app.py endpoints) so benchmarks can be
+shared without real player data. Output is deterministic for a given seed.
+
+Usage:
+    python -m benchmarks.synthetic_runs --runs 10000 --out corpus.zip
+"""
+import argparse
+import json
+import random
+import zipfile
+
+CHARACTERS = {
+    'IRONCLAD': {
+        'starter_relic': 'Burning Blood', 'max_hp': 80,
+        'basics': ['Strike_R'] * 5 + ['Defend_R'] * 4 + ['Bash'],
+        'cards': ['Anger', 'Armaments', 'Body Slam', 'Clash', 'Cleave', 'Clothesline', 'Flex', 'Havoc', 'Headbutt',
+                  'Heavy Blade', 'Iron Wave', 'Pommel Strike', 'Shrug It Off', 'Sword Boomerang', 'Thunderclap',
+                  'True Grit', 'Twin Strike', 'Warcry', 'Wild Strike', 'Battle Trance', 'Bloodletting', 'Carnage',
+                  'Combust', 'Dark Embrace', 'Disarm', 'Dropkick', 'Entrench', 'Evolve', 'Feel No Pain', 'Inflame',
+                  'Barricade', 'Demon Form', 'Feed', 'Impervious', 'Offering', 'Reaper', 'Limit Break'],
+    },
+    'THE_SILENT': {
+        'starter_relic': 'Ring of the Snake', 'max_hp': 70,
+        'basics': ['Strike_G'] * 5 + ['Defend_G'] * 5 + ['Neutralize', 'Survivor'],
+        'cards': ['Acrobatics', 'Backflip', 'Bane', 'Blade Dance', 'Cloak And Dagger', 'Dagger Spray', 'Dagger Throw',
+                  'Deadly Poison', 'Deflect', 'Dodge and Roll', 'Flying Knee', 'Outmaneuver', 'Piercing Wail',
+                  'Poisoned Stab', 'Prepared', 'Quick Slash', 'Slice', 'Sneaky Strike', 'Sucker Punch', 'Accuracy',
+                  'All Out Attack', 'Backstab', 'Blur', 'Bouncing Flask', 'Catalyst', 'Footwork', 'Noxious Fumes',
+                  'Adrenaline', 'Wraith Form v2', 'Corpse Explosion', 'After Image', 'Nightmare'],
+    },
+    'DEFECT': {
+        'starter_relic': 'Cracked Core', 'max_hp': 75,
+        'basics': ['Strike_B'] * 4 + ['Defend_B'] * 4 + ['Zap', 'Dualcast'],
+        'cards': ['Ball Lightning', 'Barrage', 'Beam Cell', 'Cold Snap', 'Compile Driver', 'Conserve Battery', 'Coolheaded',
+                  'Go for the Eyes', 'Hologram', 'Leap', 'Rebound', 'Stack', 'Steam', 'Streamline', 'Sweeping Beam',
+                  'Turbo', 'Gash', 'Aggregate', 'Auto Shields', 'Blizzard', 'Capacitor', 'Chill', 'Consume',
+                  'Defragment', 'Glacier', 'Loop', 'Biased Cognition', 'Echo Form', 'Electrodynamics', 'Seek'],
+    },
+    'WATCHER': {
+        'starter_relic': 'PureWater', 'max_hp': 72,
+        'basics': ['Strike_P'] * 4 + ['Defend_P'] * 4 + ['Eruption', 'Vigilance'],
+        'cards': ['BowlingBash', 'Consecrate', 'Crescendo', 'CrushJoints', 'CutThroughFate', 'EmptyBody', 'EmptyFist',
+                  'Evaluate', 'FlurryOfBlows', 'FlyingSleeves', 'FollowUp', 'Halt', 'JustLucky', 'PathToVictory',
+                  'Prostrate', 'Protect', 'SashWhip', 'ClearTheMind', 'Adaptation', 'Conclude', 'DeceiveReality',
+                  'FearNoEvil', 'Wallop', 'Tantrum', 'Ragnarok', 'Wish', 'Omniscience', 'Blasphemy'],
+    },
+    'GUARDIAN': {
+        'starter_relic': 'guardian:ModeShifterPlus', 'max_hp': 80,
+        'basics': ['guardian:Strike'] * 4 + ['guardian:Defend'] * 4 + ['guardian:Whirl'],
+        'cards': ['guardian:Gem Fire', 'guardian:Brace', 'guardian:Harden', 'guardian:Pummel', 'guardian:Spike',
+                  'guardian:Orbwalk', 'guardian:Emergency Protocol'],
+    },
+}
+
+COLORLESS = ['Apotheosis', 'Bandage Up', 'Blind', 'Dark Shackles', 'Finesse', 'Flash of Steel', 'Good Instincts',
+             'Master of Strategy', 'Panacea', 'Swift Strike', 'Trip']
+RELICS = ['Anchor', 'Bag of Marbles', 'Bag of Preparation', 'Blood Vial', 'Bronze Scales', 'Centennial Puzzle',
+          'Ceramic Fish', 'Dream Catcher', 'Happy Flower', 'Juzu Bracelet', 'Lantern', 'Maw Bank', 'Meal Ticket',
+          'Nunchaku', 'Oddly Smooth Stone', 'Omamori', 'Orichalcum', 'Pen Nib', 'Potion Belt', 'Preserved Insect',
+          'Regal Pillow', 'Smiling Mask', 'Strawberry', 'The Boot', 'Tiny Chest', 'Toy Ornithopter', 'Vajra',
+          'War Paint', 'Whetstone', 'Blue Candle', 'Bottled Flame', 'Darkstone Periapt', 'Eternal Feather',
+          'Frozen Egg 2', 'Gremlin Horn', 'Horn Cleat', 'Ink Bottle', 'Kunai', 'Letter Opener', 'Matryoshka',
+          'Meat on the Bone', 'Mercury Hourglass', 'Molten Egg 2', 'Mummified Hand', 'Ornamental Fan', 'Pantograph',
+          'Pear', 'Question Card', 'Shuriken', 'Singing Bowl', 'Strike Dummy', 'Sundial', 'Toxic Egg 2',
+          'White Beast Statue', 'Bird Faced Urn', 'Calipers', 'Captain\'s Wheel', 'Dead Branch', 'Du-Vu Doll',
+          'Fossilized Helix', 'Gambling Chip', 'Ginger', 'Girya', 'Ice Cream', 'Incense Burner', 'Lizard Tail',
+          'Mango', 'Old Coin', 'Peace Pipe', 'Pocketwatch', 'Prayer Wheel', 'Shovel', 'Stone Calendar',
+          'Thread and Needle', 'Torii', 'Tungsten Rod', 'Turnip', 'Unceasing Top', 'Wing Boots']
+BOSS_RELICS = ['Astrolabe', 'Black Star', 'Busted Crown', 'Calling Bell', 'Coffee Dripper', 'Cursed Key',
+               'Ectoplasm', 'Empty Cage', 'Fusion Hammer', 'Pandora\'s Box', 'Philosopher\'s Stone', 'Runic Dome',
+               'Runic Pyramid', 'Sacred Bark', 'SlaversCollar', 'Snecko Eye', 'Sozu', 'Tiny House', 'Velvet Choker']
+POTIONS = ['Fire Potion', 'Block Potion', 'Swift Potion', 'Energy Potion', 'Strength Potion', 'Fruit Juice',
+           'Fairy Potion', 'Smoke Bomb', 'Ancient Potion', 'Regen Potion']
+ENEMIES = {
+    1: (['Cultist', 'Jaw Worm', '2 Louse', 'Small Slimes', 'Blue Slaver', 'Gremlin Gang', 'Looter', 'Large Slime',
+         'Lots of Slimes', 'Exordium Thugs', 'Exordium Wildlife', 'Red Slaver', '3 Louse', '2 Fungi Beasts'],
+        ['Gremlin Nob', 'Lagavulin', '3 Sentries'], ['The Guardian', 'Hexaghost', 'Slime Boss']),
+    2: (['Chosen', 'Shell Parasite', 'Spheric Guardian', '3 Byrds', '2 Thieves', 'Chosen and Byrds', 'Sentry and Sphere',
+         'Snake Plant', 'Snecko', 'Centurion and Healer', 'Cultist and Chosen', '3 Cultists', 'Shelled Parasite and Fungi'],
+        ['Gremlin Leader', 'Slavers', 'Book of Stabbing'], ['Automaton', 'Collector', 'Champ']),
+    3: (['3 Darklings', 'Orb Walker', '3 Shapes', 'Spire Growth', 'Transient', '4 Shapes', 'Maw', 'Sphere and 2 Shapes',
+         'Jaw Worm Horde', 'Writhing Mass'],
+        ['Giant Head', 'Nemesis', 'Reptomancer'], ['Awakened One', 'Time Eater', 'Donu and Deca']),
+    4: ([], ['Shield and Spear'], ['The Heart']),
+}
+EVENTS = {
+    'Big Fish': ['Banana', 'Donut', 'Box'], 'The Cleric': ['Heal', 'Purge', 'Leave'],
+    'Golden Idol': ['Take Wound', 'Take Damage', 'Take Max HP', 'Ignored'], 'Living Wall': ['Forget', 'Change', 'Grow'],
+    'Scrap Ooze': ['Success', 'Fled'], 'Shining Light': ['Entered Light', 'Ignored'], 'The Ssssserpent': ['Agreed', 'Disagreed'],
+    'Golden Wing': ['Card Removal', 'Gained Gold', 'Ignored'], 'World of Goop': ['Gather Gold', 'Left Gold'],
+    'Vampires': ['Became a vampire', 'Ignored'], 'Council of Ghosts': ['Became a ghost', 'Ignored'],
+    'Addict': ['Obtained Relic', 'Stole Relic', 'Ignored'], 'Mysterious Sphere': ['Fight', 'Ignored'],
+    'Wheel of Change': ['Gold', 'Heal', 'Relic', 'Curse', 'Card Removal', 'Damage'],
+    'Match and Keep!': ['15 cards matched'], 'Lab': ['Got Potions'], 'Designer': ['Upgrade', 'Remove', 'Punch'],
+}
+NEOW_BONUSES = ['THREE_CARDS', 'RANDOM_COLORLESS', 'REMOVE_CARD', 'UPGRADE_CARD', 'TRANSFORM_CARD', 'THREE_ENEMY_KILL',
+                'TEN_PERCENT_HP_BONUS', 'RANDOM_COMMON_RELIC', 'HUNDRED_GOLD', 'BOSS_RELIC', 'ONE_RARE_RELIC',
+                'TWO_FIFTY_GOLD', 'REMOVE_TWO', 'TRANSFORM_TWO_CARDS', 'THREE_RARE_CARDS', 'TWENTY_PERCENT_HP_BONUS']
+NEOW_COSTS = ['NONE', 'TEN_PERCENT_HP_LOSS', 'NO_GOLD', 'CURSE', 'PERCENT_DAMAGE', 'LOSE_STARTER_RELIC']
+
+# Each act is 15 floors, a boss floor and a boss chest floor
+ACT_FLOORS = 17
+
+
+def _act_path(rng):
+    """Room types for the 15 floors of an act plus the boss floor"""
+    rooms = ['M']
+    for floor in range(2, 16):
+        if floor == 9:
+            rooms.append('T')
+        elif floor == 15:
+            rooms.append('R')
+        else:
+            rooms.append(rng.choices(['M', '?', 'E', 'R', '$'], weights=[45, 22, 8, 12, 5])[0])
+    rooms.append('B')
+    return rooms
+
+
+def generate_run(rng, index, start_timestamp=1600000000):
+    """Generate one synthetic .run dict"""
+    character = rng.choices(list(CHARACTERS), weights=[30, 25, 25, 15, 5])[0]
+    info = CHARACTERS[character]
+    ascension = rng.randint(0, 20)
+    is_daily = rng.random() < 0.05
+    strength = rng.random() - ascension * 0.015
+
+    # How far the run gets: 3 acts of 17 floors each, plus the optional act 4 (floors 52-56)
+    survive = min(0.98, 0.93 + strength * 0.06)
+    floor_reached = 1
+    while floor_reached < 51 and rng.random() < survive:
+        floor_reached += 1
+    victory = floor_reached >= 51 and rng.random() < 0.5 + strength * 0.4
+    if victory:
+        floor_reached = 56
+
+    path = []
+    for _ in range(3):
+        path.extend(_act_path(rng))
+        path.append(None)  # boss chest floor
+    path = path[:51] + ['R', '$', 'E', 'B'] if floor_reached > 51 else path[:51]
+    path_per_floor = path[:floor_reached]
+    path_taken = [room for room in path_per_floor if room is not None]
+
+    deck = list(info['basics'])
+    relics = [info['starter_relic']]
+    gold = 99
+    max_hp = info['max_hp']
+    hp = max_hp
+    gold_per_floor, hp_per_floor, max_hp_per_floor = [], [], []
+    card_choices, campfire_choices, damage_taken, event_choices = [], [], [], []
+    relics_obtained, boss_relics, items_purchased, item_purchase_floors = [], [], [], []
+    items_purged, items_purged_floors, potions_floor_usage = [], [], []
+    killed_by = None
+
+    for floor, room in enumerate(path_per_floor, start=1):
+        act = min(4, (floor - 1) // ACT_FLOORS + 1)
+        hallway, elites, bosses = ENEMIES[act]
+        if room in ('M', 'E', 'B') and (hallway or room != 'M'):
+            pool = {'M': hallway, 'E': elites, 'B': bosses}[room]
+            enemy = rng.choice(pool)
+            damage = max(0, int(rng.gauss({'M': 8, 'E': 18, 'B': 30}[room] * (1 + ascension / 20), 6)))
+            damage_taken.append({'damage': damage, 'enemies': enemy, 'floor': floor, 'turns': rng.randint(2, 9)})
+            hp -= damage
+            if floor == floor_reached and not victory:
+                killed_by = enemy
+                hp = 0
+            gold += rng.randint(10, 20) if room == 'M' else rng.randint(25, 35)
+            if rng.random() < 0.3:
+                potions_floor_usage.append(floor)
+
+            # Card reward
+            offered = rng.sample(info['cards'], 3)
+            offered = [card + '+1' if rng.random() < 0.08 else card for card in offered]
+            if rng.random() < 0.01:
+                offered[2] = 'Singing Bowl'
+            picked = 'SKIP' if rng.random() < 0.2 else offered[0]
+            if picked != 'SKIP':
+                deck.append(picked)
+            card_choices.append({
+                'not_picked': [card for card in offered if card != picked],
+                'picked': picked,
+                'floor': floor,
+            })
+
+            if room == 'E':
+                relic = rng.choice(RELICS)
+                relics.append(relic)
+                relics_obtained.append({'floor': floor, 'key': relic})
+            if room == 'B' and act < 3:
+                offered_relics = rng.sample(BOSS_RELICS, 3)
+                if rng.random() < 0.05:
+                    boss_relics.append({'not_picked': offered_relics})
+                else:
+                    boss_relics.append({'not_picked': offered_relics[1:], 'picked': offered_relics[0]})
+                    relics.append(offered_relics[0])
+        elif room == 'T':
+            relic = rng.choice(RELICS)
+            relics.append(relic)
+            relics_obtained.append({'floor': floor, 'key': relic})
+        elif room == 'R':
+            if hp < max_hp * 0.5 or rng.random() < 0.3:
+                campfire_choices.append({'floor': floor, 'key': 'REST'})
+                hp = min(max_hp, hp + int(max_hp * 0.3))
+            else:
+                upgradable = [i for i, card in enumerate(deck) if '+' not in card]
+                if upgradable:
+                    i = rng.choice(upgradable)
+                    campfire_choices.append({'floor': floor, 'data': deck[i], 'key': 'SMITH'})
+                    deck[i] = deck[i] + '+1'
+        elif room == '$':
+            for _ in range(rng.randint(0, 3)):
+                kind = rng.random()
+                item = rng.choice(info['cards']) if kind < 0.5 else (rng.choice(RELICS) if kind < 0.8 else rng.choice(POTIONS))
+                price = rng.randint(50, 160)
+                if gold >= price:
+                    gold -= price
+                    items_purchased.append(item)
+                    item_purchase_floors.append(floor)
+                    if item in RELICS:
+                        relics.append(item)
+                    elif item in info['cards']:
+                        deck.append(item)
+            if gold >= 75 and rng.random() < 0.4:
+                removable = [card for card in deck if card.startswith(('Strike', 'Defend'))]
+                if removable:
+                    card = rng.choice(removable)
+                    deck.remove(card)
+                    items_purged.append(card)
+                    items_purged_floors.append(floor)
+                    gold -= 75
+        elif room == '?':
+            event, choices = rng.choice(list(EVENTS.items()))
+            entry = {
+                'event_name': event, 'player_choice': rng.choice(choices), 'floor': floor,
+                'damage_taken': 0, 'damage_healed': 0, 'max_hp_gain': 0, 'max_hp_loss': 0,
+                'gold_gain': 0, 'gold_loss': 0,
+            }
+            roll = rng.random()
+            if roll < 0.2:
+                entry['damage_taken'] = rng.randint(3, 15)
+                hp -= entry['damage_taken']
+            elif roll < 0.35:
+                entry['gold_gain'] = rng.randint(20, 100)
+                gold += entry['gold_gain']
+            elif roll < 0.45:
+                relic = rng.choice(RELICS)
+                entry['relics_obtained'] = [relic]
+                relics.append(relic)
+            elif roll < 0.55:
+                card = rng.choice(info['cards'] + COLORLESS)
+                entry['cards_obtained'] = [card]
+                deck.append(card)
+            elif roll < 0.6:
+                entry['max_hp_gain'] = 5
+                max_hp += 5
+            event_choices.append(entry)
+
+        hp = max(hp, 1) if (victory or floor < floor_reached) else hp
+        gold_per_floor.append(gold)
+        hp_per_floor.append(max(hp, 0))
+        max_hp_per_floor.append(max_hp)
+
+    timestamp = start_timestamp + index * 3600 + rng.randint(0, 3000)
+    playtime = floor_reached * rng.randint(40, 120)
+    score = floor_reached * 5 + len(deck) * 2 + (250 if victory else 0) + ascension * 10
+    return {
+        'gold_per_floor': gold_per_floor,
+        'floor_reached': floor_reached,
+        'playtime': playtime,
+        'items_purged': items_purged,
+        'items_purged_floors': items_purged_floors,
+        'score': score,
+        'play_id': f'{index:08x}-synthetic-{rng.getrandbits(32):08x}',
+        'local_time': '20200101000000',
+        'is_ascension_mode': ascension > 0,
+        'campfire_choices': campfire_choices,
+        'neow_cost': rng.choice(NEOW_COSTS),
+        'seed_source_timestamp': timestamp * 1000 + rng.randint(0, 999),
+        'circlet_count': 0,
+        'master_deck': deck,
+        'relics': relics,
+        'potions_floor_usage': potions_floor_usage,
+        'damage_taken': damage_taken,
+        'seed_played': str(rng.getrandbits(62)),
+        'potions_obtained': [],
+        'is_trial': False,
+        'path_per_floor': path_per_floor,
+        'character_chosen': character,
+        'items_purchased': items_purchased,
+        'item_purchase_floors': item_purchase_floors,
+        'campfire_rested': sum(1 for c in campfire_choices if c['key'] == 'REST'),
+        'current_hp_per_floor': hp_per_floor,
+        'gold': gold,
+        'neow_bonus': rng.choice(NEOW_BONUSES),
+        'is_prod': False,
+        'is_daily': is_daily,
+        'chose_seed': False,
+        'campfire_upgraded': sum(1 for c in campfire_choices if c['key'] == 'SMITH'),
+        'win_rate': 0,
+        'timestamp': timestamp,
+        'path_taken': path_taken,
+        'build_version': '2022-12-18',
+        'purchased_purges': len(items_purged),
+        'victory': victory,
+        'max_hp_per_floor': max_hp_per_floor,
+        'card_choices': card_choices,
+        'player_experience': 0,
+        'relics_obtained': relics_obtained,
+        'event_choices': event_choices,
+        'is_beta': False,
+        'boss_relics': boss_relics,
+        'is_endless': False,
+        'potions_floor_spawned': [],
+        'killed_by': killed_by,
+        'ascension_level': ascension,
+    }
+
+
+def add_mod_fields(run, rng):
+    """
+    Add the kind of per-floor logs run history mods write into .run files
+    (none of which the app reads), making the run several times larger
+    """
+    floors = run['floor_reached']
+    potions = ['Fire Potion', 'Block Potion', 'Energy Potion', 'Swift Potion', 'Strength Potion']
+    run['potion_use_per_floor'] = [rng.sample(potions, rng.randint(0, 2)) for _ in range(floors)]
+    run['potion_discard_per_floor'] = [[] for _ in range(floors)]
+    run['max_orbs_per_floor'] = [rng.randint(0, 3) for _ in range(floors)]
+    run['improvable_cards'] = [rng.sample(run['master_deck'], min(8, len(run['master_deck']))) for _ in range(floors)]
+    run['rewards_skipped'] = [
+        {'floor': floor, 'cards': rng.sample(run['master_deck'], 3), 'relics': [], 'potions': rng.sample(potions, 1), 'gold': 0}
+        for floor in range(1, floors + 1, 3)
+    ]
+    run['relic_stats'] = {
+        relic: {'obtain_floor': rng.randint(0, floors), 'per_floor': [rng.randint(0, 9) for _ in range(floors)]}
+        for relic in run['relics']
+    }
+    return run
+
+
+def iter_runs(count, seed=0, modded=False):
+    """Yield count synthetic runs (with mod logs added if modded)"""
+    rng = random.Random(seed)
+    for i in range(count):
+        run = generate_run(rng, i)
+        yield add_mod_fields(run, rng) if modded else run
+
+
+def generate_runs(count, seed=0, modded=False):
+    """List of count synthetic runs"""
+    return list(iter_runs(count, seed, modded))
+
+
+def write_corpus(path, count, seed=0, modded=False):
+    """Write count synthetic .run files into a ZIP archive (streamed, one run at a time)"""
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for run in iter_runs(count, seed, modded):
+            archive.writestr(f"{run['character_chosen']}/{run['timestamp']}.run", json.dumps(run))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a synthetic .run corpus')
+    parser.add_argument('--runs', type=int, default=1000, help='number of runs to generate')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    parser.add_argument('--out', default='synthetic_runs.zip', help='output ZIP path')
+    parser.add_argument('--modded', action='store_true', help='add per-floor logs like run history mods write')
+    args = parser.parse_args()
+
+    write_corpus(args.out, args.runs, args.seed, args.modded)
+    print(f"Wrote {args.runs} runs to {args.out}")
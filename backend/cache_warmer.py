@@ -0,0 +1,93 @@
+"""
+Background warming of the result cache
+After startup and after each upload the analytics endpoints are requested,
+through the app itself, for the common filter combinations, so their
+responses are in the result cache (under the same keys as the frontend's
+requests) before a visitor asks for them. Warming runs in a small thread
+pool and waits while interactive requests are being served.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+from flask import g, request
+import metrics
+
+# Marks the warmer's own requests, so they do not count as interactive
+WARM_HEADER = 'X-Cache-Warm'
+
+# How often a waiting warm request checks for interactive requests again
+IDLE_POLL_SECONDS = 0.05
+
+
+def filter_cube(characters):
+    """
+    Query strings for the common filter combinations, most common first:
+    every character (and none), with and without ignore_downfall, and
+    daily, non-daily or either
+    """
+    queries = []
+    for is_daily in ('', 'false', 'true'):
+        for ignore_downfall in ('true', 'false'):
+            for character in ('',) + tuple(sorted(characters)):
+                params = {'character': character, 'is_daily': is_daily, 'ignore_downfall': ignore_downfall}
+                queries.append(urlencode({name: value for name, value in params.items() if value}))
+    return queries
+
+
+class CacheWarmer:
+    """Requests paths of app in the background; start() again while warming queues one more pass"""
+
+    def __init__(self, app, paths, workers=1):
+        self.app = app
+        self.paths = paths
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._running = False
+        self._pending = False
+        self._active = 0
+
+        @app.before_request
+        def interactive_started():
+            if WARM_HEADER not in request.headers:
+                g.interactive = True
+                with self._lock:
+                    self._active += 1
+
+        @app.teardown_request
+        def interactive_finished(error=None):
+            if g.pop('interactive', False):
+                with self._lock:
+                    self._active -= 1
+
+    def start(self):
+        """Warm every path from a background thread"""
+        with self._lock:
+            if self._running:
+                self._pending = True
+                return
+            self._running = True
+        threading.Thread(target=self._run, name='cache-warmer', daemon=True).start()
+
+    def _run(self):
+        while True:
+            start = time.perf_counter()
+            with ThreadPoolExecutor(self.workers, thread_name_prefix='cache-warmer') as executor:
+                list(executor.map(self._warm, self.paths))
+            print(f"Warmed {len(self.paths)} cached responses in {time.perf_counter() - start:.1f}s")
+            with self._lock:
+                if not self._pending:
+                    self._running = False
+                    return
+                self._pending = False
+
+    def _warm(self, path):
+        while self._active:
+            time.sleep(IDLE_POLL_SECONDS)
+        try:
+            response = self.app.test_client().get(path, headers={WARM_HEADER: '1'})
+            status = response.status_code
+        except Exception as e:
+            print(f"Error warming {path}: {e}")
+            status = 'error'
+        metrics.increment('sts_cache_warm_requests_total', status=status)
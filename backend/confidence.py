@@ -0,0 +1,105 @@
+"""
+Confidence intervals for win rates and pick rates
+Wilson score intervals plus a binomial bootstrap that resamples every
+item (card, relic, ...) at once in a single (items x resamples) matrix.
+"""
+import zlib
+import numpy as np
+from result_cache import ResultCache
+
+# Two-sided 95% normal quantile
+Z_95 = 1.959963984540054
+
+DEFAULT_RESAMPLES = 1000
+
+# Interval arrays per (name, filter fingerprint, corpus version), shared by request threads
+INTERVAL_CACHE_BYTES = 32 * 1024 * 1024
+_interval_cache = ResultCache('rate_intervals', INTERVAL_CACHE_BYTES)
+
+CI_MODES = {'wilson', 'bootstrap', 'all'}
+
+
+def parse_ci_mode(value):
+    """Normalize the ?ci= query parameter (None when intervals are not requested)"""
+    if not value or value.lower() in ('0', 'false', 'none'):
+        return None
+    value = value.lower()
+    if value in ('1', 'true'):
+        return 'all'
+    return value if value in CI_MODES else None
+
+
+def wilson_interval(successes, trials, z=Z_95):
+    """Wilson score interval for each successes/trials pair (NaN where trials == 0)"""
+    successes = np.asarray(successes, dtype=np.float64)
+    trials = np.asarray(trials, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p = successes / trials
+        denominator = 1 + z ** 2 / trials
+        center = (p + z ** 2 / (2 * trials)) / denominator
+        half_width = z * np.sqrt(p * (1 - p) / trials + z ** 2 / (4 * trials ** 2)) / denominator
+    return center - half_width, center + half_width
+
+
+def bootstrap_interval(successes, trials, resamples=DEFAULT_RESAMPLES, seed=0, alpha=0.05):
+    """
+    Percentile bootstrap interval for each successes/trials pair
+    Resampling n Bernoulli outcomes with replacement is a Binomial(n, p) draw,
+    so all items are resampled together as one binomial matrix.
+    """
+    successes = np.asarray(successes, dtype=np.float64)
+    trials = np.asarray(trials, dtype=np.int64)
+    rng = np.random.default_rng(seed)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p = np.where(trials > 0, successes / np.maximum(trials, 1), 0)
+        draws = rng.binomial(trials[:, None], p[:, None], size=(len(trials), resamples))
+        rates = draws / trials[:, None]
+    low, high = np.percentile(rates, [100 * alpha / 2, 100 * (1 - alpha / 2)], axis=1)
+    low[trials == 0] = np.nan
+    high[trials == 0] = np.nan
+    return low, high
+
+
+def rate_intervals(successes, trials, mode, seed=0):
+    """Intervals (as percentages) for the requested mode: {'wilson': (low, high), 'bootstrap': (low, high)}"""
+    intervals = {}
+    if mode in ('wilson', 'all'):
+        low, high = wilson_interval(successes, trials)
+        intervals['wilson'] = (low * 100, high * 100)
+    if mode in ('bootstrap', 'all'):
+        low, high = bootstrap_interval(successes, trials, seed=seed)
+        intervals['bootstrap'] = (low * 100, high * 100)
+    return intervals
+
+
+def cached_rate_intervals(name, fingerprint, version, mode, counts):
+    """
+    Intervals for several rates, cached per filter fingerprint and corpus version
+    counts maps a rate name to its (successes, trials) arrays. A version of
+    None (counts not computed from the run index) is never cached.
+    """
+    key = (name, fingerprint, version, mode)
+    if version is not None:
+        intervals = _interval_cache.get(key)
+        if intervals is not None:
+            return intervals
+
+    # Seed from the fingerprint so repeated requests give identical intervals
+    seed = zlib.crc32(repr(key[:2]).encode())
+    intervals = {
+        rate: rate_intervals(successes, trials, mode, seed=seed)
+        for rate, (successes, trials) in counts.items()
+    }
+    if version is not None:
+        size = sum(bound.nbytes for methods in intervals.values() for bounds in methods.values() for bound in bounds)
+        _interval_cache.put(key, intervals, size)
+    return intervals
+
+
+def interval_at(intervals, i):
+    """JSON-friendly intervals for item i ({'wilson': [low, high], ...}, None for undefined)"""
+    result = {}
+    for method, (low, high) in intervals.items():
+        result[method] = None if np.isnan(low[i]) else [float(low[i]), float(high[i])]
+    return result
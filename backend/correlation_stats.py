@@ -0,0 +1,158 @@
+"""
+Correlation features and online sufficient statistics
+Each run is turned into a fixed feature vector once. Per filter bucket
+(character x ascension x daily) we keep n, sum(x) and sum(x x^T), so a
+correlation matrix can be computed in O(features^2) regardless of run count.
+"""
+import numpy as np
+
+FEATURE_NAMES = [
+    'victory', 'floor_reached', 'score', 'playtime', 'gold', 'ascension_level',
+    'campfire_rested', 'campfire_upgraded', 'items_purged_count', 'purchased_purges',
+    'deck_size', 'relic_count', 'potions_used', 'total_damage_taken', 'battles_count',
+    'avg_damage_per_battle', 'cards_picked', 'cards_skipped', 'events_encountered',
+    'items_purchased_count', 'max_hp_final', 'current_hp_final', 'is_defect', 'is_ironclad',
+    'is_silent', 'is_watcher', 'small_deck', 'medium_deck', 'large_deck',
+]
+
+# Filters that can be answered from bucket sums alone
+BUCKET_FILTERS = {'character', 'ascension_level', 'is_daily', 'ignore_downfall'}
+
+
+def extract_run_features(run):
+    """Extract numerical features from a single run for correlation analysis"""
+    return {
+        'victory': 1 if run.get('victory', False) else 0,
+        'floor_reached': run.get('floor_reached', 0),
+        'score': run.get('score', 0),
+        'playtime': run.get('playtime', 0),
+        'gold': run.get('gold', 0),
+        'ascension_level': run.get('ascension_level', 0),
+        'campfire_rested': run.get('campfire_rested', 0),
+        'campfire_upgraded': run.get('campfire_upgraded', 0),
+        'items_purged_count': len(run.get('items_purged', [])),
+        'purchased_purges': run.get('purchased_purges', 0),
+        'deck_size': len(run.get('master_deck', [])),
+        'relic_count': len(run.get('relics', [])),
+        'potions_used': len(run.get('potions_floor_usage', [])),
+        'total_damage_taken': sum([d.get('damage', 0) for d in run.get('damage_taken', [])]),
+        'battles_count': len(run.get('damage_taken', [])),
+        'avg_damage_per_battle': sum([d.get('damage', 0) for d in run.get('damage_taken', [])]) / max(len(run.get('damage_taken', [])), 1),
+        'cards_picked': len(run.get('card_choices', [])),
+        'cards_skipped': sum([1 for c in run.get('card_choices', []) if c.get('picked') == 'SKIP']),
+        'events_encountered': len(run.get('event_choices', [])),
+        'items_purchased_count': len(run.get('items_purchased', [])),
+        'max_hp_final': run.get('max_hp_per_floor', [0])[-1] if run.get('max_hp_per_floor') else 0,
+        'current_hp_final': run.get('current_hp_per_floor', [0])[-1] if run.get('current_hp_per_floor') else 0,
+        'is_defect': 1 if run.get('character') == 'DEFECT' else 0,
+        'is_ironclad': 1 if run.get('character') == 'IRONCLAD' else 0,
+        'is_silent': 1 if run.get('character') == 'THE_SILENT' else 0,
+        'is_watcher': 1 if run.get('character') == 'WATCHER' else 0,
+        'small_deck': 1 if len(run.get('master_deck', [])) <= 25 else 0,
+        'medium_deck': 1 if 26 <= len(run.get('master_deck', [])) <= 40 else 0,
+        'large_deck': 1 if len(run.get('master_deck', [])) > 40 else 0,
+    }
+
+
+def extract_features_for_correlation(runs):
+    """Extract numerical features from runs for correlation analysis"""
+    import pandas as pd
+
+    return pd.DataFrame([extract_run_features(run) for run in runs], columns=FEATURE_NAMES)
+
+
+def feature_matrix(runs):
+    """Feature vectors for runs as an (n_runs, n_features) float array"""
+    return np.asarray(
+        [[features[name] for name in FEATURE_NAMES] for features in map(extract_run_features, runs)],
+        dtype=np.float64
+    ).reshape(-1, len(FEATURE_NAMES))
+
+
+def pearson_from_sums(n, sums, cross):
+    """
+    Pearson correlation matrix with p-values and 95% confidence intervals
+    computed from n, sum(x) and sum(x x^T). Constant features give NaN,
+    like pandas.DataFrame.corr.
+    """
+    from scipy import stats
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = cross - np.outer(sums, sums) / n
+        variance = np.diag(cov)
+        std = np.sqrt(np.maximum(variance, 0))
+        corr = np.clip(cov / np.outer(std, std), -1, 1)
+
+        # Treat variance lost in floating point cancellation as constant
+        constant = variance / n <= 1e-9 * np.maximum((sums / n) ** 2, 1)
+        corr[:, constant] = np.nan
+        corr[constant, :] = np.nan
+
+        # t-test for r != 0 with n - 2 degrees of freedom
+        if n > 2:
+            t = corr * np.sqrt((n - 2) / (1 - corr ** 2))
+            p_values = 2 * stats.t.sf(np.abs(t), n - 2)
+        else:
+            p_values = np.full_like(corr, np.nan)
+
+        # Fisher z-transform interval
+        if n > 3:
+            z = np.arctanh(np.clip(corr, -0.9999999, 0.9999999))
+            half_width = 1.959963984540054 / np.sqrt(n - 3)
+            ci_low, ci_high = np.tanh(z - half_width), np.tanh(z + half_width)
+        else:
+            ci_low = ci_high = np.full_like(corr, np.nan)
+
+    return corr, p_values, ci_low, ci_high
+
+
+class CorrelationStats:
+    """Online sufficient statistics per (character, ascension, is_daily) bucket"""
+
+    def __init__(self):
+        self.buckets = {}
+
+    def copy(self):
+        stats = CorrelationStats()
+        stats.buckets = dict(self.buckets)
+        return stats
+
+    def add(self, features, characters, ascension_levels, is_daily):
+        """Fold a batch of feature rows into their buckets"""
+        keys = list(zip(characters, ascension_levels, is_daily))
+        rows_by_key = {}
+        for row, key in enumerate(keys):
+            rows_by_key.setdefault(key, []).append(row)
+
+        for key, rows in rows_by_key.items():
+            x = features[rows]
+            n, sums, cross = self.buckets.get(key, (0, 0.0, 0.0))
+            self.buckets[key] = (n + len(rows), sums + x.sum(axis=0), cross + x.T @ x)
+
+    def totals(self, filters, base_characters):
+        """
+        Sum the buckets matching filters
+        Returns None when a filter (dates, victory) cuts across buckets.
+        """
+        if any(value not in (None, '') for key, value in filters.items() if key not in BUCKET_FILTERS):
+            return None
+
+        ignore_downfall = (filters.get('ignore_downfall') or '').lower() == 'true'
+        character = filters.get('character')
+        ascension = filters.get('ascension_level')
+        is_daily = filters.get('is_daily')
+
+        n, sums, cross = 0, np.zeros(len(FEATURE_NAMES)), np.zeros((len(FEATURE_NAMES), len(FEATURE_NAMES)))
+        for (bucket_character, bucket_ascension, bucket_daily), bucket in self.buckets.items():
+            if ignore_downfall and bucket_character not in base_characters:
+                continue
+            if character and bucket_character != character:
+                continue
+            if ascension not in (None, '') and bucket_ascension != int(ascension):
+                continue
+            if is_daily not in (None, '') and bucket_daily != (is_daily.lower() == 'true'):
+                continue
+            n += bucket[0]
+            sums = sums + bucket[1]
+            cross = cross + bucket[2]
+        return n, sums, cross
@@ -0,0 +1,119 @@
+"""
+Analytics aggregates computed inside Postgres
+The functions in supabase_functions.sql expand the runs' event arrays
+(generated columns extracted from raw_data) with the filters pushed down
+and return one small jsonb result each. With
+AGGREGATE_BACKEND=rpc the summary, card, relic and enemy endpoints use
+them instead of the in-memory run index, so a worker never has to hold
+the corpus. Results are converted to the shapes the index produces, so
+the endpoints format both the same way.
+"""
+import numpy as np
+from run_index import RELIC_SOURCES, Vocabulary, date_bounds
+from supabase_client import get_supabase_client
+
+
+def rpc_params(filters):
+    """Function arguments for request filters (see filtered_runs in supabase_functions.sql)"""
+    def flag(name):
+        value = filters.get(name)
+        return None if value in (None, '') else value.lower() == 'true'
+
+    start_ts, end_ts = date_bounds(filters)
+    ascension_level = filters.get('ascension_level')
+    return {
+        'p_character': filters.get('character') or None,
+        'p_start_ts': start_ts,
+        'p_end_ts': end_ts,
+        'p_ascension_level': int(ascension_level) if ascension_level not in (None, '') else None,
+        'p_victory': flag('victory'),
+        'p_is_daily': flag('is_daily'),
+        'p_base_game_only': bool(flag('ignore_downfall'))
+    }
+
+
+def call(function, filters):
+    """Rows returned by an aggregate function for filters"""
+    supabase = get_supabase_client()
+    if not supabase:
+        raise RuntimeError('Failed to connect to Supabase')
+    return supabase.rpc(function, rpc_params(filters)).execute().data or []
+
+
+def counts_by_item(rows, item, columns):
+    """
+    (item names, character names, counts) from per-item rows, with counts
+    holding one array per column plus an items x characters 'characters' matrix
+    """
+    characters = Vocabulary()
+    names = [row[item] for row in rows]
+    counts = {column: np.asarray([row[column] for row in rows], dtype=np.int64) for column in columns}
+    character_ids = [[characters.add(name) for name in row['characters'] or []] for row in rows]
+    counts['characters'] = np.zeros((len(rows), len(characters)), dtype=np.int64)
+    for i, ids in enumerate(character_ids):
+        counts['characters'][i, ids] = 1
+    return names, characters.names, counts
+
+
+def card_counts(filters):
+    """Per-card counters like CardEventTable.counts (only cards picked at least once)"""
+    return counts_by_item(
+        call('card_stats', filters), 'card',
+        ('picks', 'picked_upgraded', 'victories', 'offered', 'skipped', 'campfire_upgrades')
+    )
+
+
+def relic_counts(filters):
+    """Per-relic counters like RelicEventTable.counts (only relics picked at least once)"""
+    rows = call('relic_stats', filters)
+    names, characters, counts = counts_by_item(
+        rows, 'relic', ('picks', 'victories', 'boss_offers', 'boss_picks', 'held_at_death')
+    )
+    counts['sources'] = np.asarray(
+        [[row['sources'][source] for source in RELIC_SOURCES] for row in rows], dtype=np.int64
+    ).reshape(len(rows), len(RELIC_SOURCES))
+    return names, characters, counts
+
+
+def run_summary(filters):
+    """The /api/stats response for filters (None if no runs match)"""
+    rows = call('run_summary', filters)
+    total_runs = sum(row['total_runs'] for row in rows)
+    if total_runs == 0:
+        return None
+
+    victories = sum(row['victories'] for row in rows)
+    return {
+        'total_runs': total_runs,
+        'victories': victories,
+        'win_rate': victories / total_runs * 100,
+        'character_distribution': {row['character']: row['total_runs'] for row in rows},
+        'win_rate_by_character': {
+            row['character']: {
+                'wins': row['victories'],
+                'total': row['total_runs'],
+                'win_rate': row['victories'] / row['total_runs'] * 100
+            }
+            for row in rows
+        },
+        'avg_floor_reached': sum(row['floor_reached'] or 0 for row in rows) / total_runs,
+        'avg_score': sum(row['score'] for row in rows) / total_runs,
+        'avg_playtime_seconds': sum(row['playtime'] for row in rows) / total_runs,
+        'highest_score': max(row['highest_score'] for row in rows),
+        'deepest_floor': max(row['deepest_floor'] or 0 for row in rows)
+    }
+
+
+def enemy_stats(filters):
+    """Per-enemy totals keyed by enemy, as accumulated by /api/enemies"""
+    return {
+        row['enemy']: {
+            'encounters': row['encounters'],
+            'total_damage': row['total_damage'],
+            'total_turns': row['total_turns'],
+            'defeats_player': row['defeats_player'],
+            'in_victories': row['in_victories'],
+            'in_defeats': row['in_defeats']
+        }
+        for row in call('enemy_stats', filters)
+    }
@@ -0,0 +1,299 @@
+"""
+In-process stand-in for the Supabase client
+Implements the subset of the query builder the app uses
+(table().select().eq().gt()/gte()/lt().in_().order().limit().range()
+.insert()/update().execute(), plus count='exact') so the backend can be run and load-tested without a
+live Supabase project. Rows are stored as JSON text in primary key order
+and decoded on every select, like a real PostgREST response.
+
+Latency can be injected per request and per returned row, and the number
+of requests served at once can be capped, to model a remote database
+deterministically.
+"""
+import bisect
+import json
+import operator
+import random
+import uuid
+import threading
+import time
+import zipfile
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Columns with a UNIQUE constraint in supabase_schema.sql
+UNIQUE_COLUMNS = {'runs': ('run_identifier',), 'run_archives': ('run_identifier',)}
+
+# Columns with an index in supabase_schema.sql that the app filters on; range
+# filters on them are evaluated without decoding rows
+INDEXED_COLUMNS = {'runs': ('uploaded_at',)}
+
+# Inserts larger than this re-sort the table instead of inserting row by row
+BULK_INSERT_ROWS = 64
+
+
+class FakeAPIError(Exception):
+    """Raised where PostgREST would return an error (e.g. unique violation)"""
+
+
+class FakeResponse:
+    """Mimics the postgrest APIResponse (data and count)"""
+
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class FakeQuery:
+    """Chainable query against one in-memory table"""
+
+    def __init__(self, client, table_name):
+        self.client = client
+        self.table_name = table_name
+        self.columns = '*'
+        self.count_mode = None
+        self.predicates = []
+        self.indexed_predicates = []
+        self.id_bounds = []
+        self.row_limit = None
+        self.row_range = None
+        self.order_by = None
+        self.rows_to_insert = None
+        self.values_to_update = None
+
+    def select(self, columns='*', count=None):
+        self.columns = columns
+        self.count_mode = count
+        return self
+
+    def eq(self, column, value):
+        self.predicates.append(lambda row: row.get(column) == value)
+        return self
+
+    def gt(self, column, value):
+        return self._compare(column, value, operator.gt, bisect.bisect_right, 0)
+
+    def gte(self, column, value):
+        return self._compare(column, value, operator.ge, bisect.bisect_left, 0)
+
+    def lt(self, column, value):
+        return self._compare(column, value, operator.lt, bisect.bisect_left, 1)
+
+    def _compare(self, column, value, compare, position, side):
+        # Bounds on the id column slice the id-ordered table without decoding
+        if column == 'id':
+            self.id_bounds.append((value, position, side))
+        elif column in INDEXED_COLUMNS.get(self.table_name, ()):
+            self.indexed_predicates.append((column, lambda cell: cell is not None and compare(cell, value)))
+        else:
+            self.predicates.append(lambda row: row.get(column) is not None and compare(row.get(column), value))
+        return self
+
+    def in_(self, column, values):
+        values = set(values)
+        self.predicates.append(lambda row: row.get(column) in values)
+        return self
+
+    def order(self, column, desc=False):
+        self.order_by = (column, desc)
+        return self
+
+    def limit(self, size):
+        self.row_limit = size
+        return self
+
+    def range(self, start, end):
+        self.row_range = (start, end)
+        return self
+
+    def insert(self, rows):
+        self.rows_to_insert = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def update(self, values):
+        self.values_to_update = values
+        return self
+
+    def execute(self):
+        with self.client.request_slot():
+            if self.rows_to_insert is not None:
+                response = self.client.insert_rows(self.table_name, self.rows_to_insert)
+            elif self.values_to_update is not None:
+                response = self.client.update_rows(self.table_name, self.values_to_update, self.predicates)
+            else:
+                response = self._select()
+            self.client.simulate_latency(len(response.data))
+        return response
+
+    def _select(self):
+        with self.client.lock:
+            rows = self.client.tables.get(self.table_name, [])
+            ids = self.client.ids.get(self.table_name, [])
+            start, end = 0, len(rows)
+            for value, position, side in self.id_bounds:
+                if side == 0:
+                    start = max(start, position(ids, value))
+                else:
+                    end = min(end, position(ids, value))
+            end = max(start, end)
+            rows = rows[start:end]
+            if self.indexed_predicates:
+                columns = self.client.indexed.get(self.table_name, {})
+                keep = range(len(rows))
+                for column, test in self.indexed_predicates:
+                    cells = columns[column]
+                    keep = [i for i in keep if test(cells[start + i])]
+                rows = [rows[i] for i in keep]
+
+        # Rows are stored in id order, so only other orderings need decoding
+        decoded = bool(self.predicates) or self.order_by not in (None, ('id', False))
+        if decoded:
+            rows = [json.loads(row) for row in rows]
+            rows = [row for row in rows if all(predicate(row) for predicate in self.predicates)]
+        if self.order_by not in (None, ('id', False)):
+            column, desc = self.order_by
+            rows.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=desc)
+        count = len(rows) if self.count_mode == 'exact' else None
+
+        if self.row_range is not None:
+            rows = rows[self.row_range[0]:self.row_range[1] + 1]
+        if self.row_limit is not None:
+            rows = rows[:self.row_limit]
+        if self.client.max_rows is not None and self.columns != 'count':
+            rows = rows[:self.client.max_rows]
+        if not decoded:
+            rows = [json.loads(row) for row in rows]
+        if self.columns not in ('*', 'count'):
+            columns = [column.strip() for column in self.columns.split(',')]
+            rows = [{column: row.get(column) for column in columns} for row in rows]
+        elif self.columns == 'count':
+            rows = [{'count': count}] if self.row_limit != 0 else []
+
+        return FakeResponse(rows, count)
+
+
+class FakeSupabaseClient:
+    """
+    Drop-in replacement for supabase.Client backed by in-memory tables
+
+    Args:
+        latency_ms: fixed delay added to every request
+        row_latency_us: extra delay per row returned or inserted
+        jitter_ms: uniform random extra delay (seeded, so runs are repeatable)
+        max_concurrency: requests served at once (None for unlimited)
+        max_rows: rows returned per select at most, like PostgREST's db-max-rows
+            (None for unlimited)
+        seed: seed for the jitter and generated ids
+    """
+
+    def __init__(self, latency_ms=0.0, row_latency_us=0.0, jitter_ms=0.0, max_concurrency=None, max_rows=None, seed=0):
+        self.tables = {}
+        self.ids = {}
+        self.indexed = {}
+        self.unique_keys = {}
+        self.lock = threading.Lock()
+        self.latency_ms = latency_ms
+        self.row_latency_us = row_latency_us
+        self.jitter_ms = jitter_ms
+        self.random = random.Random(seed)
+        self.id_random = random.Random(seed)
+        self.slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        self.max_rows = max_rows
+        self.request_count = 0
+
+    def table(self, table_name):
+        return FakeQuery(self, table_name)
+
+    def request_slot(self):
+        """Context manager limiting how many requests run at once"""
+        with self.lock:
+            self.request_count += 1
+        return self.slots if self.slots is not None else nullcontext()
+
+    def simulate_latency(self, rows):
+        """Sleep for the configured request and per-row latency"""
+        delay = self.latency_ms / 1000 + rows * self.row_latency_us / 1e6
+        if self.jitter_ms:
+            with self.lock:
+                delay += self.random.uniform(0, self.jitter_ms) / 1000
+        if delay > 0:
+            time.sleep(delay)
+
+    def insert_rows(self, table_name, rows):
+        """
+        Insert rows in primary key order, enforcing the unique columns of the
+        real schema and filling in the id and uploaded_at defaults
+        """
+        unique_columns = UNIQUE_COLUMNS.get(table_name, ())
+        indexed_columns = INDEXED_COLUMNS.get(table_name, ())
+        with self.lock:
+            table = self.tables.setdefault(table_name, [])
+            ids = self.ids.setdefault(table_name, [])
+            indexed = self.indexed.setdefault(table_name, {column: [] for column in indexed_columns})
+            seen = self.unique_keys.setdefault(table_name, set())
+            keys = [(column, row.get(column)) for row in rows for column in unique_columns]
+            duplicates = [key for key in keys if key in seen]
+            if duplicates or len(set(keys)) != len(keys):
+                raise FakeAPIError(f'duplicate key value violates unique constraint on {table_name}')
+            seen.update(keys)
+
+            uploaded_at = datetime.now(timezone.utc).isoformat()
+            rows = [dict(
+                row,
+                id=row.get('id') or str(uuid.UUID(int=self.id_random.getrandbits(128), version=4)),
+                uploaded_at=row.get('uploaded_at') or uploaded_at
+            ) for row in rows]
+
+            if len(rows) > BULK_INSERT_ROWS:
+                columns = [ids, table] + [indexed[column] for column in indexed_columns]
+                new_cells = [[row['id'] for row in rows], [json.dumps(row) for row in rows]]
+                new_cells += [[row.get(column) for row in rows] for column in indexed_columns]
+                ordered = sorted(zip(*(old + new for old, new in zip(columns, new_cells))))
+                for i, column in enumerate(columns):
+                    column[:] = [cells[i] for cells in ordered]
+            else:
+                for row in rows:
+                    position = bisect.bisect(ids, row['id'])
+                    ids.insert(position, row['id'])
+                    table.insert(position, json.dumps(row))
+                    for column in indexed_columns:
+                        indexed[column].insert(position, row.get(column))
+        return FakeResponse(rows)
+
+    def update_rows(self, table_name, values, predicates):
+        """Set values on every row matching all predicates"""
+        indexed_columns = [column for column in INDEXED_COLUMNS.get(table_name, ()) if column in values]
+        updated = []
+        with self.lock:
+            table = self.tables.get(table_name, [])
+            for position, encoded in enumerate(table):
+                row = json.loads(encoded)
+                if all(predicate(row) for predicate in predicates):
+                    row.update(values)
+                    table[position] = json.dumps(row)
+                    for column in indexed_columns:
+                        self.indexed[table_name][column][position] = row[column]
+                    updated.append(row)
+        return FakeResponse(updated)
+
+    def load_corpus(self, path):
+        """Insert every .run file from a ZIP archive or directory into the runs table"""
+        from run_parser import parse_run_file
+
+        path = Path(path)
+        if path.suffix == '.zip':
+            with zipfile.ZipFile(path) as archive:
+                contents = [(archive.read(name).decode('utf-8'), name) for name in archive.namelist() if name.endswith('.run')]
+        else:
+            contents = [(run_file.read_text(encoding='utf-8'), run_file.name) for run_file in path.rglob('*.run')]
+
+        rows = {}
+        for content, filename in contents:
+            row = parse_run_file(content, filename)
+            if row:
+                rows[row['run_identifier']] = row
+        rows = list(rows.values())
+        if rows:
+            self.insert_rows('runs', rows)
+        return len(rows)
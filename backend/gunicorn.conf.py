@@ -0,0 +1,32 @@
+"""
+Gunicorn settings for production
+Start with `gunicorn -c gunicorn.conf.py app:app`. With GUNICORN_PRELOAD=1
+(the default) the app is imported once in the master process, which imports
+the analytics dependencies and builds or refreshes the run index snapshot
+before the workers are forked; every worker then shares those modules and
+maps the same snapshot files instead of loading its own copy of the corpus
+(see index_snapshot.py). With GUNICORN_PRELOAD=0 each worker boots in a
+fraction of a second and imports them on its first analytics request.
+Each worker then warms its result cache in the background (see
+cache_warmer.py).
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '10000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') == '1'
+
+
+def when_ready(server):
+    """Runs in the master before the first workers are spawned"""
+    if preload_app:
+        from app import preload_analytics, prepare_snapshot
+        preload_analytics()
+        prepare_snapshot()
+
+
+def post_worker_init(worker):
+    """Runs in each worker once it has loaded the app"""
+    from app import warm_cache
+    warm_cache()
@@ -0,0 +1,246 @@
+"""
+On-disk snapshots of the run index for fast cold starts
+A snapshot is a generation directory holding one .npy file per index array
+(memory-mapped on load), the runs as a JSON-lines blob (memory-mapped and
+decoded lazily by RunStore) and meta.json with the vocabularies,
+correlation buckets and the high-water mark of the rows it contains.
+The CURRENT file names the newest complete generation and is replaced
+atomically, so a reader never sees a half-written snapshot.
+
+Every gunicorn worker maps the same generation, so the arrays and the run
+blob live once in the page cache however many workers there are; a
+worker that sees CURRENT change switches to the new generation.
+"""
+import json
+import mmap
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+import numpy as np
+from correlation_stats import FEATURE_NAMES
+from run_index import RELIC_SOURCES, RunIndex, RunStore, Vocabulary
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process development server only
+    fcntl = None
+
+# Bump when the layout of the files changes
+SNAPSHOT_FORMAT = 1
+
+# Snapshot directories whose lock the current thread holds
+_held_locks = threading.local()
+
+
+def schema():
+    """Array names and dtypes per table and relic source codes; a snapshot written by a different schema is ignored"""
+    index = RunIndex()
+    return {
+        'format': SNAPSHOT_FORMAT,
+        'arrays': list(RunIndex.ARRAYS),
+        'tables': {
+            name: {array: getattr(getattr(index, name), array).dtype.str for array in getattr(index, name).ARRAYS}
+            for name in RunIndex.TABLES
+        },
+        'features': list(FEATURE_NAMES),
+        'relic_sources': list(RELIC_SOURCES)
+    }
+
+
+def current_generation(directory):
+    """Name of the newest complete snapshot generation (None if there is none)"""
+    try:
+        return (Path(directory) / 'CURRENT').read_text().strip() or None
+    except OSError:
+        return None
+
+
+@contextmanager
+def snapshot_lock(directory):
+    """
+    Exclusive lock across processes (and threads) sharing directory
+    The worker holding it is the designated loader: it builds and saves the
+    index while the others wait, then map the snapshot it wrote. Writers
+    hold it too, and a thread already holding it may take it again.
+    """
+    if not directory or fcntl is None:
+        yield
+        return
+
+    key = str(Path(directory).resolve())
+    held = getattr(_held_locks, 'directories', None)
+    if held is None:
+        held = _held_locks.directories = set()
+    if key in held:
+        yield
+        return
+
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    with open(Path(directory) / '.lock', 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        held.add(key)
+        try:
+            yield
+        finally:
+            held.discard(key)
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def generation_order(generation):
+    """Sort key of a generation name (None if it is not one): its creation time in ms, then pid"""
+    created, _, pid = generation.partition('-')
+    return (int(created), pid) if created.isdigit() else None
+
+
+def save_snapshot(directory, index, high_water_mark):
+    """
+    Write index as a new snapshot generation and make it current
+    Holds snapshot_lock, so concurrent writers (threads or workers) take
+    turns and CURRENT always names a complete generation.
+
+    Args:
+        directory: snapshot root (created if needed)
+        index: RunIndex to save (not modified)
+        high_water_mark: latest uploaded_at among the indexed rows
+
+    Returns:
+        str: the new generation name
+    """
+    directory = Path(directory)
+    with snapshot_lock(directory):
+        return write_snapshot(directory, index, high_water_mark)
+
+
+def write_snapshot(directory, index, high_water_mark):
+    """save_snapshot, called holding snapshot_lock"""
+    directory.mkdir(parents=True, exist_ok=True)
+    previous = current_generation(directory)
+    created = int(time.time() * 1000)
+    if previous and generation_order(previous):
+        # Newer than the current generation even if the clock went back
+        created = max(created, generation_order(previous)[0] + 1)
+    generation = f'{created}-{os.getpid()}'
+    work_dir = directory / f'.{generation}.tmp'
+    work_dir.mkdir()
+
+    try:
+        for name in RunIndex.ARRAYS:
+            np.save(work_dir / f'{name}.npy', getattr(index, name))
+        vocabularies = {'characters': index.characters.names}
+        for table_name in RunIndex.TABLES:
+            table = getattr(index, table_name)
+            for name in table.ARRAYS:
+                np.save(work_dir / f'{table_name}.{name}.npy', getattr(table, name))
+            vocabularies[table_name] = getattr(table, table.VOCABULARY).names
+
+        buckets = list(index.correlation.buckets.items())
+        np.save(work_dir / 'correlation.n.npy', np.asarray([bucket[0] for _, bucket in buckets], dtype=np.int64))
+        np.save(work_dir / 'correlation.sums.npy', np.asarray([bucket[1] for _, bucket in buckets]).reshape(len(buckets), len(FEATURE_NAMES)))
+        np.save(work_dir / 'correlation.cross.npy', np.asarray([bucket[2] for _, bucket in buckets]).reshape(len(buckets), len(FEATURE_NAMES), len(FEATURE_NAMES)))
+
+        with open(work_dir / 'runs.jsonl', 'wb') as f:
+            offsets = index.runs.write(f)
+        np.save(work_dir / 'runs.offsets.npy', offsets)
+
+        meta = {
+            'schema': schema(),
+            'count': len(index),
+            'high_water_mark': high_water_mark,
+            'created_at': time.time(),
+            'vocabularies': vocabularies,
+            'correlation_buckets': [list(key) for key, _ in buckets],
+            'run_ids': list(index.run_ids.items())
+        }
+        (work_dir / 'meta.json').write_text(json.dumps(meta))
+
+        os.rename(work_dir, directory / generation)
+        current_temp = directory / 'CURRENT.tmp'
+        current_temp.write_text(generation)
+        os.replace(current_temp, directory / 'CURRENT')
+    except Exception:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        raise
+
+    remove_old_generations(directory, before=previous or generation)
+    return generation
+
+
+def remove_old_generations(directory, before):
+    """
+    Delete the generations created before generation before
+    The previous CURRENT is kept, since a reader may have just read its
+    name; files already mapped by readers stay valid on POSIX.
+    """
+    oldest_kept = generation_order(before)
+    if oldest_kept is None:
+        return
+    for path in Path(directory).iterdir():
+        order = generation_order(path.name)
+        if path.is_dir() and order is not None and order < oldest_kept:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def map_file(path):
+    """Read-only memory map of a file (b'' when empty)"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def load_snapshot(directory):
+    """
+    Load the current snapshot with its arrays memory-mapped
+
+    Returns:
+        tuple: (RunIndex, meta) or None if there is no usable snapshot
+    """
+    generation = current_generation(directory)
+    if generation is None:
+        return None
+
+    path = Path(directory) / generation
+    try:
+        meta = json.loads((path / 'meta.json').read_text())
+        meta['generation'] = generation
+        if meta['schema'] != schema():
+            print(f"Ignoring run index snapshot {generation}: written by a different schema")
+            return None
+
+        index = RunIndex()
+        for name in RunIndex.ARRAYS:
+            setattr(index, name, np.load(path / f'{name}.npy', mmap_mode='r'))
+        index.characters = restore_vocabulary(meta['vocabularies']['characters'])
+        for table_name in RunIndex.TABLES:
+            table = getattr(index, table_name)
+            for name in table.ARRAYS:
+                setattr(table, name, np.load(path / f'{table_name}.{name}.npy', mmap_mode='r'))
+            setattr(table, table.VOCABULARY, restore_vocabulary(meta['vocabularies'][table_name]))
+
+        bucket_n = np.load(path / 'correlation.n.npy')
+        bucket_sums = np.load(path / 'correlation.sums.npy')
+        bucket_cross = np.load(path / 'correlation.cross.npy')
+        index.correlation.buckets = {
+            tuple(key): (int(bucket_n[i]), bucket_sums[i], bucket_cross[i])
+            for i, key in enumerate(meta['correlation_buckets'])
+        }
+
+        index.runs = RunStore(map_file(path / 'runs.jsonl'), np.load(path / 'runs.offsets.npy'))
+        index.run_ids = dict(meta['run_ids'])
+        if len(index.runs) != meta['count'] or len(index.character) != meta['count']:
+            print(f"Ignoring run index snapshot {generation}: inconsistent sizes")
+            return None
+        return index, meta
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error loading run index snapshot {generation}: {e}")
+        return None
+
+
+def restore_vocabulary(names):
+    vocabulary = Vocabulary()
+    for name in names:
+        vocabulary.add(name)
+    return vocabulary
@@ -0,0 +1,166 @@
+"""
+Request instrumentation for the Flask app
+Per-request timing spans (fetch / decode / filter / aggregate / serialize),
+process-wide counters and gauges, and a Prometheus text exposition of both.
+"""
+import cProfile
+import io
+import pstats
+import threading
+import time
+from contextlib import ContextDecorator
+from flask import g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+
+PROFILE_LINES = 40
+
+_lock = threading.Lock()
+_counters = {}
+_metric_help = {
+    'sts_requests_total': ('counter', 'Requests handled, by endpoint and status'),
+    'sts_request_duration_seconds': ('summary', 'Request wall time, by endpoint'),
+    'sts_stage_duration_seconds': ('summary', 'Time spent per request stage, by endpoint'),
+    'sts_runs_scanned_total': ('counter', 'Runs evaluated by filters, by endpoint'),
+    'sts_cache_requests_total': ('counter', 'Cache lookups, by cache and result (hit/miss)'),
+    'sts_cache_evictions_total': ('counter', 'Entries evicted to stay within the size budget, by cache'),
+    'sts_cache_bytes': ('gauge', 'Serialized bytes held, by cache'),
+    'sts_cache_entries': ('gauge', 'Entries held, by cache'),
+    'sts_cache_max_bytes': ('gauge', 'Size budget, by cache'),
+    'sts_uploaded_runs_total': ('counter', 'Runs processed by upload jobs, by result'),
+    'sts_cache_warm_requests_total': ('counter', 'Requests made by the cache warmer, by status'),
+    'sts_single_flight_calls_total': ('counter', 'Coalesced calls, by flight and result (executed/shared)'),
+}
+
+
+def increment(name, amount=1, **labels):
+    """Add amount to a counter identified by name and labels"""
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def set_gauge(name, value, **labels):
+    """Set a gauge identified by name and labels"""
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = value
+
+
+def observe(name, seconds, **labels):
+    """Record a duration into a summary (exposed as _sum and _count)"""
+    increment(name + '_sum', seconds, **labels)
+    increment(name + '_count', 1, **labels)
+
+
+def cache_lookup(cache, hit):
+    """Count a hit or miss for the named cache"""
+    increment('sts_cache_requests_total', cache=cache, result='hit' if hit else 'miss')
+
+
+def current_endpoint():
+    """Flask endpoint name of the current request ('none' outside a request)"""
+    if has_request_context():
+        return request.endpoint or 'unknown'
+    return 'none'
+
+
+class span(ContextDecorator):
+    """
+    Time a stage of the current request
+    Usable as `with span('filter'):` or as a decorator. Durations of repeated
+    spans within one request add up.
+    """
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        observe('sts_stage_duration_seconds', elapsed, stage=self.stage, endpoint=current_endpoint())
+        if has_request_context():
+            spans = g.setdefault('spans', {})
+            spans[self.stage] = spans.get(self.stage, 0) + elapsed
+        return False
+
+
+def runs_scanned(count):
+    """Count runs evaluated by a filter in the current request"""
+    increment('sts_runs_scanned_total', count, endpoint=current_endpoint())
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+
+def render_prometheus():
+    """All counters and summaries in Prometheus text exposition format"""
+    with _lock:
+        counters = sorted(_counters.items())
+
+    lines = []
+    described = set()
+    for (name, labels), value in counters:
+        base = name[:-4] if name.endswith('_sum') else name[:-6] if name.endswith('_count') else name
+        if base not in described and base in _metric_help:
+            metric_type, help_text = _metric_help[base]
+            lines.append(f'# HELP {base} {help_text}')
+            lines.append(f'# TYPE {base} {metric_type}')
+            described.add(base)
+        lines.append(f'{name}{_format_labels(labels)} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Default JSON provider that records serialization as the 'serialize' stage"""
+
+    def response(self, *args, **kwargs):
+        with span('serialize'):
+            return super().response(*args, **kwargs)
+
+
+def init_app(app):
+    """Register request timing, Server-Timing headers and ?profile=1 support"""
+    app.json = TimedJSONProvider(app)
+
+    @app.before_request
+    def start_request_timer():
+        g.request_start = time.perf_counter()
+        g.spans = {}
+        if request.args.get('profile') == '1':
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    @app.after_request
+    def record_request(response):
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+
+        elapsed = time.perf_counter() - g.get('request_start', time.perf_counter())
+        endpoint = current_endpoint()
+        observe('sts_request_duration_seconds', elapsed, endpoint=endpoint)
+        increment('sts_requests_total', endpoint=endpoint, status=response.status_code)
+
+        spans = g.get('spans', {})
+        if profiler is not None:
+            output = io.StringIO()
+            pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(PROFILE_LINES)
+            body = {
+                'status': response.status_code,
+                'spans_ms': {stage: seconds * 1000 for stage, seconds in spans.items()},
+                'total_ms': elapsed * 1000,
+                'profile': output.getvalue(),
+                'response': response.get_json(silent=True)
+            }
+            response = app.response_class(app.json.dumps(body), mimetype='application/json')
+
+        timings = [f'{stage};dur={seconds * 1000:.1f}' for stage, seconds in spans.items()]
+        timings.append(f'total;dur={elapsed * 1000:.1f}')
+        response.headers['Server-Timing'] = ', '.join(timings)
+        return response
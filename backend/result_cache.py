@@ -0,0 +1,74 @@
+"""
+Size-bounded LRU cache for serialized responses
+Entries are accounted by their serialized size plus a fixed overhead, and
+the least recently used ones are evicted once the total exceeds the
+budget. An entry larger than max_entry_bytes is not cached at all, so one
+large response (e.g. the full run list) cannot flush everything else.
+Hits, misses, evictions and the bytes held are reported through metrics.
+"""
+import threading
+from collections import OrderedDict
+import metrics
+
+# Bookkeeping cost of an entry beyond its body (key tuple, status, mimetype)
+ENTRY_OVERHEAD_BYTES = 512
+
+
+class ResultCache:
+    """LRU mapping of key -> (value, size) holding at most max_bytes"""
+
+    def __init__(self, name, max_bytes, max_entry_bytes=None):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes if max_entry_bytes is not None else max_bytes // 8
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        metrics.set_gauge('sts_cache_max_bytes', max_bytes, cache=name)
+
+    def get(self, key):
+        """Cached value for key (None on a miss)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        metrics.cache_lookup(self.name, hit=entry is not None)
+        return None if entry is None else entry[0]
+
+    def put(self, key, value, size):
+        """
+        Cache value, whose serialized size is size bytes, evicting the least
+        recently used entries as needed
+
+        Returns:
+            bool: False if the value is too large to cache
+        """
+        size += ENTRY_OVERHEAD_BYTES
+        if size > self.max_entry_bytes:
+            return False
+
+        evicted = 0
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, freed) = self._entries.popitem(last=False)
+                self.bytes -= freed
+                evicted += 1
+            held, entries = self.bytes, len(self._entries)
+
+        if evicted:
+            metrics.increment('sts_cache_evictions_total', evicted, cache=self.name)
+        metrics.set_gauge('sts_cache_bytes', held, cache=self.name)
+        metrics.set_gauge('sts_cache_entries', entries, cache=self.name)
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+        metrics.set_gauge('sts_cache_bytes', 0, cache=self.name)
+        metrics.set_gauge('sts_cache_entries', 0, cache=self.name)
@@ -0,0 +1,194 @@
+"""
+Compressed storage of complete .run files
+Uploaded runs keep only run_parser.ANALYTICS_FIELDS in runs.raw_data, which
+is all a corpus load transfers. The complete file goes to run_archives,
+zstd-compressed with a dictionary trained on uploaded runs (stored in
+run_dictionaries), and is only decoded when a single run is requested.
+
+Runs uploaded before archiving keep their complete raw_data. To archive
+them (from backend/):
+    python -m run_archive
+and to also cut their raw_data down to the analytics fields, which drops
+every other field from /api/runs and /api/runs-supabase:
+    python -m run_archive --slim
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import threading
+import zstandard
+import async_data
+from run_parser import slim_run
+
+# zstd level for archives (9 keeps most of level 19's ratio at ~0.2 ms per run)
+ARCHIVE_LEVEL = int(os.getenv('RUN_ARCHIVE_LEVEL', 9))
+
+# Size of a trained dictionary (zstd's default) and the runs it is trained on
+DICTIONARY_SIZE = 110 * 1024
+MIN_DICTIONARY_SAMPLES = 100
+MAX_DICTIONARY_SAMPLES = 2000
+
+# Dictionaries never change once stored, so each one is fetched once per process
+_dictionaries_lock = threading.Lock()
+_dictionaries = {}
+
+
+def encode_run(run_data):
+    """Compact JSON bytes of a run, as compressed into its archive"""
+    return json.dumps(run_data, separators=(',', ':')).encode('utf-8')
+
+
+def cache_dictionary(row):
+    """zstd dictionary for a run_dictionaries row (id and dictionary)"""
+    dictionary = zstandard.ZstdCompressionDict(base64.b64decode(row['dictionary']))
+    with _dictionaries_lock:
+        return _dictionaries.setdefault(row['id'], dictionary)
+
+
+def load_dictionary(supabase, dictionary_id):
+    """Stored dictionary by id (None for archives compressed without one)"""
+    if dictionary_id is None:
+        return None
+    with _dictionaries_lock:
+        dictionary = _dictionaries.get(dictionary_id)
+    if dictionary is not None:
+        return dictionary
+    response = supabase.table('run_dictionaries').select('id,dictionary').eq('id', dictionary_id).limit(1).execute()
+    if not response.data:
+        raise LookupError(f'Run archive dictionary {dictionary_id} not found')
+    return cache_dictionary(response.data[0])
+
+
+async def latest_dictionary(client, samples):
+    """
+    (id, dictionary) to compress new archives with
+    The newest stored dictionary, or else one trained on samples (encoded
+    runs) and stored, if there are enough of them. (None, None) means
+    compress without a dictionary.
+    """
+    response = await async_data.execute(
+        client.table('run_dictionaries').select('id').order('uploaded_at', desc=True).limit(1)
+    )
+    if response.data:
+        dictionary_id = response.data[0]['id']
+        with _dictionaries_lock:
+            dictionary = _dictionaries.get(dictionary_id)
+        if dictionary is None:
+            response = await async_data.execute(
+                client.table('run_dictionaries').select('id,dictionary').eq('id', dictionary_id).limit(1)
+            )
+            dictionary = cache_dictionary(response.data[0])
+        return dictionary_id, dictionary
+
+    if len(samples) < MIN_DICTIONARY_SAMPLES:
+        return None, None
+    try:
+        dictionary = zstandard.train_dictionary(DICTIONARY_SIZE, samples[:MAX_DICTIONARY_SAMPLES])
+    except zstandard.ZstdError as e:
+        print(f"Error training run archive dictionary: {e}")
+        return None, None
+
+    response = await async_data.execute(client.table('run_dictionaries').insert({
+        'dictionary': base64.b64encode(dictionary.as_bytes()).decode('ascii'),
+        'sample_count': min(len(samples), MAX_DICTIONARY_SAMPLES)
+    }))
+    row = response.data[0]
+    with _dictionaries_lock:
+        _dictionaries[row['id']] = dictionary
+    return row['id'], dictionary
+
+
+async def archive_runs(client, runs, files=None):
+    """
+    run_archives rows for runs (dicts with run_identifier and play_id)
+    files holds each run's .run file as bytes; by default the runs' raw_data
+    is encoded instead.
+    """
+    if not runs:
+        return []
+    encoded = files if files is not None else [encode_run(run['raw_data']) for run in runs]
+    dictionary_id, dictionary = await latest_dictionary(client, encoded)
+    compressor = zstandard.ZstdCompressor(level=ARCHIVE_LEVEL, dict_data=dictionary)
+    return [{
+        'run_identifier': run['run_identifier'],
+        'play_id': run['play_id'],
+        'dictionary_id': dictionary_id,
+        'raw_size': len(data),
+        'data': base64.b64encode(compressor.compress(data)).decode('ascii')
+    } for run, data in zip(runs, encoded)]
+
+
+def decode_archive(row, dictionary):
+    """Complete run data from a run_archives row"""
+    decompressor = zstandard.ZstdDecompressor(dict_data=dictionary)
+    return json.loads(decompressor.decompress(base64.b64decode(row['data'])))
+
+
+def fetch_full_run(supabase, play_id):
+    """Complete run data for play_id (None if there is no such run)"""
+    from run_index import normalize_run
+
+    response = supabase.table('run_archives').select('data,dictionary_id').eq('play_id', play_id).limit(1).execute()
+    if response.data:
+        row = response.data[0]
+        return normalize_run(decode_archive(row, load_dictionary(supabase, row['dictionary_id'])))
+
+    # Runs uploaded before archiving still hold the complete file
+    response = supabase.table('runs').select('raw_data').eq('play_id', play_id).limit(1).execute()
+    return normalize_run(response.data[0]['raw_data']) if response.data else None
+
+
+async def archive_existing_runs(client, slim=False):
+    """
+    Archive runs uploaded before run archives existed (in batches, so only
+    one batch of complete runs is held at a time); with slim, also cut the
+    raw_data of each archived run down to the analytics fields
+
+    Returns:
+        int: runs archived
+    """
+    identifiers = [row['run_identifier'] for row in await async_data.fetch_all(client, 'runs', 'run_identifier')]
+    archived = {row['run_identifier'] for row in await async_data.fetch_all(client, 'run_archives', 'run_identifier')}
+    pending = [identifier for identifier in identifiers if identifier not in archived]
+
+    count = 0
+    batch_size = async_data.IN_FILTER_BATCH_SIZE
+    for start in range(0, len(pending), batch_size):
+        rows = (await async_data.execute(
+            client.table('runs').select('run_identifier,play_id,raw_data').in_('run_identifier', pending[start:start + batch_size])
+        )).data
+        results = await async_data.insert_chunks(client, 'run_archives', await archive_runs(client, rows), batch_size)
+        stored = {archive['run_identifier'] for archive, error in results if error is None}
+        for archive, error in results:
+            if error is not None:
+                print(f"Failed to archive run {archive['play_id']}: {error}")
+
+        if slim:
+            await async_data.gather_bounded(
+                async_data.execute(client.table('runs').update({'raw_data': slim_run(row['raw_data'])}).eq('run_identifier', row['run_identifier']))
+                for row in rows if row['run_identifier'] in stored
+            )
+        count += len(stored)
+        print(f"Archived {count} of {len(pending)} runs", file=sys.stderr)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Archive runs uploaded before compressed run archives')
+    parser.add_argument('--slim', action='store_true',
+                        help='also cut their raw_data down to the analytics fields (drops the other fields from the run lists)')
+    args = parser.parse_args()
+
+    async def migrate():
+        async with async_data.connect() as client:
+            if client is None:
+                sys.exit('Supabase is not configured')
+            return await archive_existing_runs(client, slim=args.slim)
+
+    print(f"Archived {async_data.run(migrate())} runs")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,1147 @@
+"""
+In-memory columnar index over the run corpus
+Built once when runs are loaded (and extended on upload) so analytics
+endpoints can filter and aggregate with NumPy instead of re-walking run JSON
+"""
+import copy
+from datetime import datetime, timezone
+import itertools
+import json
+import re
+import numpy as np
+from scipy import sparse
+from correlation_stats import CorrelationStats, feature_matrix, FEATURE_NAMES
+from synergy_stats import SynergyStats, cooccurrence
+
+# Base game characters (exclude modded characters)
+BASE_GAME_CHARACTERS = {'DEFECT', 'IRONCLAD', 'THE_SILENT', 'WATCHER'}
+
+# Non-card options that can appear in card choices (relics, special events)
+NON_CARD_OPTIONS = {'Singing Bowl'}
+
+# Card event kinds
+CARD_PICKED = 0     # Card was taken from a reward screen
+CARD_OFFERED = 1    # Card was shown but a different card was taken
+CARD_SKIPPED = 2    # Card was shown and the whole reward was skipped
+CARD_UPGRADED = 3   # Card was upgraded at a campfire (SMITH)
+CARD_EVENT_KINDS = ('picked', 'offered', 'skipped', 'upgraded')
+
+# Relic acquisition sources
+RELIC_SOURCES = ('starter', 'combat', 'boss', 'shop', 'event', 'neow', 'other')
+RELIC_STARTER, RELIC_COMBAT, RELIC_BOSS, RELIC_SHOP, RELIC_EVENT, RELIC_NEOW, RELIC_OTHER = range(len(RELIC_SOURCES))
+
+# Starter relic of each base game character
+STARTER_RELICS = {
+    'IRONCLAD': 'Burning Blood',
+    'THE_SILENT': 'Ring of the Snake',
+    'DEFECT': 'Cracked Core',
+    'WATCHER': 'PureWater'
+}
+
+# Boss relics are offered after the act 1, act 2 and (on the way to act 4)
+# act 3 bosses (floors 17, 34 and 51)
+BOSS_RELIC_FLOORS = (17, 34, 51)
+
+
+def normalize_run(run):
+    """
+    Normalize field names for frontend compatibility
+    The raw data uses 'character_chosen' but frontend expects 'character'
+    """
+    if 'character_chosen' in run and 'character' not in run:
+        run['character'] = run['character_chosen']
+    return run
+
+
+# Every change to any index gets a new, never reused version number
+_versions = itertools.count(1)
+
+# Chunk size when copying a snapshot's run blob into a new snapshot
+BLOB_COPY_BYTES = 16 * 1024 * 1024
+
+# Trend buckets are UTC days; coarser intervals are sums of whole days
+SECONDS_PER_DAY = 24 * 60 * 60
+TREND_INTERVALS = ('day', 'week', 'month')
+TREND_GROUPS = ('character', 'ascension_level')
+
+# Columns of TrendTable.totals
+TREND_TOTALS = ('runs', 'victories', 'floor_reached', 'score')
+
+# Room symbols in path_per_floor, with fixed ids ('-' marks floors without a
+# map room, like boss chests); room types added by mods get later ids
+ROOM_SYMBOLS = ('-', 'M', '?', 'E', 'R', '$', 'T', 'B')
+ROOM_NAMES = ('none', 'monster', 'event', 'elite', 'rest', 'shop', 'treasure', 'boss')
+ROOM_NONE, ROOM_ELITE, ROOM_REST = 0, 3, 4
+
+# Acts are 17 floors (15 rooms, boss, boss chest); floors past act 3 are act 4
+FLOORS_PER_ACT = 17
+ACTS = 4
+
+# Gold every run starts with (before Neow)
+STARTING_GOLD = 99
+
+# Upgrade suffix on deck entries ("Bash+1", "Searing Blow+3")
+UPGRADE_SUFFIX = re.compile(r'^(.*)\+(\d+)$')
+
+
+def filter_fingerprint(filters):
+    """Hashable, order-independent key for a filters dict (empty values ignored)"""
+    return tuple(sorted((key, value) for key, value in filters.items() if value not in (None, '')))
+
+
+def date_bounds(filters):
+    """
+    (first, last) Unix seconds selected by the start_date and end_date
+    filters, both included (None when unset). Dates are whole UTC days, so
+    end_date includes every run on that day.
+    """
+    def day_start(value):
+        day = datetime.fromisoformat(value).date()
+        return int(datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp())
+
+    start_date, end_date = filters.get('start_date'), filters.get('end_date')
+    return (
+        day_start(start_date) if start_date else None,
+        day_start(end_date) + SECONDS_PER_DAY - 1 if end_date else None
+    )
+
+
+def get_base_card_name(card_name):
+    """Strip upgrade suffix from card name"""
+    if card_name.endswith('+1'):
+        return card_name[:-2], True
+    return card_name, False
+
+
+class Vocabulary:
+    """Assigns stable integer ids to names in first-seen order"""
+
+    def __init__(self):
+        self.names = []
+        self.ids = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.ids
+
+    def copy(self):
+        vocabulary = Vocabulary()
+        vocabulary.names = list(self.names)
+        vocabulary.ids = dict(self.ids)
+        return vocabulary
+
+    def add(self, name):
+        """Return the id for name, assigning a new one if needed"""
+        name_id = self.ids.get(name)
+        if name_id is None:
+            name_id = len(self.names)
+            self.ids[name] = name_id
+            self.names.append(name)
+        return name_id
+
+
+class CardEventTable:
+    """
+    Normalized card events: one row per (run, floor, card, kind)
+    Rows come from card_choices (picked / offered / skipped) and SMITH
+    campfire choices (upgraded). Per-card posting lists are kept as a
+    CSR-style permutation of the rows sorted by card id.
+    """
+
+    # Array attributes and vocabulary saved in index snapshots
+    ARRAYS = ('run', 'floor', 'card', 'kind', 'upgraded')
+    VOCABULARY = 'cards'
+
+    def __init__(self):
+        self.cards = Vocabulary()
+        self.run = np.zeros(0, dtype=np.int32)
+        self.floor = np.zeros(0, dtype=np.int16)
+        self.card = np.zeros(0, dtype=np.int32)
+        self.kind = np.zeros(0, dtype=np.int8)
+        self.upgraded = np.zeros(0, dtype=bool)
+        self._postings = None
+
+    def __len__(self):
+        return len(self.run)
+
+    def copy(self):
+        """Shallow copy that can be extended without affecting this table"""
+        table = copy.copy(self)
+        table.cards = self.cards.copy()
+        return table
+
+    def extend(self, runs, first_run_id):
+        """Append events for runs, numbering them from first_run_id"""
+        rows = []
+
+        for offset, run in enumerate(runs):
+            run_id = first_run_id + offset
+
+            for choice in run.get('card_choices', []):
+                picked = choice.get('picked')
+                floor = choice.get('floor', 0) or 0
+
+                if picked and picked != 'SKIP' and picked not in NON_CARD_OPTIONS:
+                    base_card, is_upgraded = get_base_card_name(picked)
+                    rows.append((run_id, floor, self.cards.add(base_card), CARD_PICKED, is_upgraded))
+
+                kind = CARD_SKIPPED if picked == 'SKIP' else CARD_OFFERED
+                for not_picked in choice.get('not_picked', []):
+                    if not_picked in NON_CARD_OPTIONS:
+                        continue
+                    base_card, is_upgraded = get_base_card_name(not_picked)
+                    rows.append((run_id, floor, self.cards.add(base_card), kind, is_upgraded))
+
+            for choice in run.get('campfire_choices', []):
+                if choice.get('key') == 'SMITH':
+                    card = choice.get('data')
+                    if card:
+                        base_card, is_upgraded = get_base_card_name(card)
+                        rows.append((run_id, choice.get('floor', 0) or 0, self.cards.add(base_card), CARD_UPGRADED, is_upgraded))
+
+        if not rows:
+            return
+
+        run_ids, floors, cards, kinds, upgraded = zip(*rows)
+        self.run = np.concatenate([self.run, np.asarray(run_ids, dtype=np.int32)])
+        self.floor = np.concatenate([self.floor, np.asarray(floors, dtype=np.int16)])
+        self.card = np.concatenate([self.card, np.asarray(cards, dtype=np.int32)])
+        self.kind = np.concatenate([self.kind, np.asarray(kinds, dtype=np.int8)])
+        self.upgraded = np.concatenate([self.upgraded, np.asarray(upgraded, dtype=bool)])
+        self._postings = None
+
+    def _posting_lists(self):
+        """Row order sorted by card id plus per-card offsets into it"""
+        if self._postings is None:
+            order = np.argsort(self.card, kind='stable')
+            offsets = np.searchsorted(self.card[order], np.arange(len(self.cards) + 1))
+            self._postings = (order, offsets)
+        return self._postings
+
+    def postings(self, card_id):
+        """Event rows for a single card"""
+        order, offsets = self._posting_lists()
+        return order[offsets[card_id]:offsets[card_id + 1]]
+
+    def counts(self, run_mask, victory, character, n_characters):
+        """
+        Per-card counters for the runs selected by run_mask
+
+        Every posting list is intersected with the mask at once by masking the
+        event rows and bincounting them by card id.
+        """
+        n_cards = len(self.cards)
+        selected = run_mask[self.run]
+        picked = selected & (self.kind == CARD_PICKED)
+
+        def count(rows):
+            return np.bincount(self.card[rows], minlength=n_cards)
+
+        picked_chars = self.card[picked] * n_characters + character[self.run[picked]]
+        return {
+            'picks': count(picked),
+            'picked_upgraded': count(picked & self.upgraded),
+            'victories': count(picked & victory[self.run]),
+            'offered': count(selected & (self.kind == CARD_OFFERED)),
+            'skipped': count(selected & (self.kind == CARD_SKIPPED)),
+            'campfire_upgrades': count(selected & (self.kind == CARD_UPGRADED)),
+            'characters': np.bincount(picked_chars, minlength=n_cards * n_characters).reshape(n_cards, n_characters)
+        }
+
+    def floor_counts(self, run_mask, card_id=None):
+        """Picks and availability per floor, optionally for a single card"""
+        rows = self.postings(card_id) if card_id is not None else np.arange(len(self))
+        rows = rows[run_mask[self.run[rows]]]
+        kinds = self.kind[rows]
+        floors = self.floor[rows].astype(np.int64)
+        n_floors = int(floors.max()) + 1 if len(floors) else 0
+
+        picks = np.bincount(floors[kinds == CARD_PICKED], minlength=n_floors)
+        shown = np.bincount(floors[kinds != CARD_UPGRADED], minlength=n_floors)
+        skips = np.bincount(floors[kinds == CARD_SKIPPED], minlength=n_floors)
+        return picks, shown, skips
+
+
+class RelicEventTable:
+    """
+    Relic acquisitions: one row per (run, floor, relic, source, picked)
+    Sources are the starting relic, combat/chest rewards (relics_obtained),
+    boss relic screens (offered and picked), shop purchases and events.
+    Relics held at the end of the run that none of those explain (Neow,
+    transformations, ...) are recorded with the 'other' source. The final
+    relic list of each run is kept separately as (held_run, held_relic).
+    """
+
+    ARRAYS = ('run', 'floor', 'relic', 'source', 'picked', 'held_run', 'held_relic')
+    VOCABULARY = 'relics'
+
+    def __init__(self):
+        self.relics = Vocabulary()
+        self.run = np.zeros(0, dtype=np.int32)
+        self.floor = np.zeros(0, dtype=np.int16)
+        self.relic = np.zeros(0, dtype=np.int32)
+        self.source = np.zeros(0, dtype=np.int8)
+        self.picked = np.zeros(0, dtype=bool)
+        self.held_run = np.zeros(0, dtype=np.int32)
+        self.held_relic = np.zeros(0, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.run)
+
+    def copy(self):
+        """Shallow copy that can be extended without affecting this table"""
+        table = copy.copy(self)
+        table.relics = self.relics.copy()
+        return table
+
+    def extend(self, runs, first_run_id):
+        """Append relic events for runs, numbering them from first_run_id"""
+        rows = []
+        held = []
+
+        for offset, run in enumerate(runs):
+            run_id = first_run_id + offset
+            final_relics = run.get('relics', [])
+            final_set = set(final_relics)
+            recorded = set()
+
+            def add(floor, relic, source, picked=True):
+                rows.append((run_id, floor or 0, self.relics.add(relic), source, picked))
+                if picked:
+                    recorded.add(relic)
+
+            for relic_event in run.get('relics_obtained', []):
+                relic = relic_event.get('key')
+                if relic:
+                    add(relic_event.get('floor', 0), relic, RELIC_COMBAT)
+
+            for i, boss_relic in enumerate(run.get('boss_relics', [])):
+                floor = BOSS_RELIC_FLOORS[min(i, len(BOSS_RELIC_FLOORS) - 1)]
+                picked = boss_relic.get('picked')
+                if picked:
+                    add(floor, picked, RELIC_BOSS)
+                for not_picked in boss_relic.get('not_picked', []):
+                    add(floor, not_picked, RELIC_BOSS, picked=False)
+
+            # Shop purchases mix cards, potions and relics; relics are the
+            # purchases that show up in the final relic list
+            purchase_floors = run.get('item_purchase_floors', [])
+            for i, item in enumerate(run.get('items_purchased', [])):
+                if item in final_set:
+                    add(purchase_floors[i] if i < len(purchase_floors) else 0, item, RELIC_SHOP)
+
+            for event in run.get('event_choices', []):
+                for relic in event.get('relics_obtained', []) or []:
+                    add(event.get('floor', 0), relic, RELIC_EVENT)
+
+            # Held relics no source explains: the character's starter relic, or
+            # the first relic when Neow swapped the starter for a boss relic
+            # (or, for modded characters, the first relic)
+            character = run.get('character_chosen', run.get('character'))
+            starter = STARTER_RELICS.get(character)
+            for position, relic in enumerate(final_relics):
+                held.append((run_id, self.relics.add(relic)))
+                if relic in recorded:
+                    continue
+                if relic == starter:
+                    add(0, relic, RELIC_STARTER)
+                elif position == 0 and run.get('neow_bonus') == 'BOSS_RELIC':
+                    add(0, relic, RELIC_NEOW)
+                elif position == 0 and starter is None:
+                    add(0, relic, RELIC_STARTER)
+                else:
+                    add(0, relic, RELIC_OTHER)
+
+        if rows:
+            run_ids, floors, relics, sources, picked = zip(*rows)
+            self.run = np.concatenate([self.run, np.asarray(run_ids, dtype=np.int32)])
+            self.floor = np.concatenate([self.floor, np.asarray(floors, dtype=np.int16)])
+            self.relic = np.concatenate([self.relic, np.asarray(relics, dtype=np.int32)])
+            self.source = np.concatenate([self.source, np.asarray(sources, dtype=np.int8)])
+            self.picked = np.concatenate([self.picked, np.asarray(picked, dtype=bool)])
+
+        if held:
+            held_runs, held_relics = zip(*held)
+            self.held_run = np.concatenate([self.held_run, np.asarray(held_runs, dtype=np.int32)])
+            self.held_relic = np.concatenate([self.held_relic, np.asarray(held_relics, dtype=np.int32)])
+
+    def counts(self, run_mask, victory, character, n_characters):
+        """Per-relic counters for the runs selected by run_mask"""
+        n_relics = len(self.relics)
+        selected = run_mask[self.run]
+        picked = selected & self.picked
+        boss = selected & (self.source == RELIC_BOSS)
+
+        def count(rows):
+            return np.bincount(self.relic[rows], minlength=n_relics)
+
+        by_source = np.bincount(self.relic[picked] * len(RELIC_SOURCES) + self.source[picked],
+                                minlength=n_relics * len(RELIC_SOURCES)).reshape(n_relics, len(RELIC_SOURCES))
+        picked_chars = self.relic[picked] * n_characters + character[self.run[picked]]
+        held_at_death = run_mask[self.held_run] & ~victory[self.held_run]
+        return {
+            'picks': count(picked),
+            'victories': count(picked & victory[self.run]),
+            'sources': by_source,
+            'boss_offers': count(boss),
+            'boss_picks': count(boss & self.picked),
+            'held_at_death': np.bincount(self.held_relic[held_at_death], minlength=n_relics),
+            'characters': np.bincount(picked_chars, minlength=n_relics * n_characters).reshape(n_relics, n_characters)
+        }
+
+
+def split_deck_card(card_name):
+    """Split a master_deck entry into (base name, upgrade count)"""
+    match = UPGRADE_SUFFIX.match(card_name)
+    if match:
+        return match.group(1), int(match.group(2))
+    return card_name, 0
+
+
+class DeckMatrix:
+    """
+    Final decks encoded as sparse count vectors (one CSR row per run)
+    Card i occupies two columns: 2*i holds the number of copies and 2*i+1
+    the number of upgrades across those copies, so the column layout stays
+    stable as the card vocabulary grows.
+    """
+
+    ARRAYS = ('indptr', 'indices', 'data')
+    VOCABULARY = 'cards'
+
+    def __init__(self):
+        self.cards = Vocabulary()
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.indices = np.zeros(0, dtype=np.int32)
+        self.data = np.zeros(0, dtype=np.float32)
+        self._normalized = None
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def encode(self, deck, add=False):
+        """Column -> value mapping for a deck (unknown cards are dropped unless add)"""
+        row = {}
+        for card_name in deck:
+            base_card, upgrades = split_deck_card(card_name)
+            if add:
+                card_id = self.cards.add(base_card)
+            elif base_card in self.cards:
+                card_id = self.cards.ids[base_card]
+            else:
+                continue
+            row[2 * card_id] = row.get(2 * card_id, 0) + 1
+            if upgrades:
+                row[2 * card_id + 1] = row.get(2 * card_id + 1, 0) + upgrades
+        return row
+
+    def copy(self):
+        """Shallow copy that can be extended without affecting this table"""
+        table = copy.copy(self)
+        table.cards = self.cards.copy()
+        return table
+
+    def extend(self, runs):
+        """Append one row per run"""
+        indices, data, row_lengths = [], [], []
+        for run in runs:
+            row = self.encode(run.get('master_deck', []), add=True)
+            columns = sorted(row)
+            indices.extend(columns)
+            data.extend(row[c] for c in columns)
+            row_lengths.append(len(columns))
+
+        self.indptr = np.concatenate([self.indptr, self.indptr[-1] + np.cumsum(row_lengths, dtype=np.int64)])
+        self.indices = np.concatenate([self.indices, np.asarray(indices, dtype=np.int32)])
+        self.data = np.concatenate([self.data, np.asarray(data, dtype=np.float32)])
+        self._normalized = None
+
+    def matrix(self):
+        """The decks as a scipy CSR matrix"""
+        return sparse.csr_matrix((self.data, self.indices, self.indptr), shape=(len(self), 2 * len(self.cards)))
+
+    def normalized(self):
+        """CSR matrix with L2-normalized rows, cached until the next extend"""
+        if self._normalized is None:
+            matrix = self.matrix()
+            norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+            norms[norms == 0] = 1
+            self._normalized = sparse.diags(1 / norms).dot(matrix).tocsr()
+        return self._normalized
+
+    def most_similar(self, deck, k, run_mask=None):
+        """
+        The k runs whose final deck has the highest cosine similarity to deck
+        Returns (run_ids, similarities), best first.
+        """
+        row = self.encode(deck)
+        if not row:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        query = np.zeros(2 * len(self.cards), dtype=np.float32)
+        for column, value in row.items():
+            query[column] = value
+        query /= np.linalg.norm(query)
+
+        scores = self.normalized().dot(query)
+        if run_mask is not None:
+            scores[~run_mask] = -np.inf
+
+        k = min(k, int(np.isfinite(scores).sum()))
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return top, scores[top]
+
+
+class TrendTable:
+    """
+    Run totals per UTC day for every (character, ascension, daily) group
+    Cells are sorted by group and then day, and cumulative holds running
+    totals over the cells, so the totals for any day range of a group are
+    the difference of two rows: a day/week/month series costs O(periods) per
+    group instead of a scan over the runs. Runs without a timestamp are left out.
+    """
+
+    ARRAYS = ('character', 'ascension_level', 'is_daily', 'day', 'totals', 'cumulative', 'group_start')
+    VOCABULARY = 'characters'
+
+    def __init__(self):
+        self.characters = Vocabulary()
+        self.character = np.zeros(0, dtype=np.int16)
+        self.ascension_level = np.zeros(0, dtype=np.int16)
+        self.is_daily = np.zeros(0, dtype=bool)
+        self.day = np.zeros(0, dtype=np.int32)
+        self.totals = np.zeros((0, len(TREND_TOTALS)))
+        self.cumulative = np.zeros((1, len(TREND_TOTALS)))
+        self.group_start = np.zeros(1, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.day)
+
+    def copy(self):
+        """Shallow copy that can be extended without affecting this table"""
+        table = copy.copy(self)
+        table.characters = self.characters.copy()
+        return table
+
+    def extend(self, runs):
+        """Fold runs into their day cells (cost grows with cells touched, not with the corpus)"""
+        rows = [
+            (
+                self.characters.add(r.get('character_chosen', r.get('character'))),
+                r.get('ascension_level', 0) or 0,
+                bool(r.get('is_daily', False)),
+                int(r['timestamp']) // SECONDS_PER_DAY,
+                1, bool(r.get('victory', False)), r.get('floor_reached', 0) or 0, r.get('score', 0) or 0
+            )
+            for r in runs if (r.get('timestamp', 0) or 0) > 0
+        ]
+        if not rows:
+            return
+
+        columns = list(zip(*rows))
+        character = np.concatenate([self.character, np.asarray(columns[0], dtype=np.int16)])
+        ascension_level = np.concatenate([self.ascension_level, np.asarray(columns[1], dtype=np.int16)])
+        is_daily = np.concatenate([self.is_daily, np.asarray(columns[2], dtype=bool)])
+        day = np.concatenate([self.day, np.asarray(columns[3], dtype=np.int32)])
+        totals = np.concatenate([self.totals, np.asarray(columns[4:], dtype=np.float64).T])
+
+        order = np.lexsort((day, is_daily, ascension_level, character))
+        character, ascension_level, is_daily, day = character[order], ascension_level[order], is_daily[order], day[order]
+
+        # Merge rows falling in the same (group, day) cell
+        new_group = np.ones(len(order), dtype=bool)
+        new_group[1:] = (character[1:] != character[:-1]) | (ascension_level[1:] != ascension_level[:-1]) | (is_daily[1:] != is_daily[:-1])
+        new_cell = new_group.copy()
+        new_cell[1:] |= day[1:] != day[:-1]
+        cells = np.flatnonzero(new_cell)
+
+        self.character = character[cells]
+        self.ascension_level = ascension_level[cells]
+        self.is_daily = is_daily[cells]
+        self.day = day[cells]
+        self.totals = np.add.reduceat(totals[order], cells, axis=0)
+        self.cumulative = np.concatenate([np.zeros((1, len(TREND_TOTALS))), np.cumsum(self.totals, axis=0)])
+        self.group_start = np.append(np.flatnonzero(new_group[cells]), len(cells)).astype(np.int64)
+
+    def series(self, filters, interval, group_by, base_characters):
+        """
+        Totals per period for the groups matching filters
+        start_date and end_date select whole UTC days, both included, like
+        the timestamp filter of RunIndex.mask (see date_bounds).
+
+        Returns:
+            tuple: (period start days as datetime64[D], {group key tuple in
+            group_by order: (periods, len(TREND_TOTALS)) array})
+        """
+        starts = self.group_start[:-1]
+        group_character = self.character[starts]
+        group_ascension = self.ascension_level[starts]
+        group_daily = self.is_daily[starts]
+
+        selected = np.ones(len(starts), dtype=bool)
+        if (filters.get('ignore_downfall') or '').lower() == 'true':
+            selected &= np.isin(group_character, [self.characters.ids[name] for name in base_characters if name in self.characters])
+        if filters.get('character'):
+            selected &= group_character == self.characters.ids.get(filters['character'], -1)
+        if filters.get('ascension_level') not in (None, ''):
+            selected &= group_ascension == int(filters['ascension_level'])
+        if filters.get('is_daily') not in (None, ''):
+            selected &= group_daily == (filters['is_daily'].lower() == 'true')
+        groups = np.flatnonzero(selected)
+
+        empty = (np.zeros(0, dtype='datetime64[D]'), {})
+        if len(groups) == 0:
+            return empty
+
+        first_day = int(self.day[self.group_start[groups]].min())
+        end_day = int(self.day[self.group_start[groups + 1] - 1].max()) + 1
+        start_ts, end_ts = date_bounds(filters)
+        if start_ts is not None:
+            first_day = max(first_day, start_ts // SECONDS_PER_DAY)
+        if end_ts is not None:
+            end_day = min(end_day, end_ts // SECONDS_PER_DAY + 1)
+        if first_day >= end_day:
+            return empty
+
+        boundaries = period_boundaries(first_day, end_day, interval)
+        clipped = np.clip(boundaries, first_day, end_day)
+
+        series = {}
+        for group in groups:
+            low, high = self.group_start[group], self.group_start[group + 1]
+            positions = low + np.searchsorted(self.day[low:high], clipped)
+            sums = np.diff(self.cumulative[positions], axis=0)
+            key = tuple(
+                self.characters.names[group_character[group]] if name == 'character' else int(group_ascension[group])
+                for name in group_by
+            )
+            series[key] = series[key] + sums if key in series else sums
+        return boundaries[:-1].astype('datetime64[D]'), series
+
+
+def period_boundaries(first_day, end_day, interval):
+    """
+    Day numbers where the periods covering [first_day, end_day) start, plus
+    the day after the last one (weeks start on Monday)
+    """
+    if interval == 'day':
+        return np.arange(first_day, end_day + 1, dtype=np.int64)
+    if interval == 'week':
+        # Day 0 (1970-01-01) was a Thursday
+        week_start = first_day - (first_day + 3) % 7
+        return np.arange(week_start, end_day + 7, 7, dtype=np.int64)
+    first_month = np.datetime64(first_day, 'D').astype('datetime64[M]')
+    last_month = np.datetime64(end_day - 1, 'D').astype('datetime64[M]')
+    return np.arange(first_month, last_month + 2).astype('datetime64[D]').astype(np.int64)
+
+
+class PathTable:
+    """
+    Room type of every floor of every run (path_per_floor), CSR-style
+    rooms holds room type ids floor by floor and offsets each run's slice.
+    act_counts counts the ROOM_SYMBOLS types per run and act (the last act
+    also takes every later floor, e.g. of endless runs). Runs are also
+    kept sorted by their room sequence (sorted_paths holds it as bytes, id+1
+    per floor, and path_order the matching run ids), so the runs sharing a
+    path prefix are one contiguous range found by binary search.
+    """
+
+    ARRAYS = ('rooms', 'offsets', 'act_counts', 'sorted_paths', 'path_order')
+    VOCABULARY = 'room_types'
+
+    def __init__(self):
+        self.room_types = Vocabulary()
+        for symbol in ROOM_SYMBOLS:
+            self.room_types.add(symbol)
+        self.rooms = np.zeros(0, dtype=np.uint8)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.act_counts = np.zeros((0, ACTS, len(ROOM_SYMBOLS)), dtype=np.int32)
+        self.sorted_paths = np.zeros(0, dtype='S1')
+        self.path_order = np.zeros(0, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def copy(self):
+        """Shallow copy that can be extended without affecting this table"""
+        table = copy.copy(self)
+        table.room_types = self.room_types.copy()
+        return table
+
+    def extend(self, runs):
+        """Append one path per run"""
+        paths = [
+            [self.room_types.add(ROOM_SYMBOLS[ROOM_NONE] if room is None else str(room)) for room in run.get('path_per_floor') or []]
+            for run in runs
+        ]
+        lengths = np.asarray([len(path) for path in paths], dtype=np.int64)
+        rooms = np.asarray([min(room, 254) for path in paths for room in path], dtype=np.uint8)
+        starts = np.concatenate([[0], np.cumsum(lengths)])
+
+        # Per-act room counts, from each floor's position in its run
+        run_of_floor = np.repeat(np.arange(len(paths)), lengths)
+        act = np.minimum((np.arange(len(rooms)) - starts[run_of_floor]) // FLOORS_PER_ACT, ACTS - 1)
+        known = rooms < len(ROOM_SYMBOLS)
+        act_counts = np.zeros((len(paths), ACTS, len(ROOM_SYMBOLS)), dtype=np.int32)
+        np.add.at(act_counts, (run_of_floor[known], act[known], rooms[known]), 1)
+
+        encoded = (rooms + 1).tobytes()
+        keys = np.asarray([encoded[starts[i]:starts[i + 1]] for i in range(len(paths))], dtype=bytes)
+        sorted_paths = np.concatenate([self.sorted_paths, keys])
+        path_order = np.concatenate([self.path_order, np.arange(len(self), len(self) + len(paths), dtype=np.int32)])
+        order = np.argsort(sorted_paths, kind='stable')
+
+        self.rooms = np.concatenate([self.rooms, rooms])
+        self.offsets = np.concatenate([self.offsets, self.offsets[-1] + starts[1:]])
+        self.act_counts = np.concatenate([self.act_counts, act_counts])
+        self.sorted_paths = sorted_paths[order]
+        self.path_order = path_order[order]
+
+    def lengths(self):
+        """Floors recorded per run"""
+        return np.diff(self.offsets)
+
+    def encode(self, symbols):
+        """Room type ids for a sequence of room symbols (None if one is unknown)"""
+        if any(symbol not in self.room_types for symbol in symbols):
+            return None
+        return [self.room_types.ids[symbol] for symbol in symbols]
+
+    def prefix_runs(self, prefix):
+        """Ids of the runs whose path starts with prefix (room type ids), in path order"""
+        key = (np.asarray(prefix, dtype=np.uint8) + 1).tobytes()
+        low = np.searchsorted(self.sorted_paths, key, side='left')
+        high = np.searchsorted(self.sorted_paths, key + b'\xff', side='left')
+        return self.path_order[low:high]
+
+    def next_rooms(self, run_ids, depth):
+        """Room type id on floor depth + 1 of each run (-1 where the path ends before it)"""
+        has_next = self.lengths()[run_ids] > depth
+        rooms = np.full(len(run_ids), -1, dtype=np.int64)
+        rooms[has_next] = self.rooms[self.offsets[run_ids[has_next]] + depth]
+        return rooms
+
+
+def grouped_counts(groups, run_ids, victory, character, n_characters):
+    """
+    Rows and victories per distinct value of groups (one row per run_ids
+    entry), overall and per character; keys holds the group values
+    """
+    keys, inverse = np.unique(groups, return_inverse=True)
+    won = victory[run_ids]
+    by_character = inverse * n_characters + character[run_ids]
+    return {
+        'keys': keys,
+        'inverse': inverse,
+        'rows': np.bincount(inverse, minlength=len(keys)),
+        'victories': np.bincount(inverse, weights=won, minlength=len(keys)),
+        'character_rows': np.bincount(by_character, minlength=len(keys) * n_characters).reshape(len(keys), n_characters),
+        'character_victories': np.bincount(by_character, weights=won, minlength=len(keys) * n_characters).reshape(len(keys), n_characters)
+    }
+
+
+class EventTable:
+    """
+    Event outcomes: one row per event_choices entry
+    Event names and choices share the labels vocabulary. Deltas are net
+    changes (healed - taken, gain - loss) and gains are counts of cards and
+    relics obtained.
+    """
+
+    ARRAYS = ('run', 'floor', 'event', 'choice', 'hp_delta', 'gold_delta', 'max_hp_delta', 'cards_gained', 'relics_gained')
+    VOCABULARY = 'labels'
+
+    def __init__(self):
+        self.labels = Vocabulary()
+        self.run = np.zeros(0, dtype=np.int32)
+        self.floor = np.zeros(0, dtype=np.int16)
+        self.event = np.zeros(0, dtype=np.int32)
+        self.choice = np.zeros(0, dtype=np.int32)
+        self.hp_delta = np.zeros(0, dtype=np.int32)
+        self.gold_delta = np.zeros(0, dtype=np.int32)
+        self.max_hp_delta = np.zeros(0, dtype=np.int32)
+        self.cards_gained = np.zeros(0, dtype=np.int32)
+        self.relics_gained = np.zeros(0, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.run)
+
+    def copy(self):
+        """Shallow copy that can be extended without affecting this table"""
+        table = copy.copy(self)
+        table.labels = self.labels.copy()
+        return table
+
+    def extend(self, runs, first_run_id):
+        """Append the event outcomes of runs, numbering them from first_run_id"""
+        rows = []
+        for offset, run in enumerate(runs):
+            for event in run.get('event_choices', []) or []:
+                rows.append((
+                    first_run_id + offset,
+                    event.get('floor', 0) or 0,
+                    self.labels.add(event.get('event_name') or ''),
+                    self.labels.add(event.get('player_choice') or ''),
+                    (event.get('damage_healed', 0) or 0) - (event.get('damage_taken', 0) or 0),
+                    (event.get('gold_gain', 0) or 0) - (event.get('gold_loss', 0) or 0),
+                    (event.get('max_hp_gain', 0) or 0) - (event.get('max_hp_loss', 0) or 0),
+                    len(event.get('cards_obtained', []) or []),
+                    len(event.get('relics_obtained', []) or [])
+                ))
+        if not rows:
+            return
+
+        columns = list(zip(*rows))
+        for name, values in zip(self.ARRAYS, columns):
+            current = getattr(self, name)
+            setattr(self, name, np.concatenate([current, np.asarray(values, dtype=current.dtype)]))
+
+    def counts(self, run_mask, victory, character, n_characters):
+        """
+        Per (event, choice) pair of the runs selected by run_mask: rows,
+        victories (overall and per character) and summed deltas and gains;
+        events and choices hold each pair's label ids
+        """
+        rows = np.flatnonzero(run_mask[self.run])
+        counts = grouped_counts(self.event[rows] * len(self.labels) + self.choice[rows], self.run[rows],
+                                victory, character, n_characters)
+        counts['events'], counts['choices'] = np.divmod(counts['keys'], len(self.labels))
+        for name in ('hp_delta', 'gold_delta', 'max_hp_delta', 'cards_gained', 'relics_gained'):
+            counts[name] = np.bincount(counts['inverse'], weights=getattr(self, name)[rows], minlength=len(counts['keys']))
+        return counts
+
+
+class NeowTable:
+    """Neow's blessing of each run that records one: (run, bonus, cost), labels shared"""
+
+    ARRAYS = ('run', 'bonus', 'cost')
+    VOCABULARY = 'labels'
+
+    def __init__(self):
+        self.labels = Vocabulary()
+        self.run = np.zeros(0, dtype=np.int32)
+        self.bonus = np.zeros(0, dtype=np.int32)
+        self.cost = np.zeros(0, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.run)
+
+    def copy(self):
+        """Shallow copy that can be extended without affecting this table"""
+        table = copy.copy(self)
+        table.labels = self.labels.copy()
+        return table
+
+    def extend(self, runs, first_run_id):
+        """Append the Neow choice of runs, numbering them from first_run_id"""
+        rows = [
+            (first_run_id + offset, self.labels.add(run['neow_bonus']), self.labels.add(run.get('neow_cost') or 'NONE'))
+            for offset, run in enumerate(runs) if run.get('neow_bonus')
+        ]
+        if not rows:
+            return
+
+        run_ids, bonuses, costs = zip(*rows)
+        self.run = np.concatenate([self.run, np.asarray(run_ids, dtype=np.int32)])
+        self.bonus = np.concatenate([self.bonus, np.asarray(bonuses, dtype=np.int32)])
+        self.cost = np.concatenate([self.cost, np.asarray(costs, dtype=np.int32)])
+
+    def counts(self, run_mask, victory, character, n_characters):
+        """grouped_counts of the bonuses and of the costs chosen in the runs selected by run_mask"""
+        rows = np.flatnonzero(run_mask[self.run])
+        return {
+            'bonuses': grouped_counts(self.bonus[rows], self.run[rows], victory, character, n_characters),
+            'costs': grouped_counts(self.cost[rows], self.run[rows], victory, character, n_characters)
+        }
+
+
+class ShopTable:
+    """
+    Shop economics aligned with gold_per_floor
+    One visit row per floor with a shop room, purchases or a shop purge:
+    gold held before it and spent in it (drop in gold over the floor).
+    One purchase row per items_purchased entry, and per run the gold
+    earned over the run (starting gold plus every increase).
+    """
+
+    ARRAYS = ('earned', 'visit_run', 'visit_floor', 'visit_gold', 'visit_spent', 'visit_purchases',
+              'visit_purges', 'purchase_run', 'purchase_floor', 'purchase_item')
+    VOCABULARY = 'items'
+
+    def __init__(self):
+        self.items = Vocabulary()
+        self.earned = np.zeros(0, dtype=np.int32)
+        self.visit_run = np.zeros(0, dtype=np.int32)
+        self.visit_floor = np.zeros(0, dtype=np.int16)
+        self.visit_gold = np.zeros(0, dtype=np.int32)
+        self.visit_spent = np.zeros(0, dtype=np.int32)
+        self.visit_purchases = np.zeros(0, dtype=np.int32)
+        self.visit_purges = np.zeros(0, dtype=np.int32)
+        self.purchase_run = np.zeros(0, dtype=np.int32)
+        self.purchase_floor = np.zeros(0, dtype=np.int16)
+        self.purchase_item = np.zeros(0, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.visit_run)
+
+    def copy(self):
+        """Shallow copy that can be extended without affecting this table"""
+        table = copy.copy(self)
+        table.items = self.items.copy()
+        return table
+
+    def extend(self, runs, first_run_id):
+        """Append the shop visits and purchases of runs, numbering them from first_run_id"""
+        earned, visits, purchases = [], [], []
+        for offset, run in enumerate(runs):
+            run_id = first_run_id + offset
+            gold = [STARTING_GOLD] + [g or 0 for g in run.get('gold_per_floor', []) or []]
+            earned.append(STARTING_GOLD + sum(max(after - before, 0) for before, after in zip(gold, gold[1:])))
+
+            purchase_floors = run.get('item_purchase_floors', []) or []
+            bought = {}
+            for i, item in enumerate(run.get('items_purchased', []) or []):
+                floor = purchase_floors[i] if i < len(purchase_floors) else 0
+                purchases.append((run_id, floor, self.items.add(item)))
+                bought[floor] = bought.get(floor, 0) + 1
+
+            shop_floors = {floor for floor, room in enumerate(run.get('path_per_floor', []) or [], start=1) if room == '$'}
+            purged = {}
+            for floor in run.get('items_purged_floors', []) or []:
+                if floor in shop_floors:
+                    purged[floor] = purged.get(floor, 0) + 1
+
+            for floor in sorted((shop_floors | set(bought)) - {0}):
+                before = gold[floor - 1] if floor - 1 < len(gold) else gold[-1]
+                after = gold[floor] if floor < len(gold) else before
+                visits.append((run_id, floor, before, max(before - after, 0), bought.get(floor, 0), purged.get(floor, 0)))
+
+        self.earned = np.concatenate([self.earned, np.asarray(earned, dtype=np.int32)])
+        for names, rows in ((self.ARRAYS[1:7], visits), (self.ARRAYS[7:], purchases)):
+            if rows:
+                for name, values in zip(names, zip(*rows)):
+                    current = getattr(self, name)
+                    setattr(self, name, np.concatenate([current, np.asarray(values, dtype=current.dtype)]))
+
+
+class RunStore:
+    """
+    Run dicts by run id, optionally backed by a JSON-lines blob
+    Runs loaded from a snapshot stay encoded until first accessed, so
+    endpoints that only read the index arrays never decode them.
+    """
+
+    def __init__(self, blob=b'', offsets=None):
+        self.blob = blob
+        self.offsets = np.zeros(1, dtype=np.int64) if offsets is None else offsets
+        self.items = [None] * (len(self.offsets) - 1)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, run_id):
+        run = self.items[run_id]
+        if run is None:
+            run = json.loads(bytes(self.blob[self.offsets[run_id]:self.offsets[run_id + 1]]))
+            self.items[run_id] = run
+        return run
+
+    def __iter__(self):
+        return (self[run_id] for run_id in range(len(self.items)))
+
+    def copy(self):
+        store = copy.copy(self)
+        store.items = list(self.items)
+        return store
+
+    def extend(self, runs):
+        self.items.extend(runs)
+
+    def write(self, f):
+        """
+        Write every run to f as a JSON line, returning the line offsets
+        Blob-backed runs are copied without being decoded.
+        """
+        stored_end = int(self.offsets[-1])
+        for start in range(0, stored_end, BLOB_COPY_BYTES):
+            f.write(self.blob[start:min(start + BLOB_COPY_BYTES, stored_end)])
+
+        position = stored_end
+        new_offsets = []
+        for run in self.items[len(self.offsets) - 1:]:
+            line = json.dumps(run, separators=(',', ':')).encode() + b'\n'
+            f.write(line)
+            position += len(line)
+            new_offsets.append(position)
+        return np.concatenate([self.offsets, np.asarray(new_offsets, dtype=np.int64)])
+
+
+class RunIndex:
+    """
+    Columnar view of the run corpus plus per-domain event tables
+    Run ids are positions in self.runs (insertion order).
+    """
+
+    # Run-level arrays and event tables saved in index snapshots
+    ARRAYS = ('character', 'timestamp', 'ascension_level', 'victory', 'is_daily', 'features')
+    TABLES = ('card_events', 'relic_events', 'decks', 'trends', 'paths', 'events', 'neow', 'shops')
+
+    def __init__(self, runs=()):
+        self.version = next(_versions)
+        self.runs = RunStore()
+        self.run_ids = {}
+        self.characters = Vocabulary()
+        self.character = np.zeros(0, dtype=np.int16)
+        self.timestamp = np.zeros(0, dtype=np.int64)
+        self.ascension_level = np.zeros(0, dtype=np.int16)
+        self.victory = np.zeros(0, dtype=bool)
+        self.is_daily = np.zeros(0, dtype=bool)
+        self.card_events = CardEventTable()
+        self.relic_events = RelicEventTable()
+        self.decks = DeckMatrix()
+        self.trends = TrendTable()
+        self.paths = PathTable()
+        self.events = EventTable()
+        self.neow = NeowTable()
+        self.shops = ShopTable()
+        self.features = np.zeros((0, len(FEATURE_NAMES)))
+        self.correlation = CorrelationStats()
+        self.synergy = SynergyStats()
+        self.extend(runs)
+
+    def __len__(self):
+        return len(self.runs)
+
+    def extended(self, runs):
+        """
+        Copy of the index with runs added
+        Arrays are replaced rather than modified in place, so the copy shares
+        them with this index and readers holding it see a consistent corpus.
+        """
+        index = copy.copy(self)
+        index.runs = self.runs.copy()
+        index.run_ids = dict(self.run_ids)
+        index.characters = self.characters.copy()
+        for name in self.TABLES:
+            setattr(index, name, getattr(self, name).copy())
+        index.correlation = self.correlation.copy()
+        index.synergy = self.synergy.copy()
+        index.extend(runs)
+        return index
+
+    def extend(self, runs):
+        """Index additional (already normalized) runs"""
+        runs = list(runs)
+        if not runs:
+            return
+
+        self.version = next(_versions)
+        first_run_id = len(self.runs)
+        self.runs.extend(runs)
+        for offset, run in enumerate(runs):
+            self.run_ids[run.get('play_id')] = first_run_id + offset
+
+        characters = [self.characters.add(r.get('character_chosen', r.get('character'))) for r in runs]
+        self.character = np.concatenate([self.character, np.asarray(characters, dtype=np.int16)])
+        self.timestamp = np.concatenate([self.timestamp, np.asarray([r.get('timestamp', 0) or 0 for r in runs], dtype=np.int64)])
+        self.ascension_level = np.concatenate([self.ascension_level, np.asarray([r.get('ascension_level', 0) or 0 for r in runs], dtype=np.int16)])
+        self.victory = np.concatenate([self.victory, np.asarray([bool(r.get('victory', False)) for r in runs], dtype=bool)])
+        self.is_daily = np.concatenate([self.is_daily, np.asarray([bool(r.get('is_daily', False)) for r in runs], dtype=bool)])
+
+        self.card_events.extend(runs, first_run_id)
+        self.relic_events.extend(runs, first_run_id)
+        self.decks.extend(runs)
+        self.trends.extend(runs)
+        self.paths.extend(runs)
+        self.events.extend(runs, first_run_id)
+        self.neow.extend(runs, first_run_id)
+        self.shops.extend(runs, first_run_id)
+
+        features = feature_matrix(runs)
+        self.features = np.concatenate([self.features, features])
+        self.correlation.add(
+            features,
+            [r.get('character_chosen', r.get('character')) for r in runs],
+            self.ascension_level[first_run_id:].tolist(),
+            self.is_daily[first_run_id:].tolist()
+        )
+
+    def character_ids(self, names):
+        """Character ids for a collection of character names (unknown names are skipped)"""
+        return [self.characters.ids[name] for name in names if name in self.characters]
+
+    def mask(self, filters):
+        """Boolean run mask equivalent to app.apply_filters"""
+        mask = np.ones(len(self.runs), dtype=bool)
+
+        # Filter out modded characters if ignore_downfall is true
+        if filters.get('ignore_downfall') is not None and filters.get('ignore_downfall') != '':
+            if filters['ignore_downfall'].lower() == 'true':
+                mask &= np.isin(self.character, self.character_ids(BASE_GAME_CHARACTERS))
+
+        if filters.get('character'):
+            mask &= np.isin(self.character, self.character_ids([filters['character']]))
+
+        start_ts, end_ts = date_bounds(filters)
+        if start_ts is not None:
+            mask &= self.timestamp >= start_ts
+        if end_ts is not None:
+            mask &= self.timestamp <= end_ts
+
+        if filters.get('ascension_level') is not None and filters.get('ascension_level') != '':
+            mask &= self.ascension_level == int(filters['ascension_level'])
+
+        if filters.get('victory') is not None and filters.get('victory') != '':
+            mask &= self.victory == (filters['victory'].lower() == 'true')
+
+        if filters.get('is_daily') is not None and filters.get('is_daily') != '':
+            mask &= self.is_daily == (filters['is_daily'].lower() == 'true')
+
+        return mask
+
+    def correlation_sums(self, filters):
+        """
+        n, sum(x) and sum(x x^T) of the correlation features for filtered runs
+        Served from the per-bucket running sums when the filters allow it.
+        """
+        totals = self.correlation.totals(filters, BASE_GAME_CHARACTERS)
+        if totals is None:
+            x = self.features[self.mask(filters)]
+            totals = (len(x), x.sum(axis=0), x.T @ x)
+        return totals
+
+    def synergy_sums(self, filters):
+        """
+        Card-card and card-relic co-occurrence in the final decks of filtered
+        runs (see synergy_stats.py); cards are decks.cards ids, relics
+        relic_events.relics ids
+        """
+        n_cards, n_relics = len(self.decks.cards), len(self.relic_events.relics)
+
+        def compute(start):
+            run_ids = start + np.flatnonzero(self.mask(filters)[start:])
+            cards = self.decks.matrix()[run_ids][:, 0::2]
+            cards.data[:] = 1
+
+            position = np.full(len(self), -1, dtype=np.int64)
+            position[run_ids] = np.arange(len(run_ids))
+            held = position[self.relic_events.held_run] >= 0
+            relics = sparse.csr_matrix((
+                np.ones(int(held.sum()), dtype=np.int32),
+                (position[self.relic_events.held_run[held]], self.relic_events.held_relic[held])
+            ), shape=(len(run_ids), n_relics))
+            relics.data[:] = 1
+            return cooccurrence(cards.astype(np.int32), relics, self.victory[run_ids])
+
+        return self.synergy.get(filter_fingerprint(filters), len(self), n_cards, n_relics, compute)
+
+    def select(self, mask):
+        """Runs selected by mask, ordered by timestamp"""
+        run_ids = np.flatnonzero(mask)
+        run_ids = run_ids[np.argsort(self.timestamp[run_ids], kind='stable')]
+        return [self.runs[i] for i in run_ids]
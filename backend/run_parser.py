@@ -7,6 +7,25 @@ import hashlib
 from datetime import datetime
 from pathlib import Path
 
+# .run fields kept in runs.raw_data: everything the analytics, the Postgres
+# aggregate functions and the run list read. The complete file is stored
+# compressed in run_archives (see run_archive.py).
+ANALYTICS_FIELDS = (
+    'play_id', 'character_chosen', 'ascension_level', 'is_ascension_mode', 'is_daily',
+    'victory', 'floor_reached', 'score', 'playtime', 'timestamp', 'seed_source_timestamp',
+    'seed_played', 'local_time', 'killed_by', 'gold', 'gold_per_floor',
+    'current_hp_per_floor', 'max_hp_per_floor', 'path_per_floor', 'path_taken',
+    'master_deck', 'relics', 'card_choices', 'campfire_choices', 'campfire_rested',
+    'campfire_upgraded', 'relics_obtained', 'boss_relics', 'event_choices', 'damage_taken',
+    'items_purchased', 'item_purchase_floors', 'items_purged', 'items_purged_floors',
+    'purchased_purges', 'potions_obtained', 'potions_floor_usage', 'potions_floor_spawned',
+    'neow_bonus', 'neow_cost', 'chose_neow_reward'
+)
+
+def slim_run(run_data, fields=ANALYTICS_FIELDS):
+    """The given fields of a run (by default the ANALYTICS_FIELDS)"""
+    return {field: run_data[field] for field in fields if field in run_data}
+
 def create_unique_run_identifier(run_data):
     """
     Create a unique identifier for a run using multiple fields
@@ -23,13 +42,16 @@ def create_unique_run_identifier(run_data):
     hash_object = hashlib.sha256(identifier_string.encode())
     return f"{play_id}_{hash_object.hexdigest()[:16]}"
 
-def parse_run_file(file_content, filename=None):
+def parse_run_file(file_content, filename=None, fields=None):
     """
     Parse a .run file and extract structured data
 
     Args:
-        file_content: String content of the .run file (JSON)
+        file_content: String or bytes content of the .run file (JSON)
         filename: Optional filename for error reporting
+        fields: Optional .run fields to keep in raw_data (e.g. ANALYTICS_FIELDS);
+            the rest of the decoded file is released as soon as the run is
+            parsed. By default the complete file is kept.
 
     Returns:
         dict: Structured run data ready for database insertion
@@ -37,7 +59,7 @@ def parse_run_file(file_content, filename=None):
     """
     try:
         # Parse JSON
-        if isinstance(file_content, str):
+        if isinstance(file_content, (str, bytes)):
             run_data = json.loads(file_content)
         else:
             run_data = file_content
@@ -136,7 +158,7 @@ def parse_run_file(file_content, filename=None):
             'neow_bonus': neow_bonus,
             'neow_cost': neow_cost,
             'chose_neow_reward': chose_neow_reward,
-            'raw_data': run_data  # Store complete JSON
+            'raw_data': run_data if fields is None else slim_run(run_data, fields)
         }
 
         return parsed_data
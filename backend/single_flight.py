@@ -0,0 +1,51 @@
+"""
+Request coalescing (single-flight)
+Concurrent calls with the same key share one execution: the first caller
+runs the function, and callers arriving while it is in flight wait for it
+and get its result (or its exception). Nothing is kept once the call
+returns, so a later call always runs again.
+"""
+import threading
+import metrics
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls per key; name labels its metrics"""
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        """fn(*args, **kwargs), unless a call for key is in flight: then its result"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        metrics.increment('sts_single_flight_calls_total', flight=self.name, result='executed' if leader else 'shared')
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
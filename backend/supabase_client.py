@@ -1,8 +1,9 @@
 """
 Supabase client configuration and helper functions
+Set SUPABASE_BACKEND=fake to use the in-process stand-in from
+fake_supabase.py instead of a live project (for offline load testing).
 """
 import os
-from supabase import create_client, Client
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -12,15 +13,66 @@ load_dotenv()
 SUPABASE_URL = os.getenv('SUPABASE_URL')
 SUPABASE_KEY = os.getenv('SUPABASE_KEY')
 
-def get_supabase_client() -> Client:
+# Data backend: 'supabase' (default) or 'fake'
+SUPABASE_BACKEND = os.getenv('SUPABASE_BACKEND', 'supabase').lower()
+
+# Client used instead of create_client when set (fake backend or tests)
+_client_override = None
+
+def set_supabase_client(client):
+    """
+    Route every get_supabase_client() call to client
+    Pass None to go back to the configured backend.
+    """
+    global _client_override
+    _client_override = client
+
+def create_fake_client():
+    """
+    Build the in-process stand-in configured from the environment:
+    FAKE_SUPABASE_LATENCY_MS, FAKE_SUPABASE_ROW_LATENCY_US, FAKE_SUPABASE_JITTER_MS,
+    FAKE_SUPABASE_MAX_CONCURRENCY, FAKE_SUPABASE_MAX_ROWS (default 1000, as on
+    hosted PostgREST), FAKE_SUPABASE_SEED and FAKE_SUPABASE_CORPUS
+    (a ZIP or directory of .run files loaded at startup)
+    """
+    from fake_supabase import FakeSupabaseClient
+
+    max_concurrency = os.getenv('FAKE_SUPABASE_MAX_CONCURRENCY')
+    max_rows = int(os.getenv('FAKE_SUPABASE_MAX_ROWS', 1000))
+    client = FakeSupabaseClient(
+        latency_ms=float(os.getenv('FAKE_SUPABASE_LATENCY_MS', 0)),
+        row_latency_us=float(os.getenv('FAKE_SUPABASE_ROW_LATENCY_US', 0)),
+        jitter_ms=float(os.getenv('FAKE_SUPABASE_JITTER_MS', 0)),
+        max_concurrency=int(max_concurrency) if max_concurrency else None,
+        max_rows=max_rows or None,
+        seed=int(os.getenv('FAKE_SUPABASE_SEED', 0))
+    )
+
+    corpus = os.getenv('FAKE_SUPABASE_CORPUS')
+    if corpus:
+        print(f"Loaded {client.load_corpus(corpus)} runs into the fake Supabase backend")
+    return client
+
+def get_supabase_client():
     """
     Get Supabase client instance
-    Returns None if credentials are not configured
+    Returns None if credentials are not configured. The supabase SDK is
+    imported on first use, as it takes most of a second to load.
     """
+    global _client_override
+
+    if _client_override is not None:
+        return _client_override
+
+    if SUPABASE_BACKEND == 'fake':
+        _client_override = create_fake_client()
+        return _client_override
+
     if not SUPABASE_URL or not SUPABASE_KEY:
         return None
 
     try:
+        from supabase import create_client
         return create_client(SUPABASE_URL, SUPABASE_KEY)
     except Exception as e:
         print(f"Error creating Supabase client: {e}")
@@ -28,4 +80,6 @@ def get_supabase_client() -> Client:
 
 def is_supabase_configured() -> bool:
     """Check if Supabase credentials are configured"""
+    if _client_override is not None or SUPABASE_BACKEND == 'fake':
+        return True
     return bool(SUPABASE_URL and SUPABASE_KEY)
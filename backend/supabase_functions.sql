@@ -0,0 +1,315 @@
+-- Server-side aggregates for Slay the Spire runs
+-- Run this SQL in your Supabase SQL Editor after supabase_schema.sql
+-- (it is safe to run again after changes). With AGGREGATE_BACKEND=rpc the
+-- backend calls these functions through supabase.rpc() instead of loading
+-- every run: each one returns a single jsonb value, so the result is never
+-- cut by PostgREST's row limit.
+--
+-- Every function takes the same optional filters (NULL = not filtered):
+--   p_character, p_start_ts / p_end_ts (Unix seconds, inclusive),
+--   p_ascension_level, p_victory, p_is_daily, p_base_game_only
+
+-- jsonb arrays as-is; anything else (missing key, null, object) as []
+CREATE OR REPLACE FUNCTION jsonb_array_or_empty(value JSONB)
+RETURNS JSONB
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT CASE WHEN jsonb_typeof(value) = 'array' THEN value ELSE '[]'::JSONB END
+$$;
+
+-- Card name without the "+1" upgrade suffix (as run_index.get_base_card_name)
+CREATE OR REPLACE FUNCTION base_card_name(name TEXT)
+RETURNS TEXT
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT CASE WHEN name LIKE '%+1' THEN left(name, -2) ELSE name END
+$$;
+
+-- The game's own timestamp (the timestamp column holds seed_source_timestamp)
+ALTER TABLE runs ADD COLUMN IF NOT EXISTS run_timestamp BIGINT
+    GENERATED ALWAYS AS (COALESCE((raw_data->>'timestamp')::BIGINT, 0)) STORED;
+
+-- Base game characters (for the "ignore Downfall" filter)
+ALTER TABLE runs ADD COLUMN IF NOT EXISTS is_base_game BOOLEAN
+    GENERATED ALWAYS AS (character IN ('DEFECT', 'IRONCLAD', 'THE_SILENT', 'WATCHER')) STORED;
+
+-- The raw_data arrays the aggregates read, so a scan does not decompress
+-- the whole run document (mostly per-floor arrays) for every row
+ALTER TABLE runs ADD COLUMN IF NOT EXISTS card_choices JSONB
+    GENERATED ALWAYS AS (jsonb_array_or_empty(raw_data->'card_choices')) STORED;
+ALTER TABLE runs ADD COLUMN IF NOT EXISTS campfire_choices JSONB
+    GENERATED ALWAYS AS (jsonb_array_or_empty(raw_data->'campfire_choices')) STORED;
+ALTER TABLE runs ADD COLUMN IF NOT EXISTS relics JSONB
+    GENERATED ALWAYS AS (jsonb_array_or_empty(raw_data->'relics')) STORED;
+ALTER TABLE runs ADD COLUMN IF NOT EXISTS relics_obtained JSONB
+    GENERATED ALWAYS AS (jsonb_array_or_empty(raw_data->'relics_obtained')) STORED;
+ALTER TABLE runs ADD COLUMN IF NOT EXISTS boss_relics JSONB
+    GENERATED ALWAYS AS (jsonb_array_or_empty(raw_data->'boss_relics')) STORED;
+ALTER TABLE runs ADD COLUMN IF NOT EXISTS items_purchased JSONB
+    GENERATED ALWAYS AS (jsonb_array_or_empty(raw_data->'items_purchased')) STORED;
+ALTER TABLE runs ADD COLUMN IF NOT EXISTS event_relics JSONB
+    GENERATED ALWAYS AS (jsonb_path_query_array(raw_data, '$.event_choices[*].relics_obtained[*]')) STORED;
+ALTER TABLE runs ADD COLUMN IF NOT EXISTS damage_taken JSONB
+    GENERATED ALWAYS AS (jsonb_array_or_empty(raw_data->'damage_taken')) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_runs_run_timestamp ON runs(run_timestamp);
+CREATE INDEX IF NOT EXISTS idx_runs_filters ON runs(character, ascension_level, is_daily, run_timestamp);
+
+-- Runs matching the filters (inlined into the callers, so the predicates
+-- reach the indexes)
+CREATE OR REPLACE FUNCTION filtered_runs(
+    p_character TEXT DEFAULT NULL,
+    p_start_ts BIGINT DEFAULT NULL,
+    p_end_ts BIGINT DEFAULT NULL,
+    p_ascension_level INTEGER DEFAULT NULL,
+    p_victory BOOLEAN DEFAULT NULL,
+    p_is_daily BOOLEAN DEFAULT NULL,
+    p_base_game_only BOOLEAN DEFAULT FALSE
+)
+RETURNS SETOF runs
+LANGUAGE sql STABLE AS $$
+    SELECT *
+    FROM runs
+    WHERE (p_character IS NULL OR character = p_character)
+      AND (p_start_ts IS NULL OR run_timestamp >= p_start_ts)
+      AND (p_end_ts IS NULL OR run_timestamp <= p_end_ts)
+      AND (p_ascension_level IS NULL OR ascension_level = p_ascension_level)
+      AND (p_victory IS NULL OR victory = p_victory)
+      AND (p_is_daily IS NULL OR is_daily = p_is_daily)
+      AND (NOT COALESCE(p_base_game_only, FALSE) OR is_base_game)
+$$;
+
+-- Totals per character (for /api/stats)
+CREATE OR REPLACE FUNCTION run_summary(
+    p_character TEXT DEFAULT NULL,
+    p_start_ts BIGINT DEFAULT NULL,
+    p_end_ts BIGINT DEFAULT NULL,
+    p_ascension_level INTEGER DEFAULT NULL,
+    p_victory BOOLEAN DEFAULT NULL,
+    p_is_daily BOOLEAN DEFAULT NULL,
+    p_base_game_only BOOLEAN DEFAULT FALSE
+)
+RETURNS JSONB
+LANGUAGE sql STABLE AS $$
+    SELECT COALESCE(jsonb_agg(summary), '[]'::JSONB)
+    FROM (
+        SELECT
+            character,
+            COUNT(*) AS total_runs,
+            COUNT(*) FILTER (WHERE victory) AS victories,
+            SUM(floor_reached) AS floor_reached,
+            SUM(COALESCE(score, 0)) AS score,
+            SUM(COALESCE(playtime, 0)) AS playtime,
+            MAX(COALESCE(score, 0)) AS highest_score,
+            MAX(floor_reached) AS deepest_floor
+        FROM filtered_runs(p_character, p_start_ts, p_end_ts, p_ascension_level, p_victory, p_is_daily, p_base_game_only)
+        GROUP BY character
+    ) summary
+$$;
+
+-- Card reward and campfire upgrade counts per card (for /api/cards)
+CREATE OR REPLACE FUNCTION card_stats(
+    p_character TEXT DEFAULT NULL,
+    p_start_ts BIGINT DEFAULT NULL,
+    p_end_ts BIGINT DEFAULT NULL,
+    p_ascension_level INTEGER DEFAULT NULL,
+    p_victory BOOLEAN DEFAULT NULL,
+    p_is_daily BOOLEAN DEFAULT NULL,
+    p_base_game_only BOOLEAN DEFAULT FALSE
+)
+RETURNS JSONB
+LANGUAGE sql STABLE AS $$
+    WITH selected AS (
+        SELECT character, victory, card_choices, campfire_choices
+        FROM filtered_runs(p_character, p_start_ts, p_end_ts, p_ascension_level, p_victory, p_is_daily, p_base_game_only)
+    ),
+    events AS (
+        SELECT s.character, s.victory, choice->>'picked' AS card, 'picked' AS kind
+        FROM selected s, jsonb_array_elements(s.card_choices) choice
+        WHERE COALESCE(choice->>'picked', '') NOT IN ('', 'SKIP', 'Singing Bowl')
+        UNION ALL
+        SELECT s.character, s.victory, not_picked,
+               CASE WHEN choice->>'picked' = 'SKIP' THEN 'skipped' ELSE 'offered' END
+        FROM selected s,
+             jsonb_array_elements(s.card_choices) choice,
+             jsonb_array_elements_text(jsonb_array_or_empty(choice->'not_picked')) not_picked
+        WHERE not_picked <> 'Singing Bowl'
+        UNION ALL
+        SELECT s.character, s.victory, choice->>'data', 'upgraded'
+        FROM selected s, jsonb_array_elements(s.campfire_choices) choice
+        WHERE choice->>'key' = 'SMITH' AND COALESCE(choice->>'data', '') <> ''
+    ),
+    -- Counted per character first, which hashes instead of sorting every event
+    by_character AS (
+        SELECT
+            base_card_name(card) AS card,
+            character,
+            COUNT(*) FILTER (WHERE kind = 'picked') AS picks,
+            COUNT(*) FILTER (WHERE kind = 'picked' AND card LIKE '%+1') AS picked_upgraded,
+            COUNT(*) FILTER (WHERE kind = 'picked' AND victory) AS victories,
+            COUNT(*) FILTER (WHERE kind = 'offered') AS offered,
+            COUNT(*) FILTER (WHERE kind = 'skipped') AS skipped,
+            COUNT(*) FILTER (WHERE kind = 'upgraded') AS campfire_upgrades
+        FROM events
+        GROUP BY 1, 2
+    )
+    SELECT COALESCE(jsonb_agg(card_counts), '[]'::JSONB)
+    FROM (
+        SELECT
+            card,
+            SUM(picks) AS picks,
+            SUM(picked_upgraded) AS picked_upgraded,
+            SUM(victories) AS victories,
+            SUM(offered) AS offered,
+            SUM(skipped) AS skipped,
+            SUM(campfire_upgrades) AS campfire_upgrades,
+            array_agg(character) FILTER (WHERE picks > 0) AS characters
+        FROM by_character
+        GROUP BY card
+        HAVING SUM(picks) > 0
+    ) card_counts
+$$;
+
+-- Relic acquisitions per relic and source (for /api/relics); sources as in
+-- run_index.RelicEventTable
+CREATE OR REPLACE FUNCTION relic_stats(
+    p_character TEXT DEFAULT NULL,
+    p_start_ts BIGINT DEFAULT NULL,
+    p_end_ts BIGINT DEFAULT NULL,
+    p_ascension_level INTEGER DEFAULT NULL,
+    p_victory BOOLEAN DEFAULT NULL,
+    p_is_daily BOOLEAN DEFAULT NULL,
+    p_base_game_only BOOLEAN DEFAULT FALSE
+)
+RETURNS JSONB
+LANGUAGE sql STABLE AS $$
+    WITH selected AS (
+        SELECT id, character, victory, neow_bonus, relics, relics_obtained, boss_relics, items_purchased, event_relics
+        FROM filtered_runs(p_character, p_start_ts, p_end_ts, p_ascension_level, p_victory, p_is_daily, p_base_game_only)
+    ),
+    acquired AS (
+        SELECT s.id, s.character, s.victory, event->>'key' AS relic, 'combat' AS source, TRUE AS picked
+        FROM selected s, jsonb_array_elements(s.relics_obtained) event
+        WHERE COALESCE(event->>'key', '') <> ''
+        UNION ALL
+        SELECT s.id, s.character, s.victory, boss->>'picked', 'boss', TRUE
+        FROM selected s, jsonb_array_elements(s.boss_relics) boss
+        WHERE COALESCE(boss->>'picked', '') <> ''
+        UNION ALL
+        SELECT s.id, s.character, s.victory, not_picked, 'boss', FALSE
+        FROM selected s,
+             jsonb_array_elements(s.boss_relics) boss,
+             jsonb_array_elements_text(jsonb_array_or_empty(boss->'not_picked')) not_picked
+        UNION ALL
+        -- Shop purchases that show up in the final relic list
+        SELECT s.id, s.character, s.victory, item, 'shop', TRUE
+        FROM selected s, jsonb_array_elements_text(s.items_purchased) item
+        WHERE s.relics ? item
+        UNION ALL
+        SELECT s.id, s.character, s.victory, relic, 'event', TRUE
+        FROM selected s, jsonb_array_elements_text(s.event_relics) relic
+    ),
+    held AS (
+        SELECT s.id, s.character, s.victory, s.neow_bonus, relic, position
+        FROM selected s, jsonb_array_elements_text(s.relics) WITH ORDINALITY AS final(relic, position)
+    ),
+    -- Held relics no source explains: the character's starter relic, or the
+    -- first relic when Neow swapped the starter for a boss relic (or, for
+    -- modded characters, the first relic); starters as in run_index.STARTER_RELICS
+    unexplained AS (
+        SELECT h.id, h.character, h.victory, h.relic,
+               CASE
+                   WHEN h.relic = CASE h.character
+                       WHEN 'IRONCLAD' THEN 'Burning Blood'
+                       WHEN 'THE_SILENT' THEN 'Ring of the Snake'
+                       WHEN 'DEFECT' THEN 'Cracked Core'
+                       WHEN 'WATCHER' THEN 'PureWater'
+                   END THEN 'starter'
+                   WHEN MIN(h.position) = 1 AND h.neow_bonus = 'BOSS_RELIC' THEN 'neow'
+                   WHEN MIN(h.position) = 1
+                        AND COALESCE(h.character, '') NOT IN ('IRONCLAD', 'THE_SILENT', 'DEFECT', 'WATCHER') THEN 'starter'
+                   ELSE 'other'
+               END AS source, TRUE AS picked
+        FROM held h
+        WHERE NOT EXISTS (SELECT 1 FROM acquired a WHERE a.id = h.id AND a.relic = h.relic AND a.picked)
+        GROUP BY h.id, h.character, h.victory, h.neow_bonus, h.relic
+    ),
+    events AS (
+        SELECT character, victory, relic, source, picked FROM acquired
+        UNION ALL
+        SELECT character, victory, relic, source, picked FROM unexplained
+    ),
+    by_character AS (
+        SELECT
+            relic,
+            character,
+            COUNT(*) FILTER (WHERE picked) AS picks,
+            COUNT(*) FILTER (WHERE picked AND victory) AS victories,
+            COUNT(*) FILTER (WHERE source = 'boss') AS boss_offers,
+            COUNT(*) FILTER (WHERE source = 'boss' AND picked) AS boss_picks,
+            COUNT(*) FILTER (WHERE picked AND source = 'starter') AS starter,
+            COUNT(*) FILTER (WHERE picked AND source = 'combat') AS combat,
+            COUNT(*) FILTER (WHERE picked AND source = 'boss') AS boss,
+            COUNT(*) FILTER (WHERE picked AND source = 'shop') AS shop,
+            COUNT(*) FILTER (WHERE picked AND source = 'event') AS event,
+            COUNT(*) FILTER (WHERE picked AND source = 'neow') AS neow,
+            COUNT(*) FILTER (WHERE picked AND source = 'other') AS other
+        FROM events
+        GROUP BY 1, 2
+    ),
+    counts AS (
+        SELECT
+            relic,
+            SUM(picks) AS picks,
+            SUM(victories) AS victories,
+            SUM(boss_offers) AS boss_offers,
+            SUM(boss_picks) AS boss_picks,
+            jsonb_build_object(
+                'starter', SUM(starter), 'combat', SUM(combat), 'boss', SUM(boss),
+                'shop', SUM(shop), 'event', SUM(event), 'neow', SUM(neow), 'other', SUM(other)
+            ) AS sources,
+            array_agg(character) FILTER (WHERE picks > 0) AS characters
+        FROM by_character
+        GROUP BY relic
+        HAVING SUM(picks) > 0
+    ),
+    deaths AS (
+        SELECT relic, COUNT(*) AS held_at_death
+        FROM held
+        WHERE NOT victory
+        GROUP BY relic
+    )
+    SELECT COALESCE(jsonb_agg(relic_counts), '[]'::JSONB)
+    FROM (
+        SELECT c.*, COALESCE(d.held_at_death, 0) AS held_at_death
+        FROM counts c
+        LEFT JOIN deaths d ON d.relic = c.relic
+    ) relic_counts
+$$;
+
+-- Encounter, damage and death counts per enemy (for /api/enemies)
+CREATE OR REPLACE FUNCTION enemy_stats(
+    p_character TEXT DEFAULT NULL,
+    p_start_ts BIGINT DEFAULT NULL,
+    p_end_ts BIGINT DEFAULT NULL,
+    p_ascension_level INTEGER DEFAULT NULL,
+    p_victory BOOLEAN DEFAULT NULL,
+    p_is_daily BOOLEAN DEFAULT NULL,
+    p_base_game_only BOOLEAN DEFAULT FALSE
+)
+RETURNS JSONB
+LANGUAGE sql STABLE AS $$
+    SELECT COALESCE(jsonb_agg(enemy_counts), '[]'::JSONB)
+    FROM (
+        SELECT
+            battle->>'enemies' AS enemy,
+            COUNT(*) AS encounters,
+            SUM(COALESCE((battle->>'damage')::NUMERIC, 0)) AS total_damage,
+            SUM(COALESCE((battle->>'turns')::NUMERIC, 0)) AS total_turns,
+            COUNT(*) FILTER (WHERE s.killed_by = battle->>'enemies') AS defeats_player,
+            COUNT(*) FILTER (WHERE s.victory) AS in_victories,
+            COUNT(*) FILTER (WHERE NOT s.victory) AS in_defeats
+        FROM filtered_runs(p_character, p_start_ts, p_end_ts, p_ascension_level, p_victory, p_is_daily, p_base_game_only) s,
+             jsonb_array_elements(s.damage_taken) battle
+        WHERE COALESCE(battle->>'enemies', '') <> ''
+        GROUP BY battle->>'enemies'
+    ) enemy_counts
+$$;
@@ -114,3 +114,42 @@ SELECT
     ROUND(AVG(score), 2) as avg_score
 FROM runs
 GROUP BY user_id, character;
+
+-- Compressed run archives (see run_archive.py)
+-- runs.raw_data holds only the fields analytics read; the complete .run
+-- file is stored here, zstd-compressed with a trained dictionary and base64
+-- encoded (smaller over PostgREST than bytea's hex encoding). Existing
+-- projects can run this section on its own.
+CREATE TABLE IF NOT EXISTS run_dictionaries (
+    id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+    dictionary TEXT NOT NULL, -- base64 zstd dictionary
+    sample_count INTEGER,
+    uploaded_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS run_archives (
+    id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+    run_identifier TEXT UNIQUE NOT NULL,
+    play_id TEXT NOT NULL,
+    dictionary_id UUID REFERENCES run_dictionaries(id), -- NULL: compressed without a dictionary
+    raw_size INTEGER, -- uncompressed JSON bytes
+    data TEXT NOT NULL, -- base64 zstd frame
+    uploaded_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_run_archives_play_id ON run_archives(play_id);
+
+ALTER TABLE run_dictionaries ENABLE ROW LEVEL SECURITY;
+ALTER TABLE run_archives ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Allow all operations on run dictionaries" ON run_dictionaries;
+CREATE POLICY "Allow all operations on run dictionaries" ON run_dictionaries
+    FOR ALL
+    USING (true)
+    WITH CHECK (true);
+
+DROP POLICY IF EXISTS "Allow all operations on run archives" ON run_archives;
+CREATE POLICY "Allow all operations on run archives" ON run_archives
+    FOR ALL
+    USING (true)
+    WITH CHECK (true);
@@ -0,0 +1,89 @@
+"""
+Card-card and card-relic co-occurrence across final decks
+Runs are the rows of two binary incidence matrices: C (run x card, from
+master_deck) and R (run x relic, from the final relic list). A single
+sparse product C^T [C | R | VC | VR], with V the diagonal victory matrix,
+gives the number of runs holding each pair and how many of them were won.
+Sums are cached per filter fingerprint along with the number of runs they
+cover; runs are only ever appended, so a larger index folds in just the
+rows added since.
+"""
+import numpy as np
+from scipy import sparse
+import metrics
+
+# Filter fingerprints whose sums an index keeps
+MAX_CACHED_SYNERGY = 32
+
+# Keys of the sums: pair matrices (card x card, card x relic) and per-relic totals
+PAIR_SUMS = ('card_card_runs', 'card_card_victories', 'card_relic_runs', 'card_relic_victories')
+RELIC_SUMS = ('relic_runs', 'relic_victories')
+
+
+def cooccurrence(cards, relics, victory):
+    """Sums (see PAIR_SUMS and RELIC_SUMS) for the runs in the rows of cards and relics"""
+    n_cards, n_relics = cards.shape[1], relics.shape[1]
+    won = sparse.diags(victory.astype(np.int32))
+    won_cards, won_relics = won @ cards, won @ relics
+    product = (cards.T @ sparse.hstack([cards, relics, won_cards, won_relics], format='csr')).tocsc()
+
+    bounds = np.cumsum([0, n_cards, n_relics, n_cards, n_relics])
+    blocks = [product[:, start:end].tocsr() for start, end in zip(bounds[:-1], bounds[1:])]
+    return {
+        'card_card_runs': blocks[0],
+        'card_card_victories': blocks[2],
+        'card_relic_runs': blocks[1],
+        'card_relic_victories': blocks[3],
+        'relic_runs': np.asarray(relics.sum(axis=0)).ravel(),
+        'relic_victories': np.asarray(won_relics.sum(axis=0)).ravel(),
+    }
+
+
+def resized(sums, n_cards, n_relics):
+    """sums padded to a (grown) card and relic vocabulary"""
+    shapes = {
+        'card_card_runs': (n_cards, n_cards), 'card_card_victories': (n_cards, n_cards),
+        'card_relic_runs': (n_cards, n_relics), 'card_relic_victories': (n_cards, n_relics)
+    }
+    result = {}
+    for name, value in sums.items():
+        if name in shapes:
+            value = value.tocoo()
+            result[name] = sparse.csr_matrix((value.data, (value.row, value.col)), shape=shapes[name])
+        else:
+            result[name] = np.pad(value, (0, n_relics - len(value)))
+    return result
+
+
+class SynergyStats:
+    """Co-occurrence sums per filter fingerprint, each with the number of runs it covers"""
+
+    def __init__(self):
+        self.sums = {}
+
+    def copy(self):
+        stats = SynergyStats()
+        stats.sums = dict(self.sums)
+        return stats
+
+    def get(self, fingerprint, n_runs, n_cards, n_relics, compute):
+        """
+        Sums over the first n_runs runs for fingerprint
+        compute(start) returns the sums over runs start..n_runs, and is only
+        asked for the runs the cached sums do not cover yet.
+        """
+        cached = self.sums.get(fingerprint)
+        metrics.cache_lookup('synergy', hit=cached is not None and cached[0] == n_runs)
+        if cached is not None and cached[0] == n_runs:
+            return cached[1]
+
+        if cached is None:
+            sums = compute(0)
+        else:
+            previous = resized(cached[1], n_cards, n_relics)
+            sums = {name: previous[name] + value for name, value in compute(cached[0]).items()}
+
+        if fingerprint not in self.sums and len(self.sums) >= MAX_CACHED_SYNERGY:
+            self.sums.pop(next(iter(self.sums)))
+        self.sums[fingerprint] = (n_runs, sums)
+        return sums
@@ -0,0 +1,124 @@
+"""
+Shared helpers and fixtures: the app served from hand-built runs in a
+FakeSupabaseClient. Tests run from backend/ (python -m pytest). Snapshots
+are disabled so every test builds its run index from its own runs.
+"""
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ['RUN_SNAPSHOT_DIR'] = ''
+
+import pytest
+import metrics
+from run_index import RunIndex, normalize_run
+
+# How long a test waits for other threads before failing
+TIMEOUT = 5
+
+
+def make_run(play_id, **fields):
+    """A minimal .run dict (an Ironclad loss on floor 1) with fields overridden"""
+    run = {
+        'play_id': play_id,
+        'seed_played': play_id,
+        'character_chosen': 'IRONCLAD',
+        'ascension_level': 0,
+        'is_daily': False,
+        'victory': False,
+        'floor_reached': 1,
+        'score': 10,
+        'seed_source_timestamp': 1600000000,
+        'master_deck': ['Strike_R', 'Defend_R', 'Bash'],
+        'relics': ['Burning Blood'],
+    }
+    run.update(fields)
+    return run
+
+
+def indexed(runs):
+    """Copies of runs as the run index holds them"""
+    return [normalize_run(dict(run)) for run in runs]
+
+
+def counter(name, **labels):
+    """Current value of a metrics counter"""
+    return metrics._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+
+def wait_for(condition):
+    """Poll condition until it holds (fails the test after TIMEOUT seconds)"""
+    deadline = time.monotonic() + TIMEOUT
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.001)
+
+
+def reset_app(app):
+    """Drop the worker's run index and cached responses, so the next request loads them from the current client"""
+    app._run_index = app._run_index_count = app._run_index_high_water_mark = app._snapshot_generation = None
+    app._result_cache.clear()
+
+
+@pytest.fixture
+def serve_runs():
+    """serve_runs(runs) points the app at a fake backend holding runs and returns a test client"""
+    import app
+    from fake_supabase import FakeSupabaseClient
+    from run_parser import parse_run_file
+    from supabase_client import set_supabase_client
+
+    def serve(runs):
+        client = FakeSupabaseClient()
+        client.insert_rows('runs', [parse_run_file(run) for run in runs])
+        set_supabase_client(client)
+        reset_app(app)
+        return app.app.test_client()
+
+    yield serve
+    set_supabase_client(None)
+    reset_app(app)
+
+
+# Query strings the endpoint tests run with, and the runs each one selects
+FILTER_CASES = {
+    'all': ('', lambda run: True),
+    'character': ('character=THE_SILENT', lambda run: run['character_chosen'] == 'THE_SILENT'),
+    'won': ('victory=true', lambda run: run['victory']),
+    'lost': ('victory=false', lambda run: not run['victory']),
+}
+
+
+@pytest.fixture(params=list(FILTER_CASES))
+def filter_case(request):
+    """(query, selected) for each of FILTER_CASES"""
+    return FILTER_CASES[request.param]
+
+
+def assert_endpoint_matches(client, path, runs, filter_case, oracle, normalize=lambda result: result):
+    """
+    Response of path, filtered by filter_case, against oracle(the runs it
+    selects), both passed through normalize (e.g. to sort rows that tie).
+    No selected runs, or an oracle returning None, expects a 404.
+    """
+    query, selected = filter_case
+    chosen = [run for run in runs if selected(run)]
+    expected = oracle(chosen) if chosen else None
+    response = client.get(f"{path}{'&' if '?' in path else '?'}{query}" if query else path)
+    if expected is None:
+        assert response.status_code == 404
+        return
+    assert response.status_code == 200
+    assert normalize(response.get_json()) == normalize(expected)
+
+
+def assert_extends_like_one_build(runs, table):
+    """The named RunIndex table built over several extends holds the same arrays as one built at once"""
+    runs = indexed(runs)
+    third = len(runs) // 3
+    extended = getattr(RunIndex(runs[:third]).extended(runs[third:2 * third]).extended(runs[2 * third:]), table)
+    whole = getattr(RunIndex(runs), table)
+    for name in whole.ARRAYS:
+        assert getattr(extended, name).tolist() == getattr(whole, name).tolist(), name
@@ -0,0 +1,92 @@
+import itertools
+import threading
+import time
+from urllib.parse import parse_qsl
+from flask import Flask
+from conftest import TIMEOUT, counter, make_run, wait_for
+from cache_warmer import CacheWarmer, filter_cube
+
+
+def test_filter_cube_matches_brute_force():
+    characters = ['THE_SILENT', 'IRONCLAD']
+    queries = filter_cube(characters)
+
+    expected = set()
+    for character, is_daily, ignore_downfall in itertools.product(['', *characters], ['', 'false', 'true'], ['true', 'false']):
+        params = {'character': character, 'is_daily': is_daily, 'ignore_downfall': ignore_downfall}
+        expected.add(frozenset((name, value) for name, value in params.items() if value))
+
+    assert len(queries) == len(expected)
+    assert {frozenset(parse_qsl(query)) for query in queries} == expected
+    assert queries[0] == 'ignore_downfall=true'
+
+
+def blocking_app():
+    """Flask app whose /slow waits for release; calls counts requests per path"""
+    app = Flask(__name__)
+    release = threading.Event()
+    calls = {'slow': 0, 'fast': 0}
+
+    @app.route('/slow')
+    def slow():
+        calls['slow'] += 1
+        release.wait(TIMEOUT)
+        return 'slow'
+
+    @app.route('/fast')
+    def fast():
+        calls['fast'] += 1
+        return 'fast'
+
+    return app, release, calls
+
+
+def test_start_while_warming_queues_one_pass():
+    app, release, calls = blocking_app()
+    warmer = CacheWarmer(app, ['/slow'])
+
+    warmer.start()
+    wait_for(lambda: calls['slow'] == 1)
+    warmer.start()
+    warmer.start()
+    release.set()
+    wait_for(lambda: not warmer._running)
+
+    assert calls['slow'] == 2
+
+
+def test_waits_for_interactive_requests():
+    app, release, calls = blocking_app()
+    warmer = CacheWarmer(app, ['/fast'])
+    interactive = threading.Thread(target=lambda: app.test_client().get('/slow'))
+    interactive.start()
+    wait_for(lambda: calls['slow'] == 1)
+
+    warmer.start()
+    time.sleep(0.2)
+    assert calls['fast'] == 0
+
+    release.set()
+    interactive.join(TIMEOUT)
+    wait_for(lambda: not warmer._running)
+    assert calls['fast'] == 1
+    # The warmer's own requests are not interactive
+    assert warmer._active == 0
+
+
+def test_warming_fills_the_result_cache(serve_runs, monkeypatch):
+    import app
+
+    client = serve_runs([make_run('a'), make_run('b', victory=True, character_chosen='THE_SILENT')])
+    paths = ['/api/stats', '/api/stats?character=THE_SILENT', '/api/relics?ignore_downfall=true']
+    monkeypatch.setattr(app._cache_warmer, 'paths', paths)
+
+    app._cache_warmer.start()
+    wait_for(lambda: not app._cache_warmer._running)
+
+    hits = counter('sts_cache_requests_total', cache='results', result='hit')
+    warmed = {path: client.get(path).get_data() for path in paths}
+    assert counter('sts_cache_requests_total', cache='results', result='hit') == hits + len(paths)
+
+    app._result_cache.clear()
+    assert {path: client.get(path).get_data() for path in paths} == warmed
@@ -0,0 +1,35 @@
+import threading
+import numpy as np
+from conftest import TIMEOUT
+import confidence
+from result_cache import ENTRY_OVERHEAD_BYTES, ResultCache
+
+THREADS = 8
+ROUNDS = 200
+
+
+def test_cached_intervals_under_concurrent_eviction(monkeypatch):
+    # Room for a few entries only, so threads keep evicting each other's
+    entry_bytes = ENTRY_OVERHEAD_BYTES + 32
+    monkeypatch.setattr(confidence, '_interval_cache', ResultCache('test_intervals', 4 * entry_bytes, max_entry_bytes=entry_bytes))
+    counts = {'win_rate': (np.array([3, 5]), np.array([10, 10]))}
+    expected = confidence.rate_intervals(*counts['win_rate'], 'wilson')
+    errors = []
+
+    def work(i):
+        try:
+            for n in range(ROUNDS):
+                intervals = confidence.cached_rate_intervals('test', (i, n % 7), 1, 'wilson', counts)
+                assert all(np.array_equal(a, b) for a, b in zip(intervals['win_rate']['wilson'], expected['wilson']))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(TIMEOUT)
+
+    assert errors == []
+    assert len(confidence._interval_cache._entries) == 4
+    assert confidence._interval_cache.bytes <= confidence._interval_cache.max_bytes
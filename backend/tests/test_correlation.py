@@ -0,0 +1,29 @@
+import json
+import pytest
+from conftest import make_run
+
+
+def strict_json(response):
+    """Body parsed as standard JSON (no NaN or Infinity)"""
+    def reject(constant):
+        raise ValueError(f'{constant} is not JSON')
+    return json.loads(response.get_data(as_text=True), parse_constant=reject)
+
+
+@pytest.mark.parametrize('path', ['/api/correlation', '/api/correlation/top'])
+def test_constant_features_are_null(serve_runs, path):
+    # Every run a loss: victory is constant, so its correlations are undefined
+    client = serve_runs([make_run(str(i), floor_reached=i + 1, score=10 * i) for i in range(6)])
+    response = client.get(path)
+    assert response.status_code == 200
+    result = strict_json(response)
+
+    if path == '/api/correlation':
+        victory = result['features'].index('victory')
+        for name in ('matrix', 'p_values', 'ci_low', 'ci_high'):
+            assert all(value is None for value in result[name][victory])
+        floor = result['features'].index('floor_reached')
+        assert result['matrix'][floor][floor] == pytest.approx(1)
+    else:
+        assert result['victory'] == {'positive': [], 'negative': []}
+        assert all(row['correlation'] is not None for rows in result['floor_reached'].values() for row in rows)
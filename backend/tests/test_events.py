@@ -0,0 +1,167 @@
+import pytest
+from conftest import assert_endpoint_matches, assert_extends_like_one_build, make_run
+from run_index import RunIndex, normalize_run
+
+
+def event(name, choice, floor=5, **outcome):
+    return {'event_name': name, 'player_choice': choice, 'floor': floor, **outcome}
+
+
+RUNS = [
+    make_run('1', victory=True, neow_bonus='BOSS_RELIC', neow_cost='NONE', event_choices=[
+        event('Big Fish', 'Banana', damage_healed=10),
+        event('Golden Idol', 'Take', floor=8, damage_taken=12, relics_obtained=['Golden Idol']),
+    ]),
+    make_run('2', victory=False, neow_bonus='HUNDRED_GOLD', neow_cost='NONE', event_choices=[
+        event('Big Fish', 'Donut', max_hp_gain=5),
+        event('Big Fish', 'Banana', floor=20, damage_healed=4),
+    ]),
+    make_run('3', victory=True, neow_bonus='HUNDRED_GOLD', neow_cost=None, event_choices=[
+        event('Golden Idol', 'Ignore'),
+    ]),
+    make_run('4', victory=False, character_chosen='THE_SILENT', neow_bonus='THREE_CARDS', neow_cost='TEN_PERCENT_HP_LOSS', event_choices=[
+        event('Big Fish', 'Box', relics_obtained=['Anchor'], cards_obtained=['Regret']),
+        event('Wheel of Change', 'Gold', gold_gain=100),
+    ]),
+    make_run('5', victory=True, character_chosen='THE_SILENT', neow_bonus='BOSS_RELIC', neow_cost='NONE', event_choices=[
+        event('Golden Idol', 'Take', damage_taken=5, gold_loss=20, relics_obtained=['Golden Idol']),
+    ]),
+    make_run('6', victory=False),
+]
+
+
+def brute_force_counts(runs, key):
+    """{key(entry): (rows, victories, {character: (rows, victories)})} over (entry, run) pairs"""
+    counts = {}
+    for entry, run in ((entry, run) for run in runs for entry in key(run)):
+        rows, victories, characters = counts.get(entry, (0, 0, {}))
+        character_rows, character_victories = characters.get(run['character_chosen'], (0, 0))
+        characters = {**characters, run['character_chosen']: (character_rows + 1, character_victories + run['victory'])}
+        counts[entry] = (rows + 1, victories + run['victory'], characters)
+    return counts
+
+
+def summary(rows, victories, characters, base_rows, base_victories, base_characters):
+    """Expected choice_summary of a choice against its baseline"""
+    win_rate = victories / rows * 100
+    return {
+        'count': rows,
+        'frequency': pytest.approx(rows / base_rows * 100),
+        'win_rate': pytest.approx(win_rate),
+        'win_rate_delta': pytest.approx(win_rate - base_victories / base_rows * 100),
+        'characters': [
+            {
+                'character': character,
+                'count': character_rows,
+                'win_rate': pytest.approx(character_victories / character_rows * 100),
+                'win_rate_delta': pytest.approx(
+                    character_victories / character_rows * 100 - base_characters[character][1] / base_characters[character][0] * 100
+                )
+            }
+            for character, (character_rows, character_victories) in characters.items()
+        ]
+    }
+
+
+def outcome(entry):
+    return {
+        'hp_delta': entry.get('damage_healed', 0) - entry.get('damage_taken', 0),
+        'gold_delta': entry.get('gold_gain', 0) - entry.get('gold_loss', 0),
+        'max_hp_delta': entry.get('max_hp_gain', 0) - entry.get('max_hp_loss', 0),
+        'cards_gained': len(entry.get('cards_obtained', [])),
+        'relics_gained': len(entry.get('relics_obtained', []))
+    }
+
+
+def brute_events(runs):
+    """/api/events of runs"""
+    events = brute_force_counts(runs, lambda run: [entry['event_name'] for entry in run.get('event_choices', [])])
+    choices = brute_force_counts(runs, lambda run: [(entry['event_name'], entry['player_choice']) for entry in run.get('event_choices', [])])
+    totals = {}
+    for run in runs:
+        for entry in run.get('event_choices', []):
+            total = totals.setdefault((entry['event_name'], entry['player_choice']), dict.fromkeys(outcome(entry), 0))
+            for name, value in outcome(entry).items():
+                total[name] += value
+
+    result = []
+    for name, (rows, victories, characters) in events.items():
+        result.append({'event': name, 'encounters': rows, 'win_rate': pytest.approx(victories / rows * 100), 'choices': []})
+        for (event_name, choice), (choice_rows, choice_victories, choice_characters) in choices.items():
+            if event_name != name:
+                continue
+            expected = summary(choice_rows, choice_victories, choice_characters, rows, victories, characters)
+            expected['choice'] = choice
+            for outcome_name, total in totals[event_name, choice].items():
+                expected[f'avg_{outcome_name}'] = pytest.approx(total / choice_rows)
+            result[-1]['choices'].append(expected)
+    return result
+
+
+def brute_neow(runs):
+    """/api/neow of runs, None if none chose a bonus"""
+    chosen = [run for run in runs if run.get('neow_bonus')]
+    if not chosen:
+        return None
+    base = brute_force_counts(chosen, lambda run: [None])[None]
+    result = {'runs': base[0], 'win_rate': pytest.approx(base[1] / base[0] * 100)}
+    for kind, key, value in (('bonuses', 'bonus', lambda run: run['neow_bonus']),
+                             ('costs', 'cost', lambda run: run.get('neow_cost') or 'NONE')):
+        result[kind] = []
+        for label, counts in brute_force_counts(chosen, lambda run: [value(run)]).items():
+            result[kind].append({**summary(*counts, *base), key: label})
+    return result
+
+
+def in_any_order(summaries, key):
+    """summaries sorted by key, with their characters sorted, so ties in count compare in any order"""
+    return sorted(({**item, 'characters': sorted(item['characters'], key=lambda x: x['character'])} for item in summaries),
+                  key=lambda x: x[key])
+
+
+def events_in_any_order(result):
+    return sorted(({**entry, 'choices': in_any_order(entry['choices'], 'choice')} for entry in result), key=lambda x: x['event'])
+
+
+def neow_in_any_order(result):
+    return dict(result, bonuses=in_any_order(result['bonuses'], 'bonus'), costs=in_any_order(result['costs'], 'cost'))
+
+
+def test_extended_table_matches_one_built_at_once():
+    assert_extends_like_one_build(RUNS, 'events')
+    assert_extends_like_one_build(RUNS, 'neow')
+
+
+def test_event_table_keeps_large_outcomes():
+    run = make_run('1', event_choices=[
+        event('Wheel of Change', 'Gold', gold_gain=50000, damage_taken=40000, cards_obtained=['Strike_R'] * 200),
+    ])
+    events = RunIndex([normalize_run(run)]).events
+    assert events.gold_delta.tolist() == [50000]
+    assert events.hp_delta.tolist() == [-40000]
+    assert events.cards_gained.tolist() == [200]
+
+
+def test_events_endpoint_matches_brute_force(serve_runs, filter_case):
+    assert_endpoint_matches(serve_runs(RUNS), '/api/events', RUNS, filter_case, brute_events, events_in_any_order)
+
+
+def test_neow_endpoint_matches_brute_force(serve_runs, filter_case):
+    assert_endpoint_matches(serve_runs(RUNS), '/api/neow', RUNS, filter_case, brute_neow, neow_in_any_order)
+
+
+def test_endpoints_sort_by_count(serve_runs):
+    client = serve_runs(RUNS)
+    events = client.get('/api/events').get_json()
+    assert [entry['encounters'] for entry in events] == sorted((entry['encounters'] for entry in events), reverse=True)
+    for entry in events:
+        assert [choice['count'] for choice in entry['choices']] == sorted((choice['count'] for choice in entry['choices']), reverse=True)
+
+    neow = client.get('/api/neow').get_json()
+    for kind in ('bonuses', 'costs'):
+        assert [item['count'] for item in neow[kind]] == sorted((item['count'] for item in neow[kind]), reverse=True)
+
+
+def test_neow_endpoint_without_choices(serve_runs):
+    client = serve_runs([make_run('1'), make_run('2', neow_bonus='BOSS_RELIC', character_chosen='THE_SILENT')])
+    assert client.get('/api/neow?character=IRONCLAD').status_code == 404
@@ -0,0 +1,61 @@
+import threading
+from conftest import TIMEOUT, indexed, make_run
+import index_snapshot
+from run_index import RunIndex
+
+WRITERS = 3
+ROUNDS = 40
+
+
+def test_concurrent_writers_leave_a_loadable_current(tmp_path):
+    index = RunIndex(indexed([make_run(str(i), victory=i % 2 == 0) for i in range(5)]))
+    errors = []
+
+    def write():
+        try:
+            for _ in range(ROUNDS):
+                index_snapshot.save_snapshot(tmp_path, index, '2024-01-01T00:00:00+00:00')
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write) for _ in range(WRITERS)]
+    for thread in threads:
+        thread.start()
+    # Between writes, CURRENT names a complete generation that was not deleted
+    while any(thread.is_alive() for thread in threads):
+        with index_snapshot.snapshot_lock(tmp_path):
+            if index_snapshot.current_generation(tmp_path) is not None:
+                assert len(index_snapshot.load_snapshot(tmp_path)[0]) == len(index)
+    for thread in threads:
+        thread.join(TIMEOUT)
+
+    assert errors == []
+    assert len(index_snapshot.load_snapshot(tmp_path)[0]) == len(index)
+    # Only the current generation and the one before it are left
+    generations = sorted(path.name for path in tmp_path.iterdir() if index_snapshot.generation_order(path.name))
+    assert len(generations) == 2 and generations[-1] == index_snapshot.current_generation(tmp_path)
+
+
+def test_lock_can_be_taken_again_by_its_holder(tmp_path):
+    index = RunIndex(indexed([make_run('a')]))
+    with index_snapshot.snapshot_lock(tmp_path):
+        generation = index_snapshot.save_snapshot(tmp_path, index, '2024-01-01T00:00:00+00:00')
+    assert index_snapshot.current_generation(tmp_path) == generation
+
+
+def test_failed_load_is_retried(tmp_path, monkeypatch, serve_runs):
+    import app
+
+    serve_runs([])
+    index = RunIndex(indexed([make_run('a')]))
+    generation = index_snapshot.save_snapshot(tmp_path, index, '2024-01-01T00:00:00+00:00')
+    monkeypatch.setattr(app, 'SNAPSHOT_DIR', str(tmp_path))
+    # The first load fails (e.g. the files are still being copied)
+    load, failures = index_snapshot.load_snapshot, [None]
+    monkeypatch.setattr(index_snapshot, 'load_snapshot', lambda directory: failures.pop() if failures else load(directory))
+
+    with app._run_index_lock:
+        assert not app.adopt_snapshot()
+        assert app.adopt_snapshot()
+    assert app._snapshot_generation == generation
+    assert len(app._run_index) == 1
@@ -0,0 +1,132 @@
+import pytest
+from conftest import assert_endpoint_matches, assert_extends_like_one_build, indexed, make_run
+from run_index import ACTS, FLOORS_PER_ACT, ROOM_NAMES, ROOM_SYMBOLS, RunIndex, normalize_run
+
+ACT_1 = ['M', '?', 'M', 'E', '$', 'R', 'M', '?', 'T', 'M', 'E', 'R', '?', 'M', 'R', 'B', None]
+
+RUNS = [
+    make_run('1', path_per_floor=['M', '?', 'M', 'E'], victory=False),
+    make_run('2', path_per_floor=['M', '?', '$'], victory=True),
+    make_run('3', path_per_floor=['M', '?', 'M', 'M', 'R'], victory=True),
+    make_run('4', path_per_floor=['?', 'M'], character_chosen='THE_SILENT', victory=False),
+    make_run('5', path_per_floor=ACT_1 + ['M', 'E', '?', 'R', 'E'], victory=True),
+    make_run('6', path_per_floor=ACT_1 + ['M', 'M'], victory=False),
+    make_run('7', path_per_floor=ACT_1, character_chosen='THE_SILENT', victory=True),
+    make_run('8', path_per_floor=[], victory=False),
+    make_run('9', path_per_floor=['M'], victory=True),
+    make_run('10', path_per_floor=ACT_1 * 2 + ACT_1 + ['E', 'M'], victory=True),
+]
+
+
+def symbols(run):
+    return ['-' if room is None else room for room in run['path_per_floor']]
+
+
+def brute_act_counts(run):
+    counts = [[0] * len(ROOM_SYMBOLS) for _ in range(ACTS)]
+    for floor, room in enumerate(symbols(run)):
+        counts[min(floor // FLOORS_PER_ACT, ACTS - 1)][ROOM_SYMBOLS.index(room)] += 1
+    return counts
+
+
+def all_prefixes(runs):
+    prefixes = {''}
+    for run in runs:
+        path = ''.join(symbols(run))
+        prefixes.update(path[:n] for n in range(1, len(path) + 1))
+    return sorted(prefixes)
+
+
+def brute_paths(runs):
+    """/api/paths of runs"""
+    acts = []
+    for act in range(ACTS):
+        reached = [run for run in runs if len(run['path_per_floor']) > act * FLOORS_PER_ACT]
+        if not reached:
+            continue
+        counts = [brute_act_counts(run)[act] for run in reached]
+        elites = {}
+        for run, count in zip(reached, counts):
+            totals = elites.setdefault(count[ROOM_SYMBOLS.index('E')], [0, 0])
+            totals[0] += 1
+            totals[1] += run['victory']
+        acts.append({
+            'act': act + 1,
+            'runs': len(reached),
+            'rooms': {name: pytest.approx(sum(count[i] for count in counts) / len(reached)) for i, name in enumerate(ROOM_NAMES) if i},
+            'elites': [
+                {'elites': n, 'runs': total, 'victories': won, 'win_rate': pytest.approx(won / total * 100)}
+                for n, (total, won) in sorted(elites.items())
+            ]
+        })
+    return {'runs': len(runs), 'acts': acts}
+
+
+def brute_prefix(runs, prefix):
+    """/api/paths/prefix of runs, None if no run starts with prefix"""
+    matching = [run for run in runs if ''.join(symbols(run)).startswith(prefix)]
+    if not matching:
+        return None
+    won = [run['victory'] for run in matching]
+    following = {}
+    for run in matching:
+        path = symbols(run)
+        if len(path) > len(prefix):
+            following.setdefault(path[len(prefix)], []).append(run['victory'])
+    return {
+        'prefix': prefix,
+        'runs': len(matching),
+        'victories': sum(won),
+        'win_rate': pytest.approx(sum(won) / len(won) * 100),
+        'ended': len(matching) - sum(len(next_won) for next_won in following.values()),
+        'next': [
+            {'room': room, 'runs': len(next_won), 'victories': sum(next_won), 'win_rate': pytest.approx(sum(next_won) / len(next_won) * 100)}
+            for room, next_won in following.items()
+        ]
+    }
+
+
+def next_rooms_in_any_order(result):
+    """Rooms taken by as many runs may come in either order"""
+    return dict(result, next=sorted(result['next'], key=lambda x: (-x['runs'], x['room'])))
+
+
+def test_table_matches_brute_force():
+    runs = indexed(RUNS)
+    paths = RunIndex(runs).paths
+
+    assert paths.lengths().tolist() == [len(run['path_per_floor']) for run in runs]
+    assert paths.act_counts.tolist() == [brute_act_counts(run) for run in runs]
+
+    for prefix in all_prefixes(runs) + ['MMMMM', 'B']:
+        encoded = paths.encode(prefix)
+        run_ids = paths.prefix_runs(encoded)
+        expected = [i for i, run in enumerate(runs) if ''.join(symbols(run)).startswith(prefix)]
+        assert sorted(run_ids.tolist()) == expected
+
+        following = [symbols(runs[i])[len(prefix)] if len(runs[i]['path_per_floor']) > len(prefix) else None for i in run_ids]
+        assert [None if room < 0 else paths.room_types.names[room] for room in paths.next_rooms(run_ids, len(prefix))] == following
+
+
+def test_extended_table_matches_one_built_at_once():
+    assert_extends_like_one_build(RUNS, 'paths')
+
+
+def test_long_runs_do_not_overflow_act_counts():
+    run = normalize_run(make_run('endless', path_per_floor=['M'] * 400))
+    paths = RunIndex([run]).paths
+    assert paths.act_counts[0, ACTS - 1, ROOM_SYMBOLS.index('M')] == 400 - (ACTS - 1) * FLOORS_PER_ACT
+
+
+def test_paths_endpoint_matches_brute_force(serve_runs, filter_case):
+    assert_endpoint_matches(serve_runs(RUNS), '/api/paths', RUNS, filter_case, brute_paths)
+
+
+@pytest.mark.parametrize('prefix', all_prefixes(RUNS) + ['BBB'])
+def test_prefix_endpoint_matches_brute_force(serve_runs, filter_case, prefix):
+    assert_endpoint_matches(serve_runs(RUNS), f'/api/paths/prefix?prefix={prefix}', RUNS, filter_case,
+                            lambda runs: brute_prefix(runs, prefix), next_rooms_in_any_order)
+
+
+def test_prefix_endpoint_errors(serve_runs):
+    assert serve_runs(RUNS).get('/api/paths/prefix?prefix=MX').status_code == 400
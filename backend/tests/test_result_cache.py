@@ -0,0 +1,85 @@
+import random
+from collections import OrderedDict
+from conftest import counter, make_run
+from result_cache import ENTRY_OVERHEAD_BYTES, ResultCache
+
+
+def test_matches_brute_force_lru():
+    cache = ResultCache('test_lru', max_bytes=20 * ENTRY_OVERHEAD_BYTES, max_entry_bytes=4 * ENTRY_OVERHEAD_BYTES)
+    expected = OrderedDict()
+    rng = random.Random(0)
+
+    for _ in range(2000):
+        key = rng.randrange(40)
+        if rng.random() < 0.5:
+            value = cache.get(key)
+            assert value == (expected[key][0] if key in expected else None)
+            if key in expected:
+                expected.move_to_end(key)
+        else:
+            size = rng.randrange(4 * ENTRY_OVERHEAD_BYTES)
+            stored = cache.put(key, (key, size), size)
+            assert stored == (size + ENTRY_OVERHEAD_BYTES <= cache.max_entry_bytes)
+            if stored:
+                expected.pop(key, None)
+                expected[key] = ((key, size), size + ENTRY_OVERHEAD_BYTES)
+                while sum(held for _, held in expected.values()) > cache.max_bytes:
+                    expected.popitem(last=False)
+
+        assert list(cache._entries) == list(expected)
+        assert cache.bytes == sum(held for _, held in expected.values())
+        assert cache.bytes <= cache.max_bytes
+
+
+def test_too_large_entry_is_not_cached():
+    cache = ResultCache('test_large', max_bytes=8000, max_entry_bytes=2000)
+    assert cache.put('small', 'value', 100)
+    assert not cache.put('large', 'value', 2000)
+    assert cache.get('large') is None
+    assert cache.get('small') == 'value'
+    assert cache.bytes == 100 + ENTRY_OVERHEAD_BYTES
+
+
+def test_clear():
+    cache = ResultCache('test_clear', max_bytes=8000)
+    cache.put('key', 'value', 10)
+    cache.clear()
+    assert cache.get('key') is None
+    assert cache.bytes == 0
+
+
+def test_cached_response_matches_uncached(serve_runs):
+    import app
+
+    runs = [make_run(str(i), victory=i % 3 == 0, floor_reached=i, character_chosen=('IRONCLAD', 'THE_SILENT')[i % 2]) for i in range(12)]
+    client = serve_runs(runs)
+    paths = ['/api/stats', '/api/stats?character=THE_SILENT', '/api/relics', '/api/cards?ci=wilson']
+
+    computed = {path: client.get(path).get_data() for path in paths}
+    hits = counter('sts_cache_requests_total', cache='results', result='hit')
+    for path in paths:
+        assert client.get(path).get_data() == computed[path]
+    assert counter('sts_cache_requests_total', cache='results', result='hit') == hits + len(paths)
+
+    # Same parameters in another order and with empty ones share the entry
+    assert client.get('/api/stats?is_daily=&character=THE_SILENT').get_data() == computed['/api/stats?character=THE_SILENT']
+    assert counter('sts_cache_requests_total', cache='results', result='hit') == hits + len(paths) + 1
+
+    app._result_cache.clear()
+    for path in paths:
+        assert client.get(path).get_data() == computed[path]
+
+
+def test_added_runs_invalidate_cached_responses(serve_runs):
+    import app
+    from run_parser import parse_run_file
+    from supabase_client import get_supabase_client
+
+    client = serve_runs([make_run('a')])
+    before = client.get('/api/stats').get_json()
+    # As an upload job does: insert the run, then index it
+    get_supabase_client().insert_rows('runs', [parse_run_file(make_run('b', victory=True))])
+    app.add_runs_to_index([make_run('b', victory=True)])
+    after = client.get('/api/stats').get_json()
+    assert after != before
+    assert after == serve_runs([make_run('a'), make_run('b', victory=True)]).get('/api/stats').get_json()
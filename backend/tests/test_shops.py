@@ -0,0 +1,162 @@
+import pytest
+from conftest import assert_endpoint_matches, assert_extends_like_one_build, indexed, make_run
+from run_index import ACTS, FLOORS_PER_ACT, STARTING_GOLD, RunIndex, normalize_run
+
+RUNS = [
+    make_run('1', victory=True, floor_reached=6,
+             path_per_floor=['M', '?', '$', 'M', '$', 'R'], gold_per_floor=[110, 125, 40, 60, 10, 10],
+             items_purchased=['Inflame', 'Vajra', 'Shockwave'], item_purchase_floors=[3, 3, 5],
+             items_purged=['Strike_R'], items_purged_floors=[5]),
+    make_run('2', victory=False, floor_reached=4,
+             path_per_floor=['M', '$', 'M', 'E'], gold_per_floor=[120, 120, 135, 160]),
+    make_run('3', victory=True, floor_reached=22, character_chosen='THE_SILENT',
+             path_per_floor=['M'] * 17 + ['$', 'M', 'M', '$', 'M'],
+             gold_per_floor=list(range(110, 280, 10)) + [100, 120, 140, 70, 90],
+             items_purchased=['Vajra', 'Footwork'], item_purchase_floors=[18, 21],
+             items_purged=['Defend_G'], items_purged_floors=[21]),
+    make_run('4', victory=False, floor_reached=3,
+             path_per_floor=['M', '?', 'M'], gold_per_floor=[115, 80, 95],
+             # An event purge (not in a shop) and a purchase with no floor recorded
+             items_purged=['Strike_R'], items_purged_floors=[2],
+             items_purchased=['Inflame'], item_purchase_floors=[]),
+    make_run('5', victory=False, floor_reached=2, path_per_floor=['M', 'M'], gold_per_floor=[105, 112]),
+    make_run('6', victory=True, floor_reached=5,
+             path_per_floor=['M', '$', 'M', '$', 'M'], gold_per_floor=[130, 0, 30, 30, 45],
+             items_purchased=['Inflame', 'Inflame', 'Vajra'], item_purchase_floors=[2, 4, 2]),
+]
+
+
+def brute_visits(run):
+    """(floor, gold before, spent, purchases, purges) of every shop visit of run"""
+    gold = [STARTING_GOLD] + run.get('gold_per_floor', [])
+    shop_floors = {floor for floor, room in enumerate(run.get('path_per_floor', []), start=1) if room == '$'}
+    purchase_floors = run.get('item_purchase_floors', [])
+    bought = [purchase_floors[i] if i < len(purchase_floors) else 0 for i in range(len(run.get('items_purchased', [])))]
+    visits = []
+    for floor in sorted((shop_floors | set(bought)) - {0}):
+        before = gold[floor - 1] if floor - 1 < len(gold) else gold[-1]
+        after = gold[floor] if floor < len(gold) else before
+        purges = sum(1 for purged in run.get('items_purged_floors', []) if purged == floor and floor in shop_floors)
+        visits.append((floor, before, max(before - after, 0), bought.count(floor), purges))
+    return visits
+
+
+def brute_earned(run):
+    gold = [STARTING_GOLD] + run.get('gold_per_floor', [])
+    return STARTING_GOLD + sum(max(after - before, 0) for before, after in zip(gold, gold[1:]))
+
+
+def mean(values):
+    return sum(values) / len(values)
+
+
+def brute_shops(runs, min_runs):
+    """/api/shops of runs"""
+    visits = [(run, visit) for run in runs for visit in brute_visits(run)]
+    acts = []
+    for act in range(ACTS):
+        in_act = [visit for run, visit in visits if min((visit[0] - 1) // FLOORS_PER_ACT, ACTS - 1) == act]
+        if in_act:
+            acts.append({
+                'act': act + 1,
+                'visits': len(in_act),
+                'gold_spent': sum(visit[2] for visit in in_act),
+                'avg_spent_per_visit': pytest.approx(mean([visit[2] for visit in in_act])),
+                'avg_gold_before': pytest.approx(mean([visit[1] for visit in in_act])),
+                'purchases': sum(visit[3] for visit in in_act),
+                'purges': sum(visit[4] for visit in in_act)
+            })
+
+    visited = [run for run in runs if brute_visits(run) or run.get('items_purchased')]
+    baseline = mean([run['victory'] for run in visited]) * 100 if visited else None
+    items = []
+    for item in sorted({item for run in runs for item in run.get('items_purchased', [])}):
+        buyers = [run for run in runs if item in run.get('items_purchased', [])]
+        floors = [
+            (run.get('item_purchase_floors', []) + [0] * len(run['items_purchased']))[i]
+            for run in buyers for i, bought in enumerate(run['items_purchased']) if bought == item
+        ]
+        if len(buyers) >= min_runs:
+            win_rate = mean([run['victory'] for run in buyers]) * 100
+            items.append({
+                'item': item,
+                'purchases': len(floors),
+                'runs': len(buyers),
+                'win_rate': pytest.approx(win_rate),
+                'win_rate_lift': pytest.approx(win_rate - baseline),
+                'avg_floor': pytest.approx(mean(floors))
+            })
+
+    spending = []
+    for b in range(4):
+        in_bin = [
+            run for run in runs
+            if min(int(sum(visit[2] for visit in brute_visits(run)) / max(brute_earned(run), 1) * 4), 3) == b
+        ]
+        if in_bin:
+            spending.append({
+                'spent_share': f'{b * 25}-{(b + 1) * 25}%',
+                'runs': len(in_bin),
+                'win_rate': pytest.approx(mean([run['victory'] for run in in_bin]) * 100),
+                'avg_floor_reached': pytest.approx(mean([run['floor_reached'] for run in in_bin])),
+                'avg_gold_spent': pytest.approx(mean([sum(visit[2] for visit in brute_visits(run)) for run in in_bin])),
+                'avg_gold_earned': pytest.approx(mean([brute_earned(run) for run in in_bin]))
+            })
+
+    return {
+        'runs': len(runs),
+        'runs_visiting_shops': len(visited),
+        'win_rate_visiting_shops': pytest.approx(baseline) if baseline is not None else None,
+        'acts': acts,
+        'items': items,
+        'spending': spending
+    }
+
+
+def items_in_any_order(result):
+    """Items bought as often may come in either order"""
+    return dict(result, items=sorted(result['items'], key=lambda x: x['item']))
+
+
+def test_table_matches_brute_force():
+    runs = indexed(RUNS)
+    shops = RunIndex(runs).shops
+
+    assert shops.earned.tolist() == [brute_earned(run) for run in runs]
+    visits = list(zip(shops.visit_run.tolist(), shops.visit_floor.tolist(), shops.visit_gold.tolist(),
+                      shops.visit_spent.tolist(), shops.visit_purchases.tolist(), shops.visit_purges.tolist()))
+    assert visits == [(run_id, *visit) for run_id, run in enumerate(runs) for visit in brute_visits(run)]
+
+    purchases = list(zip(shops.purchase_run.tolist(), shops.purchase_floor.tolist(), [shops.items.names[i] for i in shops.purchase_item]))
+    expected = []
+    for run_id, run in enumerate(runs):
+        floors = run.get('item_purchase_floors', [])
+        expected += [(run_id, floors[i] if i < len(floors) else 0, item) for i, item in enumerate(run.get('items_purchased', []))]
+    assert purchases == expected
+
+
+def test_extended_table_matches_one_built_at_once():
+    assert_extends_like_one_build(RUNS, 'shops')
+
+
+def test_many_purchases_in_one_visit():
+    run = normalize_run(make_run('hoarder', path_per_floor=['$'], gold_per_floor=[0],
+                                 items_purchased=['Strike_R'] * 300, item_purchase_floors=[1] * 300))
+    assert RunIndex([run]).shops.visit_purchases.tolist() == [300]
+
+
+@pytest.mark.parametrize('query, min_runs', [('', 5), ('?min_runs=1', 1), ('?min_runs=2', 2)])
+def test_endpoint_matches_brute_force(serve_runs, filter_case, query, min_runs):
+    assert_endpoint_matches(serve_runs(RUNS), '/api/shops' + query, RUNS, filter_case,
+                            lambda runs: brute_shops(runs, min_runs), items_in_any_order)
+
+
+def test_items_sort_by_purchases(serve_runs):
+    items = serve_runs(RUNS).get('/api/shops?min_runs=1').get_json()['items']
+    assert [item['purchases'] for item in items] == sorted((item['purchases'] for item in items), reverse=True)
+
+
+def test_endpoint_errors(serve_runs):
+    client = serve_runs(RUNS)
+    assert client.get('/api/shops?min_runs=many').status_code == 400
+    assert client.get('/api/shops?character=WATCHER').status_code == 404
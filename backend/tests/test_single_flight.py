@@ -0,0 +1,170 @@
+import threading
+import pytest
+from conftest import TIMEOUT, counter, make_run, wait_for
+from single_flight import SingleFlight
+
+THREADS = 8
+
+
+def run_threads(target, count):
+    """Start count threads running target(i); returns (threads, results, errors) filled as they finish"""
+    results, errors = [None] * count, [None] * count
+
+    def call(i):
+        try:
+            results[i] = target(i)
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+
+def join(threads):
+    for thread in threads:
+        thread.join(TIMEOUT)
+        assert not thread.is_alive()
+
+
+def test_same_key_runs_once():
+    flight = SingleFlight('test_same_key')
+    release = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        release.wait(TIMEOUT)
+        return object()
+
+    threads, results, errors = run_threads(lambda i: flight.do('key', work), THREADS)
+    wait_for(lambda: counter('sts_single_flight_calls_total', flight='test_same_key', result='shared') == THREADS - 1)
+    release.set()
+    join(threads)
+
+    assert len(calls) == 1
+    assert errors == [None] * THREADS
+    assert all(result is results[0] for result in results)
+
+
+def test_different_keys_run_in_parallel():
+    flight = SingleFlight('test_different_keys')
+    barrier = threading.Barrier(THREADS, timeout=TIMEOUT)
+
+    def work(i):
+        # Waits for every other call: only returns if no key waits on another
+        barrier.wait()
+        return i
+
+    threads, results, errors = run_threads(lambda i: flight.do(i, work, i), THREADS)
+    join(threads)
+
+    assert errors == [None] * THREADS
+    assert results == list(range(THREADS))
+
+
+def test_exception_reaches_every_waiter():
+    flight = SingleFlight('test_exception')
+    release = threading.Event()
+    error = ValueError('failed')
+
+    def work():
+        release.wait(TIMEOUT)
+        raise error
+
+    threads, results, errors = run_threads(lambda i: flight.do('key', work), THREADS)
+    wait_for(lambda: counter('sts_single_flight_calls_total', flight='test_exception', result='shared') == THREADS - 1)
+    release.set()
+    join(threads)
+
+    assert all(e is error for e in errors)
+    assert flight._calls == {}
+
+
+def test_key_runs_again_after_flight():
+    flight = SingleFlight('test_again')
+    calls = []
+
+    assert flight.do('key', lambda: calls.append(1) or len(calls)) == 1
+    assert flight.do('key', lambda: calls.append(1) or len(calls)) == 2
+    with pytest.raises(KeyError):
+        flight.do('key', lambda: {}['missing'])
+    assert flight.do('key', lambda: calls.append(1) or len(calls)) == 3
+    assert flight._calls == {}
+
+
+@pytest.fixture
+def blocking_render(monkeypatch):
+    """app.render_response counting its calls and, once `gate` is set, waiting on it first"""
+    import app
+
+    render = app.render_response
+    state = {'calls': 0, 'gate': None}
+    lock = threading.Lock()
+
+    def blocked(*args, **kwargs):
+        with lock:
+            state['calls'] += 1
+        if state['gate'] is not None:
+            state['gate']()
+        return render(*args, **kwargs)
+
+    monkeypatch.setattr(app, 'render_response', blocked)
+    return state
+
+
+def test_cached_response_merges_identical_requests(serve_runs, blocking_render):
+    client = serve_runs([make_run('a'), make_run('b', victory=True)])
+    release = threading.Event()
+    blocking_render['gate'] = lambda: release.wait(TIMEOUT)
+    shared = counter('sts_single_flight_calls_total', flight='request', result='shared')
+
+    threads, results, errors = run_threads(lambda i: client.get('/api/stats?character=IRONCLAD'), THREADS)
+    wait_for(lambda: counter('sts_single_flight_calls_total', flight='request', result='shared') == shared + THREADS - 1)
+    release.set()
+    join(threads)
+
+    assert errors == [None] * THREADS
+    assert blocking_render['calls'] == 1
+    assert all(r.status_code == 200 and r.get_data() == results[0].get_data() for r in results)
+
+
+def test_cached_response_keeps_different_filters_apart(serve_runs, blocking_render):
+    client = serve_runs([make_run('a'), make_run('b', character_chosen='THE_SILENT')])
+    # Both renders must be in flight at once to pass the barrier
+    barrier = threading.Barrier(2, timeout=TIMEOUT)
+    blocking_render['gate'] = barrier.wait
+    paths = ['/api/stats?character=IRONCLAD', '/api/stats?character=THE_SILENT']
+
+    threads, results, errors = run_threads(lambda i: client.get(paths[i]), 2)
+    join(threads)
+
+    assert errors == [None, None]
+    assert blocking_render['calls'] == 2
+    assert results[0].get_data() != results[1].get_data()
+
+
+def test_cached_response_keeps_corpus_versions_apart(serve_runs, blocking_render, monkeypatch):
+    import app
+    from flask import request
+
+    client = serve_runs([make_run('a')])
+    monkeypatch.setattr(app, 'corpus_version', lambda source: request.headers['X-Version'])
+    barrier = threading.Barrier(2, timeout=TIMEOUT)
+    blocking_render['gate'] = barrier.wait
+
+    threads, results, errors = run_threads(lambda i: client.get('/api/stats', headers={'X-Version': str(i)}), 2)
+    join(threads)
+
+    assert errors == [None, None]
+    assert blocking_render['calls'] == 2
+    assert all(r.status_code == 200 for r in results)
+
+
+def test_profiled_requests_run_on_their_own(serve_runs, blocking_render):
+    client = serve_runs([make_run('a')])
+
+    assert client.get('/api/stats?profile=1').status_code == 200
+    assert client.get('/api/stats?profile=1').status_code == 200
+    assert blocking_render['calls'] == 0
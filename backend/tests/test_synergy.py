@@ -0,0 +1,136 @@
+import itertools
+from urllib.parse import parse_qsl
+import pytest
+from conftest import assert_endpoint_matches, indexed, make_run
+from run_index import RunIndex, split_deck_card
+
+RUNS = [
+    make_run('1', master_deck=['Strike_R', 'Bash', 'Inflame'], relics=['Burning Blood', 'Vajra'], victory=True),
+    make_run('2', master_deck=['Strike_R', 'Bash+1', 'Inflame', 'Inflame'], relics=['Burning Blood'], victory=False),
+    make_run('3', master_deck=['Strike_R', 'Whirlwind'], relics=['Burning Blood', 'Vajra'], victory=True),
+    make_run('4', master_deck=['Neutralize', 'Strike_G'], relics=['Ring of the Snake'], character_chosen='THE_SILENT', victory=True),
+    make_run('5', master_deck=['Strike_R', 'Bash', 'Whirlwind+1'], relics=['Burning Blood', 'Anchor'], victory=False),
+    make_run('6', master_deck=['Strike_G', 'Neutralize', 'Inflame'], relics=['Ring of the Snake', 'Vajra'], character_chosen='THE_SILENT', victory=False),
+    make_run('7', master_deck=['Bash', 'Inflame', 'Whirlwind'], relics=['Burning Blood', 'Vajra', 'Anchor'], victory=True),
+    make_run('8', master_deck=['Strike_R', 'Bash'], relics=['Burning Blood'], victory=True),
+]
+
+
+def brute_force(runs):
+    """{(card, partner): [runs, victories]} over card-card and card-relic pairs, with relic totals"""
+    pairs, relics = {}, {}
+    for run in runs:
+        cards = {split_deck_card(card)[0] for card in run['master_deck']}
+        for card, partner in itertools.chain(itertools.product(cards, cards), itertools.product(cards, set(run['relics']))):
+            counts = pairs.setdefault((card, partner), [0, 0])
+            counts[0] += 1
+            counts[1] += run['victory']
+        for relic in set(run['relics']):
+            counts = relics.setdefault(relic, [0, 0])
+            counts[0] += 1
+            counts[1] += run['victory']
+    return pairs, relics
+
+
+def assert_sums_match(index, sums, runs):
+    pairs, relic_counts = brute_force(runs)
+    cards, relics = index.decks.cards, index.relic_events.relics
+    for card, card_id in cards.ids.items():
+        for partner, partner_id in cards.ids.items():
+            count, victories = pairs.get((card, partner), [0, 0])
+            assert sums['card_card_runs'][card_id, partner_id] == count
+            assert sums['card_card_victories'][card_id, partner_id] == victories
+        for relic, relic_id in relics.ids.items():
+            count, victories = pairs.get((card, relic), [0, 0])
+            assert sums['card_relic_runs'][card_id, relic_id] == count
+            assert sums['card_relic_victories'][card_id, relic_id] == victories
+    for relic, relic_id in relics.ids.items():
+        assert [sums['relic_runs'][relic_id], sums['relic_victories'][relic_id]] == relic_counts.get(relic, [0, 0])
+
+
+def expected_rows(runs, partner):
+    """Rows /api/synergy should return for min_runs=1, in any order"""
+    from card_database import get_card_info
+
+    pairs, relic_counts = brute_force(runs)
+    card_counts = {card: counts for (card, other), counts in pairs.items() if card == other}
+    rows = []
+    for (card, other), (count, victories) in pairs.items():
+        if partner == 'cards' and (other not in card_counts or card >= other):
+            continue
+        if partner == 'relics' and other not in relic_counts:
+            continue
+        other_counts = card_counts[other] if partner == 'cards' else relic_counts[other]
+        win_rate = victories / count * 100
+        best = max(card_counts[card][1] / card_counts[card][0], other_counts[1] / other_counts[0]) * 100
+        rows.append({
+            'card': get_card_info(card)['display_name'],
+            'partner': get_card_info(other)['display_name'] if partner == 'cards' else other,
+            'runs': count,
+            'victories': victories,
+            'win_rate': pytest.approx(win_rate),
+            'synergy': pytest.approx(win_rate - best),
+        })
+    return rows
+
+
+def by_pair(partner):
+    """Rows keyed by their pair (unordered for card pairs), as (runs, victories, win_rate, synergy)"""
+    def normalize(rows):
+        return {
+            (frozenset([row['card'], row['partner']]) if partner == 'cards' else (row['card'], row['partner'])):
+                (row['runs'], row['victories'], row['win_rate'], row['synergy'])
+            for row in rows
+        }
+    return normalize
+
+
+def test_sums_match_brute_force(filter_case):
+    query, _ = filter_case
+    filters = dict(parse_qsl(query))
+    runs = indexed(RUNS)
+    index = RunIndex(runs)
+    mask = index.mask(filters)
+    assert_sums_match(index, index.synergy_sums(filters), [run for run, selected in zip(runs, mask) if selected])
+
+
+def test_extended_sums_match_brute_force():
+    runs = indexed(RUNS) + indexed([
+        make_run('9', master_deck=['Strike_R', 'Limit Break'], relics=['Burning Blood', 'Girya'], victory=True),
+        make_run('10', master_deck=['Bash', 'Limit Break', 'Inflame'], relics=['Burning Blood', 'Vajra'], victory=False),
+    ])
+    index = RunIndex(runs[:len(RUNS)])
+    index.synergy_sums({'character': 'IRONCLAD'})
+
+    # Folds the added runs (with new cards and relics) into the cached sums
+    extended = index.extended(runs[len(RUNS):])
+    selected = [run for run in runs if run['character'] == 'IRONCLAD']
+    assert_sums_match(extended, extended.synergy_sums({'character': 'IRONCLAD'}), selected)
+
+
+@pytest.mark.parametrize('partner', ['cards', 'relics'])
+def test_endpoint_matches_brute_force(serve_runs, filter_case, partner):
+    client = serve_runs(RUNS)
+    assert_endpoint_matches(client, f'/api/synergy?partner={partner}&min_runs=1&k=200', RUNS, filter_case,
+                            lambda runs: expected_rows(runs, partner), by_pair(partner))
+
+
+def test_endpoint_parameters(serve_runs):
+    from card_database import get_card_info
+
+    client = serve_runs(RUNS)
+    rows = client.get('/api/synergy?min_runs=1&k=200').get_json()
+    assert [row['synergy'] for row in rows] == sorted((row['synergy'] for row in rows), reverse=True)
+
+    rows = client.get('/api/synergy?min_runs=3&k=200&sort=runs').get_json()
+    expected = [row for row in expected_rows(RUNS, 'cards') if row['runs'] >= 3]
+    assert by_pair('cards')(rows) == by_pair('cards')(expected)
+    assert [row['runs'] for row in rows] == sorted((row['runs'] for row in rows), reverse=True)
+
+    bash = get_card_info('Bash')['display_name']
+    rows = client.get('/api/synergy?card=Bash&partner=relics&min_runs=1&k=200').get_json()
+    assert by_pair('relics')(rows) == by_pair('relics')([row for row in expected_rows(RUNS, 'relics') if row['card'] == bash])
+
+    assert len(client.get('/api/synergy?min_runs=1&k=2').get_json()) == 2
+    assert client.get('/api/synergy?partner=potions').status_code == 400
+    assert client.get('/api/synergy?card=Nonexistent').status_code == 404
@@ -0,0 +1,273 @@
+"""
+Background upload jobs
+/api/upload-runs saves the uploaded files and returns a job id right away;
+extraction and parsing run on a small worker thread pool, and the duplicate
+check and batched inserts go through the concurrent async_data layer.
+Complete runs are stored compressed in run_archives (see run_archive.py)
+before their slimmed rows are inserted into runs. Job
+progress is also written to uploads/jobs/<id>.json so every gunicorn worker
+can answer /api/upload-jobs/<id>.
+"""
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import async_data
+import metrics
+import run_archive
+from run_parser import ANALYTICS_FIELDS, parse_run_file
+
+UPLOAD_WORKERS = int(os.getenv('UPLOAD_WORKERS', 2))
+
+# Rows per insert request (a failed batch is retried row by row)
+INSERT_BATCH_SIZE = int(os.getenv('UPLOAD_INSERT_BATCH_SIZE', 200))
+
+# Keep at most this many error messages per job
+MAX_JOB_ERRORS = 50
+
+# Progress is written to disk at most this often while parsing
+SAVE_INTERVAL_SECONDS = 0.5
+
+# Finished job files older than this are removed
+JOB_RETENTION_SECONDS = 24 * 60 * 60
+
+JOB_ID_PATTERN = re.compile(r'[0-9a-f]{32}')
+
+_executor = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix='upload')
+_jobs_lock = threading.Lock()
+_jobs = {}
+
+
+class UploadJob:
+    """Progress of one upload (status: queued, running, completed or failed)"""
+
+    def __init__(self, jobs_folder, total_files):
+        self.id = uuid.uuid4().hex
+        self.path = Path(jobs_folder) / f'{self.id}.json'
+        self.lock = threading.Lock()
+        self.last_saved = 0.0
+        self.state = {
+            'job_id': self.id,
+            'status': 'queued',
+            'stage': 'queued',
+            'total_files': total_files,
+            'run_files': 0,
+            'files_parsed': 0,
+            'parsed_runs': 0,
+            'new_runs': 0,
+            'duplicate_runs': 0,
+            'failed_runs': 0,
+            'errors': [],
+            'error': None,
+            'created_at': time.time(),
+            'updated_at': time.time(),
+            'finished_at': None
+        }
+
+    def to_dict(self):
+        with self.lock:
+            return dict(self.state, errors=list(self.state['errors']))
+
+    def update(self, force=True, **changes):
+        """Apply changes and persist them (throttled unless force is set)"""
+        with self.lock:
+            self.state.update(changes)
+            self.state['updated_at'] = time.time()
+        if force or time.time() - self.last_saved >= SAVE_INTERVAL_SECONDS:
+            self.save()
+
+    def add_error(self, message):
+        with self.lock:
+            if len(self.state['errors']) < MAX_JOB_ERRORS:
+                self.state['errors'].append(message)
+
+    def save(self):
+        """Write the job state atomically so other workers never read a partial file"""
+        state = self.to_dict()
+        temp_path = self.path.with_suffix('.tmp')
+        try:
+            temp_path.write_text(json.dumps(state))
+            os.replace(temp_path, self.path)
+            self.last_saved = time.time()
+        except OSError as e:
+            print(f"Error saving upload job {self.id}: {e}")
+
+
+def get_job(jobs_folder, job_id):
+    """Job state by id, from this process or another worker's job file (None if unknown)"""
+    if not JOB_ID_PATTERN.fullmatch(job_id or ''):
+        return None
+
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+    if job is not None:
+        return job.to_dict()
+
+    try:
+        return json.loads((Path(jobs_folder) / f'{job_id}.json').read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def submit_upload(jobs_folder, saved_files, work_dir, on_runs_inserted=None):
+    """
+    Queue an upload for background processing
+
+    Args:
+        jobs_folder: directory holding the job state files
+        saved_files: list of (path, original filename) already written to disk
+        work_dir: directory removed once the job finishes
+        on_runs_inserted: called with the raw_data of the inserted runs
+
+    Returns:
+        UploadJob: the queued job
+    """
+    jobs_folder = Path(jobs_folder)
+    jobs_folder.mkdir(parents=True, exist_ok=True)
+    prune_jobs(jobs_folder)
+
+    job = UploadJob(jobs_folder, len(saved_files))
+    job.save()
+    with _jobs_lock:
+        _jobs[job.id] = job
+    _executor.submit(run_upload_job, job, saved_files, work_dir, on_runs_inserted)
+    return job
+
+
+def prune_jobs(jobs_folder):
+    """Forget finished jobs older than JOB_RETENTION_SECONDS"""
+    cutoff = time.time() - JOB_RETENTION_SECONDS
+    with _jobs_lock:
+        for job_id, job in list(_jobs.items()):
+            finished_at = job.to_dict()['finished_at']
+            if finished_at and finished_at < cutoff:
+                del _jobs[job_id]
+    for path in Path(jobs_folder).glob('*.json'):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+        except OSError:
+            pass
+
+
+def iter_run_files(saved_files, job):
+    """Yield (content bytes, filename) for every .run file in the saved uploads"""
+    for path, filename in saved_files:
+        if filename.endswith('.zip'):
+            try:
+                with zipfile.ZipFile(path) as archive:
+                    for name in archive.namelist():
+                        if name.endswith('.run'):
+                            yield archive.read(name), Path(name).name
+            except zipfile.BadZipFile:
+                job.add_error(f'Invalid ZIP file: {filename}')
+        else:
+            yield Path(path).read_bytes(), filename
+
+
+def is_duplicate_error(error):
+    return 'duplicate key' in str(error) or '23505' in str(error)
+
+
+async def check_and_insert(parsed_runs, files, job):
+    """
+    Skip runs already stored, archive the rest (files maps their
+    identifiers to the uploaded .run file bytes), then insert them in
+    concurrent batches (a failed batch is retried row by row). Runs whose
+    archive could not be stored are not inserted.
+
+    Returns:
+        list: raw_data of the runs that were inserted
+    """
+    async with async_data.connect() as client:
+        if client is None:
+            raise RuntimeError('Failed to connect to Supabase')
+
+        job.update(stage='checking_duplicates')
+        try:
+            existing_identifiers = await async_data.find_existing(client, 'runs', 'run_identifier', list(parsed_runs))
+        except Exception as e:
+            raise RuntimeError(f'Error checking for duplicates: {str(e)}')
+
+        new_runs = [run for identifier, run in parsed_runs.items() if identifier not in existing_identifiers]
+        progress = {'inserted': [], 'duplicates': job.to_dict()['duplicate_runs'] + len(parsed_runs) - len(new_runs), 'failed': 0}
+        job.update(stage='compressing', duplicate_runs=progress['duplicates'])
+        archives = await run_archive.archive_runs(client, new_runs, [files[run['run_identifier']] for run in new_runs])
+        job.update(stage='inserting')
+
+        # An archive left by an earlier, interrupted upload of the run is kept
+        archived = set()
+        for archive, error in await async_data.insert_chunks(client, 'run_archives', archives, INSERT_BATCH_SIZE):
+            if error is None or is_duplicate_error(error):
+                archived.add(archive['run_identifier'])
+            else:
+                progress['failed'] += 1
+                job.add_error(f"Failed to archive run {archive['play_id']}: {str(error)}")
+        new_runs = [run for run in new_runs if run['run_identifier'] in archived]
+
+        def record_chunk(results):
+            for run, error in results:
+                if error is None:
+                    progress['inserted'].append(run['raw_data'])
+                elif is_duplicate_error(error):
+                    progress['duplicates'] += 1
+                else:
+                    progress['failed'] += 1
+                    job.add_error(f"Failed to upload run {run['play_id']}: {str(error)}")
+            job.update(new_runs=len(progress['inserted']), duplicate_runs=progress['duplicates'], failed_runs=progress['failed'])
+
+        await async_data.insert_chunks(client, 'runs', new_runs, INSERT_BATCH_SIZE, on_chunk=record_chunk)
+        return progress['inserted']
+
+
+def run_upload_job(job, saved_files, work_dir, on_runs_inserted):
+    """Parse, deduplicate and insert one upload, recording progress on job"""
+    try:
+        job.update(status='running', stage='parsing')
+
+        # Parse all runs, keeping the first copy of runs repeated within the upload.
+        # Only the analytics fields of each decoded run are held; the file
+        # itself is kept as read for its archive.
+        parsed_runs = {}
+        files = {}
+        run_files = files_parsed = repeated = 0
+        for content, filename in iter_run_files(saved_files, job):
+            run_files += 1
+            parsed = parse_run_file(content, filename, fields=ANALYTICS_FIELDS)
+            if parsed:
+                files_parsed += 1
+                if parsed['run_identifier'] in parsed_runs:
+                    repeated += 1
+                else:
+                    parsed_runs[parsed['run_identifier']] = parsed
+                    files[parsed['run_identifier']] = content
+            job.update(force=False, run_files=run_files, files_parsed=files_parsed)
+        job.update(run_files=run_files, files_parsed=files_parsed, parsed_runs=files_parsed)
+
+        if run_files == 0:
+            raise ValueError('No valid .run or .zip files provided')
+        if not parsed_runs:
+            raise ValueError('Failed to parse any run files')
+
+        job.update(duplicate_runs=repeated)
+        inserted = async_data.run(check_and_insert(parsed_runs, files, job))
+        state = job.to_dict()
+        metrics.increment('sts_uploaded_runs_total', len(inserted), result='inserted')
+        metrics.increment('sts_uploaded_runs_total', state['duplicate_runs'], result='duplicate')
+        metrics.increment('sts_uploaded_runs_total', state['failed_runs'], result='failed')
+
+        if inserted and on_runs_inserted is not None:
+            on_runs_inserted(inserted)
+
+        job.update(status='completed', stage='done', finished_at=time.time())
+    except Exception as e:
+        print(f"Upload job {job.id} failed: {e}")
+        job.update(status='failed', stage='done', error=str(e), finished_at=time.time())
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
@@ -89,6 +89,8 @@ function Advanced() {
   }
 
   const getColor = (value) => {
+    // Undefined (a constant feature under the current filters)
+    if (value === null) return 'transparent'
     // Enhanced color scale for dark mode with better contrast
     const absValue = Math.abs(value)
     if (value > 0) {
@@ -113,7 +115,7 @@ function Advanced() {
         feature,
         correlation: correlationData.matrix[varIndex][idx]
       }))
-      .filter(item => item.feature !== variable && !hiddenCorrelations.includes(item.feature))
+      .filter(item => item.feature !== variable && item.correlation !== null && !hiddenCorrelations.includes(item.feature))
       .sort((a, b) => Math.abs(b.correlation) - Math.abs(a.correlation))
 
     return correlations.slice(0, 5)
@@ -452,9 +454,9 @@ function Advanced() {
                         minWidth: '60px',
                         border: '1px solid rgba(0, 0, 0, 0.1)'
                       }}
-                      title={`${formatVariableName(rowFeature)} vs ${formatVariableName(filteredFeatures[j])}: ${value.toFixed(3)}`}
+                      title={`${formatVariableName(rowFeature)} vs ${formatVariableName(filteredFeatures[j])}: ${value === null ? 'undefined' : value.toFixed(3)}`}
                     >
-                      {value.toFixed(2)}
+                      {value === null ? 'n/a' : value.toFixed(2)}
                     </td>
                   ))}
                 </tr>
@@ -2,6 +2,18 @@ import { useState, useEffect } from 'react';
 import axios from 'axios';
 import { API_URL } from '../config';
 
+const JOB_POLL_INTERVAL_MS = 1000;
+
+// Progress label for each upload job stage
+const STAGE_LABELS = {
+  queued: 'Waiting to start...',
+  parsing: 'Parsing run files...',
+  checking_duplicates: 'Checking for duplicates...',
+  compressing: 'Compressing run files...',
+  inserting: 'Saving runs...',
+  done: 'Finishing...',
+};
+
 function Upload() {
   const [files, setFiles] = useState([]);
   const [uploading, setUploading] = useState(false);
@@ -12,6 +24,7 @@ function Upload() {
   const [supabaseStatus, setSupabaseStatus] = useState(null);
   const [checkingSupabase, setCheckingSupabase] = useState(true);
   const [waking, setWaking] = useState(false);
+  const [progress, setProgress] = useState(null);
 
   const handleDrag = (e) => {
     e.preventDefault();
@@ -90,6 +103,18 @@ function Upload() {
     }
   };
 
+  // Poll a background upload job until it completes or fails
+  const waitForJob = async (statusUrl) => {
+    while (true) {
+      await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+      const response = await axios.get(`${API_URL}${statusUrl}`);
+      setProgress(response.data);
+      if (response.data.status === 'completed' || response.data.status === 'failed') {
+        return response.data;
+      }
+    }
+  };
+
   const handleUpload = async () => {
     if (files.length === 0) {
       setError('Please select files first');
@@ -104,6 +129,7 @@ function Upload() {
     setUploading(true);
     setError(null);
     setResult(null);
+    setProgress(null);
 
     const formData = new FormData();
 
@@ -122,13 +148,20 @@ function Upload() {
         },
       });
 
-      setResult(response.data);
+      const job = await waitForJob(response.data.status_url);
+      if (job.status === 'failed') {
+        setError(job.error || 'Upload failed. Please try again.');
+        return;
+      }
+
+      setResult(job);
       setFiles([]);
       setPassword('');
     } catch (err) {
       setError(err.response?.data?.error || 'Upload failed. Please try again.');
     } finally {
       setUploading(false);
+      setProgress(null);
     }
   };
 
@@ -419,6 +452,25 @@ function Upload() {
         </button>
       </div>
 
+      {progress && (
+        <div style={{
+          marginTop: '20px',
+          padding: '15px',
+          background: 'rgba(65, 105, 225, 0.15)',
+          border: '1px solid var(--accent-sapphire)',
+          borderRadius: '8px',
+          color: 'var(--text-secondary)'
+        }}>
+          <strong style={{ color: 'var(--text-primary)' }}>{STAGE_LABELS[progress.stage] || 'Processing...'}</strong>
+          <p style={{ margin: '8px 0 0 0' }}>
+            Files parsed: {progress.files_parsed} / {progress.run_files}
+            {' · '}New runs: {progress.new_runs}
+            {' · '}Duplicates: {progress.duplicate_runs}
+            {progress.errors.length > 0 && ` · Errors: ${progress.errors.length}`}
+          </p>
+        </div>
+      )}
+
       {error && (
         <div style={{
           marginTop: '20px',